@@ -155,7 +155,7 @@ setup(
     #
     # For an analysis of "install_requires" vs pip's requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=['cloudio-endpoint-python'],  # Optional
+    install_requires=['cloudio-endpoint-python>=1.1.1,<1.2'],  # Optional
 
     # List additional groups of dependencies here (e.g. development
     # dependencies). Users will be able to install these using the "extras"
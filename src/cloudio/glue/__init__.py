@@ -9,7 +9,19 @@ __path__ = pkgutil.extend_path(__path__, __name__)
 import logging
 from .version import __version__ as version
 from .cloudio_attribute import cloudio_attribute
+from .change_stream import ChangeEvent, ChangeSubscription
+from .cloud_write_dispatcher import CloudWriteDispatcher
+from .cloudio_model import cloudio_model
+from .in_memory_endpoint import InMemoryCloudioEndpoint
+from .mapping_loader import AttributeMappingError
 from .model_to_cloud_connector import Model2CloudConnector
+from .polling_sampler import PollingSampler
+from .publish_scheduler import PublishScheduler
+from .recording import UpdateRecorder, UpdateReplayer
+from .sharding import ShardEndpoint, ShardHost
+from .snapshot import Snapshot, SnapshotValue
+from .sync_pacer import SyncPacer
+from .token_bucket import TokenBucket
 
 # Do not output logs if logging module is not configured
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import array
+
+# Functions accepted by the 'aggregate' entry of an attribute mapping
+AGGREGATE_FUNCTIONS = ('min', 'max', 'mean', 'last', 'count')
+
+# Defaults of the 'aggregationInterval' (seconds) and 'windowSize' (samples) entries
+DEFAULT_AGGREGATION_INTERVAL = 1.0
+DEFAULT_WINDOW_SIZE = 1024
+
+
+class SampleWindow(object):
+    """Ring buffer keeping the last `size` samples of an attribute received during an interval.
+
+    Adding a sample does not allocate memory. The aggregates are computed when the
+    interval is over (see `due`). 'min', 'max' and 'mean' are computed over the samples
+    kept, 'count' is the number of samples received during the interval.
+    """
+
+    __slots__ = ('_samples', '_size', '_index', '_count', '_received', '_interval', 'due')
+
+    def __init__(self, size, interval, now):
+        """
+        :param size: Maximum number of samples kept. Older samples are overwritten
+        :type size: int
+        :param interval: Duration of the window in seconds
+        :type interval: float
+        :param now: Current time in seconds. The first window ends at `now + interval`
+        """
+        assert size > 0 and interval > 0
+
+        self._samples = array.array('d', bytes(8 * size))
+        self._size = size
+        self._index = 0
+        self._count = 0         # Number of samples kept (up to size)
+        self._received = 0
+        self._interval = interval
+        self.due = now + interval
+
+    @property
+    def received(self):
+        """Number of samples received since the window started.
+        """
+        return self._received
+
+    def add(self, value):
+        self._samples[self._index] = value
+        self._index += 1
+        if self._index == self._size:
+            self._index = 0
+        if self._count < self._size:
+            self._count += 1
+        self._received += 1
+
+    def aggregate(self, functions=AGGREGATE_FUNCTIONS):
+        """Returns the aggregates of the samples kept.
+
+        :param functions: The aggregates to compute
+        :return A dict mapping each function to its value or None if the window is empty
+        """
+        if not self._count:
+            return None
+
+        if self._count < self._size:
+            samples = self._samples[:self._count]
+        else:
+            samples = self._samples
+        aggregates = {}
+        for function in functions:
+            if function == 'min':
+                aggregates[function] = min(samples)
+            elif function == 'max':
+                aggregates[function] = max(samples)
+            elif function == 'mean':
+                aggregates[function] = sum(samples) / self._count
+            elif function == 'last':
+                aggregates[function] = self._samples[self._index - 1]
+            elif function == 'count':
+                aggregates[function] = self._received
+        return aggregates
+
+    def restart(self, now):
+        """Forgets the samples and starts the next window.
+        """
+        self._index = 0
+        self._count = 0
+        self._received = 0
+        self.due = now + self._interval
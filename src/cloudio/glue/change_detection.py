@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+
+# Values accepted by the 'changeDetection' entry of an attribute mapping
+CHANGE_DETECTION_EQUALITY = 'equality'          # Model value != value in the cloud
+CHANGE_DETECTION_IDENTITY = 'identity'          # Model value is not the object published last time
+CHANGE_DETECTION_FINGERPRINT = 'fingerprint'    # Content of the model value differs from the one published last time
+
+CHANGE_DETECTIONS = (CHANGE_DETECTION_EQUALITY, CHANGE_DETECTION_IDENTITY, CHANGE_DETECTION_FINGERPRINT)
+
+
+def get_change_detection(cloudio_attribute_mapping):
+    """Returns the change detection of an attribute mapping entry.
+
+    Entries without 'changeDetection' key use 'equality'.
+    """
+    change_detection = cloudio_attribute_mapping.get('changeDetection', CHANGE_DETECTION_EQUALITY)
+    if change_detection not in CHANGE_DETECTIONS:
+        raise ValueError('Unknown change detection \'%s\'! Expected one of %s' % (change_detection,
+                                                                                 CHANGE_DETECTIONS))
+    return change_detection
+
+
+def fingerprint(value):
+    """Returns a digest of the content of the value.
+
+    Values with the same content get the same fingerprint, independent of the order
+    of dict keys or set items. Bytes are hashed directly, other values are serialized
+    to canonical JSON first.
+
+    :rtype bytes
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = b'b' + bytes(value)
+    else:
+        try:
+            data = b'j' + json.dumps(value, sort_keys=True, separators=(',', ':'),
+                                     default=_canonical).encode('utf-8')
+        except (TypeError, ValueError):
+            # Dict keys of different types cannot be sorted
+            data = b'r' + repr(value).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _canonical(value):
+    """Converts values JSON does not know to serializable ones.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'__bytes__': bytes(value).hex()}
+    if isinstance(value, (set, frozenset)):
+        return {'__set__': sorted(json.dumps(item, sort_keys=True, default=_canonical) for item in value)}
+    return {'__repr__': repr(value)}
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import threading
+
+ChangeEvent = collections.namedtuple('ChangeEvent', ['connector', 'model_attribute_name', 'topic', 'value',
+                                                     'timestamp', 'from_cloud'])
+ChangeEvent.__doc__ = """Change of a model attribute, as published to the cloud.
+
+:param connector: The connector owning the model attribute
+:param model_attribute_name: Name of the model attribute
+:param topic: Topic of the cloud.iO attribute relative to the node (ex. 'status.temperature')
+:param value: The value in the cloud (after the 'toCloudioValueConverter'). Aggregates for aggregated attributes
+:param timestamp: Time of the change in milliseconds
+:param from_cloud: True if the change was set from the cloud (@set) and applied to the model
+"""
+
+# Default number of events a subscription queues before dropping the oldest ones
+DEFAULT_MAX_QUEUE_SIZE = 1024
+
+
+class ChangeSubscription(object):
+    """Subscription to the changes of model attributes (see `Model2CloudConnector.subscribe_changes()`).
+
+    Events are delivered after change detection, i.e. only values actually sent to the cloud
+    (and values set from the cloud) are received.
+
+    Without callback, events are queued. The queue is bounded: if the subscriber does not keep
+    up, the oldest events are dropped (see `dropped`). Consumers take them with `get()`, `drain()`
+    or by iterating over the subscription until it is closed.
+
+    With a callback, the callback is called by the thread publishing the change. It should
+    return quickly.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, model_attribute_names=None, topic_prefix=None, max_queue_size=DEFAULT_MAX_QUEUE_SIZE,
+                 callback=None):
+        """
+        :param model_attribute_names: Names of the model attributes to receive. None for all
+        :param topic_prefix: Only receive attributes located below this topic (ex. 'status'). None for all
+        :type topic_prefix: str or None
+        :param max_queue_size: Maximum number of queued events
+        :type max_queue_size: int
+        :param callback: Called with each `ChangeEvent` instead of queueing it
+        """
+        assert max_queue_size > 0
+
+        self._model_attribute_names = frozenset(model_attribute_names) if model_attribute_names is not None else None
+        self._topic_prefix = topic_prefix.strip('.') if topic_prefix else None
+        self._callback = callback
+        self._queue = collections.deque(maxlen=max_queue_size)
+        self._condition = threading.Condition()
+        self._dropped = 0
+        self._closed = False
+
+    @property
+    def dropped(self):
+        """Number of events dropped because the queue was full.
+        """
+        return self._dropped
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._queue)
+
+    def matches(self, model_attribute_name, topic):
+        """Returns true if the subscription receives changes of the given attribute.
+        """
+        if self._model_attribute_names is not None and model_attribute_name not in self._model_attribute_names:
+            return False
+        if self._topic_prefix is not None:
+            return topic == self._topic_prefix or topic.startswith(self._topic_prefix + '.')
+        return True
+
+    def deliver(self, event):
+        """Hands over an event to the subscriber. Does not block.
+
+        :type event: ChangeEvent
+        """
+        if self._closed:
+            return
+
+        if self._callback is not None:
+            try:
+                self._callback(event)
+            except Exception:
+                self.log.exception('Change subscriber failed on \'%s\'!' % event.model_attribute_name)
+            return
+
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self._dropped += 1
+            self._queue.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Returns the next event. Waits until an event arrives, the timeout elapsed or the subscription is closed.
+
+        :return The oldest queued `ChangeEvent` or None
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue or self._closed, timeout=timeout) or not self._queue:
+                return None
+            return self._queue.popleft()
+
+    def drain(self):
+        """Returns the queued events and empties the queue. Does not wait.
+
+        :rtype list[ChangeEvent]
+        """
+        with self._condition:
+            events = list(self._queue)
+            self._queue.clear()
+        return events
+
+    def __iter__(self):
+        """Yields the events until the subscription is closed.
+        """
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        """Stops the delivery of events. Consumers waiting in `get()` get None once the queue is empty.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CloudWriteDispatcher(object):
+    """Applies changes coming from the cloud (@set) to the models using a pool of worker threads.
+
+    Keeps the thread serving the MQTT client connection free from slow model setters.
+
+    Writes to the same model attribute are applied one after the other in the order
+    they arrived. If new writes arrive for an attribute while a previous one is still
+    waiting, only the newest value is applied (coalescing).
+
+    One dispatcher can be shared by many `Model2CloudConnector` objects.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, max_workers=4):
+        """
+        :param max_workers: Number of worker threads applying the writes
+        :type max_workers: int
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cloudio-write')
+        self._condition = threading.Condition()
+        self._pending_writes = {}       # Newest write not yet applied, per model attribute
+        self._active_keys = set()       # Model attributes having a worker scheduled or running
+        self._coalesced_count = 0
+        self._shut_down = False
+
+    @property
+    def coalesced_count(self):
+        """Number of writes dropped because a newer value arrived before they were applied.
+        """
+        return self._coalesced_count
+
+    def dispatch(self, connector, model_attribute_name, cloudio_attr, value):
+        """Schedules a write from the cloud to be applied to the model.
+
+        :param connector: The connector owning the model attribute
+        :type connector: Model2CloudConnector
+        :param model_attribute_name: Name of the model attribute to change
+        :param cloudio_attr: The cloud.iO attribute changed from the cloud
+        :param value: The value to apply
+        :raise RuntimeError: If the dispatcher is shut down
+        """
+        key = (id(connector), model_attribute_name)
+
+        with self._condition:
+            if self._shut_down:
+                raise RuntimeError('Cloud write dispatcher is shut down!')
+            if key in self._pending_writes:
+                self._coalesced_count += 1
+            self._pending_writes[key] = (connector, model_attribute_name, cloudio_attr, value)
+
+            if key in self._active_keys:
+                # Worker picks up the newest value when done with the current one
+                return
+            self._active_keys.add(key)
+
+        try:
+            self._executor.submit(self._apply_writes, key)
+        except RuntimeError:
+            # Shut down meanwhile. Do not leave wait_idle() waiting for the write
+            with self._condition:
+                self._pending_writes.pop(key, None)
+                self._active_keys.discard(key)
+                if not self._active_keys:
+                    self._condition.notify_all()
+            raise
+
+    def _apply_writes(self, key):
+        while True:
+            with self._condition:
+                write = self._pending_writes.pop(key, None)
+                if write is None:
+                    self._active_keys.discard(key)
+                    if not self._active_keys:
+                        self._condition.notify_all()
+                    return
+
+            connector, model_attribute_name, cloudio_attr, value = write
+            try:
+                connector._apply_cloud_write(model_attribute_name, cloudio_attr, value)
+            except Exception:
+                self.log.exception('Could not apply cloud.iO @set of attribute \'%s\'!' % model_attribute_name)
+
+    def wait_idle(self, timeout=None):
+        """Waits until all dispatched writes are applied.
+
+        :return True if all writes are applied, false if the timeout elapsed.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._active_keys, timeout=timeout)
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads. Writes dispatched afterwards raise a RuntimeError.
+        """
+        with self._condition:
+            self._shut_down = True
+        self._executor.shutdown(wait=wait)
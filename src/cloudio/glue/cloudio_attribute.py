@@ -2,7 +2,11 @@
 
 import inspect
 import logging
-import traceback
+
+from .rate_limited_log import RateLimitedLog
+
+# Errors below occur on every assignment of a badly configured attribute
+_rate_limited_log = RateLimitedLog(logging.getLogger())
 
 
 # Links:
@@ -55,6 +59,11 @@ class cloudio_attribute(object):
             # Use setter method to assign new value
             ret_value = self._fset.__get__(obj)(value)
 
+        # Inform connector about the change (dirty tracking)
+        mark_dirty = getattr(obj, 'mark_dirty', None)
+        if mark_dirty is not None:
+            mark_dirty(self.__name__)
+
         try:
             # Update value on the cloud by calling method '_update_cloudio_attribute'
             # which must be provided by the instance having the cloudio_attribute
@@ -65,16 +74,20 @@ class cloudio_attribute(object):
             #        obj._update_cloudio_attribute(self._fget.__name__, self._fget.__get__(obj)())
             obj._update_cloudio_attribute(self.__name__, self.__get__(obj))
         except (AttributeError, TypeError):
-            traceback.print_exc()
+            key = (type(obj), self.__name__)
             callback_name = '_update_cloudio_attribute'
 
             if not hasattr(obj, callback_name):
-                logging.error(f'Method \'{callback_name}\' not provided!')
+                _rate_limited_log.error(key + ('not-provided',), 'Method \'%s\' not provided!', callback_name)
             else:
                 attr = getattr(obj, callback_name)
                 # It should be a method
                 if not inspect.ismethod(attr):
-                    logging.error(f'\'{callback_name}\' must be a method!')
+                    _rate_limited_log.error(key + ('not-a-method',), '\'%s\' must be a method!', callback_name)
+                else:
+                    # Ex. a converter failing
+                    _rate_limited_log.error(key + ('exception',), 'Could not update attribute \'%s\' in the cloud!',
+                                            self.__name__, exc_info=True)
         return ret_value
 
     def setter(self, fset):
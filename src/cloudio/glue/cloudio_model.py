@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import types
+
+from .mapping_loader import compile_attribute_mapping, load_attribute_mapping
+
+
+def cloudio_model(cls=None, attribute_mapping=None):
+    """Class decorator generating the cloud.iO synchronized properties of a Model2CloudConnector class.
+
+    For each entry of the attribute mapping not already defined in the class, a property
+    backed by a slot ('_<attribute-name>') is generated. Its setter stores the value and,
+    if the value changed, marks the attribute dirty and updates it in the cloud.
+
+    The attribute mapping is taken from the `attribute_mapping` parameter (a dictionary
+    or the path to a mapping file) or from the `ATTRIBUTE_MAPPING` class attribute. It is
+    applied to every new instance not setting its own mapping in `__init__()`.
+
+    Initial values are given with the mapping entry 'initialValue'. Defaults to the
+    value created by the 'attributeType' (ex. 0.0 for float).
+
+    Example:
+        @cloudio_model
+        class ComputerMouse(Model2CloudConnector):
+            ATTRIBUTE_MAPPING = {'x': {'topic': 'position.x', 'attributeType': float, 'constraints': ('read',)}}
+    """
+    if cls is None:
+        return functools.partial(cloudio_model, attribute_mapping=attribute_mapping)
+
+    if attribute_mapping is None:
+        attribute_mapping = cls.ATTRIBUTE_MAPPING
+    if isinstance(attribute_mapping, str):
+        attribute_mapping = load_attribute_mapping(attribute_mapping)
+    else:
+        attribute_mapping = compile_attribute_mapping(attribute_mapping)
+
+    generated_names = [name for name in attribute_mapping if name not in cls.__dict__]
+
+    # Re-create the class with slots added. Slots cannot be added to an existing class.
+    class_dict = dict(cls.__dict__)
+    class_dict.pop('__dict__', None)
+    class_dict.pop('__weakref__', None)
+    class_dict['__slots__'] = tuple('_' + name for name in generated_names)
+    class_dict['ATTRIBUTE_MAPPING'] = attribute_mapping
+
+    new_cls = type(cls)(cls.__name__, cls.__bases__, class_dict)
+    _update_class_cells(new_cls, cls)
+
+    initial_values = []
+    for model_attribute_name in generated_names:
+        member = getattr(new_cls, '_' + model_attribute_name)
+        setattr(new_cls, model_attribute_name, _make_cloudio_property(model_attribute_name, member))
+
+        cloudio_attribute_mapping = attribute_mapping[model_attribute_name]
+        if 'initialValue' in cloudio_attribute_mapping:
+            initial_values.append((member.__set__, cloudio_attribute_mapping['initialValue']))
+        else:
+            initial_values.append((member.__set__, cloudio_attribute_mapping['attributeType']()))
+
+    new_cls.__init__ = _make_init(new_cls.__init__, initial_values, attribute_mapping)
+    return new_cls
+
+
+def _make_cloudio_property(model_attribute_name, member):
+    """Creates the property for one model attribute.
+    """
+    get_value = member.__get__
+    set_value = member.__set__
+
+    def fset(obj, value):
+        changed = get_value(obj) != value
+        set_value(obj, value)
+        if changed:
+            obj.mark_dirty(model_attribute_name)
+            obj._update_cloudio_attribute(model_attribute_name, value)
+
+    return property(get_value, fset, doc='cloud.iO attribute \'%s\'' % model_attribute_name)
+
+
+def _make_init(init, initial_values, attribute_mapping):
+    """Wraps the class' __init__() method to set initial values and the attribute mapping.
+    """
+
+    @functools.wraps(init)
+    def __init__(self, *args, **kwargs):
+        for set_value, initial_value in initial_values:
+            set_value(self, initial_value)
+
+        init(self, *args, **kwargs)
+
+        if self._attribute_mapping is None:
+            self.set_attribute_mapping(self._resolve_value_converters(attribute_mapping))
+
+    return __init__
+
+
+def _update_class_cells(new_cls, old_cls):
+    """Makes methods using zero argument super() refer to the re-created class.
+    """
+    for member in new_cls.__dict__.values():
+        if isinstance(member, (staticmethod, classmethod)):
+            member = member.__func__
+        elif isinstance(member, property):
+            member = member.fget
+        if not isinstance(member, types.FunctionType) or not member.__closure__:
+            continue
+        for name, cell in zip(member.__code__.co_freevars, member.__closure__):
+            if name == '__class__' and cell.cell_contents is old_cls:
+                cell.cell_contents = new_cls
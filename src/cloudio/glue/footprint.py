@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""Memory footprint of connectors.
+
+`connector_footprint()` and `class_footprints()` report the number of mapped attributes,
+the cloud.iO objects and attributes created and an estimation of the bytes retained by
+the connectors. `AllocationTracker` measures allocations using tracemalloc, for example
+to catch memory regressions in tests and benchmarks.
+"""
+
+import array
+import collections
+import gc
+import sys
+import tracemalloc
+
+Footprint = collections.namedtuple('Footprint', ['mapped_attributes', 'cloudio_objects', 'cloudio_attributes',
+                                                 'listeners', 'retained_bytes'])
+Footprint.__doc__ = """Memory footprint of a connector.
+
+:param mapped_attributes: Number of entries in the attribute mapping
+:param cloudio_objects: Number of cloud.iO objects in the nodes owned by the connector (including mirrors)
+:param cloudio_attributes: Number of cloud.iO attributes in the nodes owned by the connector (including mirrors)
+:param listeners: Number of listeners added to cloud.iO attributes ('write' attributes)
+:param retained_bytes: Estimated bytes retained by the connector's structures and its nodes
+"""
+
+ClassFootprint = collections.namedtuple('ClassFootprint', ['instances'] + list(Footprint._fields))
+ClassFootprint.__doc__ = """Memory footprint of all connectors of a class. See `Footprint`.
+
+Structures shared by the instances (ex. a mapping defined once for the class) are counted once.
+"""
+
+# Structures of Model2CloudConnector included in the estimation
+_CONNECTOR_STRUCTURES = ('_attribute_mapping', '_location_stacks', '_cloudio_attributes', '_model_attribute_names',
+                         '_published_change_keys', '_published_write_values', '_read_attribute_names',
+                         '_read_attribute_name_set', '_static_attribute_names', '_sent_static_attributes',
+                         '_dirty_attributes', '_sample_windows', '_mirrors', '_change_subscriptions')
+
+_CONTAINER_TYPES = (dict, list, tuple, set, frozenset, collections.deque)
+_VALUE_TYPES = (str, bytes, bytearray, int, float, complex, array.array)
+
+
+def connector_footprint(connector, include_children=True, seen=None):
+    """Returns the memory footprint of a connector.
+
+    Nodes belong to the top connector. Child connectors share them and report no cloud.iO objects.
+
+    :param connector: The connector to inspect
+    :type connector: Model2CloudConnector
+    :param include_children: Adds the footprint of the child connectors
+    :param seen: Ids of the objects already counted. Objects shared with previous calls are not counted again
+    :type seen: set or None
+    :rtype Footprint
+    """
+    seen = set() if seen is None else seen
+
+    retained_bytes = sys.getsizeof(connector) + _deep_size(getattr(connector, '__dict__', {}), seen, follow=False)
+    for structure_name in _CONNECTOR_STRUCTURES:
+        retained_bytes += _deep_size(getattr(connector, structure_name, None), seen)
+
+    cloudio_objects = cloudio_attributes = 0
+    if connector._parent_connector is None:
+        nodes = [connector._cloudio_node] + [mirror.cloudio_node for mirror in connector._mirrors]
+        for cloudio_node in nodes:
+            if cloudio_node is not None:
+                object_count, attribute_count, node_bytes = _node_footprint(cloudio_node, seen)
+                cloudio_objects += object_count
+                cloudio_attributes += attribute_count
+                retained_bytes += node_bytes
+
+    footprint = Footprint(mapped_attributes=len(connector._attribute_mapping or ()),
+                          cloudio_objects=cloudio_objects,
+                          cloudio_attributes=cloudio_attributes,
+                          listeners=len(connector._model_attribute_names),
+                          retained_bytes=retained_bytes)
+
+    if include_children:
+        for child_connector in connector._child_connectors:
+            footprint = _add(footprint, connector_footprint(child_connector, seen=seen))
+    return footprint
+
+
+def class_footprints(connectors):
+    """Returns the memory footprint of the given connectors (and of their children) per class.
+
+    :param connectors: The connectors to inspect
+    :return A dict mapping the class name to its `ClassFootprint`
+    """
+    seen = set()
+    footprints = {}
+    visited = set()
+    pending = list(connectors)
+    while pending:
+        connector = pending.pop(0)
+        if id(connector) in visited:
+            continue
+        visited.add(id(connector))
+        pending += connector._child_connectors
+
+        class_name = type(connector).__name__
+        footprint = connector_footprint(connector, include_children=False, seen=seen)
+        previous = footprints.get(class_name, ClassFootprint(0, *([0] * len(Footprint._fields))))
+        footprints[class_name] = ClassFootprint(previous.instances + 1, *_add(Footprint(*previous[1:]), footprint))
+    return footprints
+
+
+def format_class_footprints(footprints):
+    """Returns the footprints returned by `class_footprints()` as human readable text.
+    """
+    lines = ['%-24s %9s %9s %9s %9s %9s %12s %10s' % ('Class', 'Instances', 'Mapped', 'Objects', 'Attributes',
+                                                     'Listeners', 'Bytes', 'Bytes/inst')]
+    for class_name, footprint in sorted(footprints.items()):
+        lines.append('%-24s %9d %9d %9d %9d %9d %12d %10d' % (class_name, footprint.instances,
+                                                             footprint.mapped_attributes, footprint.cloudio_objects,
+                                                             footprint.cloudio_attributes, footprint.listeners,
+                                                             footprint.retained_bytes,
+                                                             footprint.retained_bytes // footprint.instances))
+    return '\n'.join(lines)
+
+
+class AllocationTracker(object):
+    """Context manager measuring the memory allocated (tracemalloc) while the block runs.
+
+    Example:
+        with AllocationTracker() as allocations:
+            create_models()
+        allocations.assert_below(256 * 1024)
+    """
+
+    def __init__(self, collect=True, snapshots=False):
+        """
+        :param collect: Runs the garbage collector before and after the block
+        :param snapshots: Takes tracemalloc snapshots to report where the memory was allocated (slower)
+        """
+        self._collect = collect
+        self._snapshots = snapshots
+        self._started = False
+        self._memory_before = 0
+        self._snapshot_before = None
+        self._differences = []
+        self.allocated = None       # Bytes still allocated at the end of the block
+        self.peak = None            # Highest amount of bytes allocated during the block
+
+    def __enter__(self):
+        if self._collect:
+            gc.collect()
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        if self._snapshots:
+            self._snapshot_before = tracemalloc.take_snapshot()
+        if hasattr(tracemalloc, 'reset_peak'):     # Python 3.9+. Peak since start of tracing otherwise
+            tracemalloc.reset_peak()
+        self._memory_before = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self._collect:
+                gc.collect()
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            self.allocated = memory_after - self._memory_before
+            self.peak = memory_peak - self._memory_before
+            if self._snapshots:
+                self._differences = tracemalloc.take_snapshot().compare_to(self._snapshot_before, 'lineno')
+                self._snapshot_before = None
+        finally:
+            if self._started:
+                tracemalloc.stop()
+        return False
+
+    def top(self, limit=10):
+        """Returns the lines having allocated the most memory (needs `snapshots=True`).
+
+        :rtype list[str]
+        """
+        return [str(difference) for difference in self._differences[:limit]]
+
+    def assert_below(self, limit):
+        """Raises an AssertionError if more than `limit` bytes are still allocated at the end of the block.
+        """
+        if self.allocated >= limit:
+            raise AssertionError('\n'.join(['%d bytes allocated, limit is %d bytes!' % (self.allocated, limit)] +
+                                           self.top()))
+
+
+def _add(footprint, other):
+    return Footprint(*(value + other_value for value, other_value in zip(footprint, other)))
+
+
+def _node_footprint(cloudio_node, seen):
+    """Returns the number of objects and attributes of a node and the bytes they retain.
+    """
+    object_count = attribute_count = 0
+    size = sys.getsizeof(cloudio_node) + _deep_size(cloudio_node.__dict__, seen)
+    cloudio_objects = list(cloudio_node.get_objects().values())
+    while cloudio_objects:
+        cloudio_object = cloudio_objects.pop()
+        object_count += 1
+        internal = cloudio_object._internal
+        size += sys.getsizeof(cloudio_object) + _deep_size(cloudio_object.__dict__, seen)
+        size += sys.getsizeof(internal) + _deep_size(internal.__dict__, seen)
+        for cloudio_attribute in internal.get_attributes().values():
+            attribute_count += 1
+            size += sys.getsizeof(cloudio_attribute) + _deep_size(cloudio_attribute.__dict__, seen)
+        cloudio_objects += internal.get_objects().values()
+    return object_count, attribute_count, size
+
+
+def _deep_size(obj, seen, follow=True):
+    """Returns the size of the object and of the containers and values it holds.
+
+    Other objects (types, functions, cloud.iO items, connectors) are not followed. They are shared
+    or counted on their own.
+    """
+    if obj is None or id(obj) in seen:
+        return 0
+
+    if isinstance(obj, _CONTAINER_TYPES):
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if follow:
+            items = obj.items() if isinstance(obj, dict) else ((item, None) for item in obj)
+            for key, value in items:
+                size += _deep_size(key, seen) + _deep_size(value, seen)
+        return size
+
+    if isinstance(obj, _VALUE_TYPES):
+        seen.add(id(obj))
+        return sys.getsizeof(obj)
+
+    if type(obj).__module__.startswith('cloudio.glue') and not hasattr(obj, '_attribute_mapping'):
+        # Helpers of the connector (ex. SampleWindow, mirrors, attribute listeners)
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if hasattr(obj, '__dict__'):
+            size += _deep_size(obj.__dict__, seen)
+        for slot in getattr(type(obj), '__slots__', ()):
+            size += _deep_size(getattr(obj, slot, None), seen)
+        return size
+    return 0
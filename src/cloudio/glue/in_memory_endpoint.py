@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import threading
+import time
+
+from cloudio.endpoint.exception.cloudio_modification_exception import CloudioModificationException
+from cloudio.endpoint.interface.node_container import CloudioNodeContainer
+from cloudio.endpoint.topicuuid import TopicUuid
+
+PublishRecord = collections.namedtuple('PublishRecord', ['topic', 'value', 'timestamp', 'duration'])
+PublishRecord.__doc__ = """A message published by the InMemoryCloudioEndpoint.
+
+:param topic: Topic of the message (ex. '@update/<endpoint>/nodes/<node>/objects/<object>/attributes/<attribute>')
+:param value: Value of the attribute at the time it was published
+:param timestamp: Time (`time.perf_counter()`) the publish was completed
+:param duration: Time in seconds the publish took (including the simulated latency)
+"""
+
+
+class InMemoryCloudioEndpoint(CloudioNodeContainer):
+    """Stand-in for `CloudioEndpoint` keeping everything in memory.
+
+    Nodes are added like to a real endpoint. Instead of being sent to a broker,
+    attribute updates are recorded together with a timestamp. A publish latency
+    can be simulated to see how connectors behave with a slow transport.
+
+    Changes from the cloud (@set) are simulated using `set_attribute_from_cloud()`.
+
+    Used by tests and by the load generator (`python -m cloudio.glue.load_generator`).
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, uuid='in-memory-endpoint', publish_latency=0.0, max_records=None,
+                 clock=time.perf_counter, sleep=time.sleep):
+        """
+        :param uuid: Name of the endpoint
+        :param publish_latency: Time in seconds each publish takes
+        :type publish_latency: float
+        :param max_records: Maximum number of publishes kept in `published`. Older ones are dropped.
+                            None keeps all of them
+        :type max_records: int or None
+        """
+        super(InMemoryCloudioEndpoint, self).__init__()
+        self.uuid = uuid
+        self.nodes = {}
+        self._publish_latency = publish_latency
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._published = collections.deque(maxlen=max_records)
+        self._publish_count = 0
+
+    @property
+    def published(self):
+        """Publishes recorded so far (oldest first).
+
+        :rtype list[PublishRecord]
+        """
+        with self._lock:
+            return list(self._published)
+
+    @property
+    def publish_count(self):
+        """Number of publishes since creation or the last call to `clear()`, including dropped records.
+        """
+        return self._publish_count
+
+    def set_publish_latency(self, publish_latency):
+        self._publish_latency = publish_latency
+
+    def clear(self):
+        """Forgets the recorded publishes.
+        """
+        with self._lock:
+            self._published.clear()
+            self._publish_count = 0
+
+    def add_node(self, node_name, cls_or_object):
+        from cloudio.endpoint.node import CloudioNode
+
+        if not isinstance(cls_or_object, CloudioNode):
+            raise RuntimeError('Wrong cloud.iO object type')
+        assert node_name not in self.nodes, 'Node with given name already present!'
+
+        cls_or_object.set_name(node_name)
+        cls_or_object.set_parent_node_container(self)
+        self.nodes[node_name] = cls_or_object
+        self._record('@nodeAdded/' + cls_or_object.get_uuid().to_string(), None, self._clock())
+
+    def remove_node(self, node_name):
+        """Removes the node with the given name.
+
+        :return The removed node or None if not found
+        """
+        node = self.nodes.pop(node_name, None)
+        if node is not None:
+            self._record('@nodeRemoved/' + node.get_uuid().to_string(), None, self._clock())
+        return node
+
+    def get_node(self, node_name):
+        return self.nodes.get(node_name, None)
+
+    def set_attribute_from_cloud(self, topic, value, timestamp=None):
+        """Simulates a @set message coming from the cloud.
+
+        :param topic: Topic of the attribute with or without the '@set/' prefix
+                      (ex. '<endpoint>/nodes/<node>/objects/<object>/attributes/<attribute>')
+        :param value: The new value of the attribute
+        :param timestamp: Timestamp in milliseconds. Defaults to now, but always newer than the attribute's timestamp
+        :return True if the attribute was found and updated
+        """
+        if topic.startswith('@set/'):
+            topic = topic[len('@set/'):]
+
+        # Same location stack as CloudioEndpoint._set()
+        location = topic.split('/')[::-1]
+        if len(location) < 3 or location.pop() != self.uuid or location.pop() != 'nodes':
+            self.log.error('Invalid topic: %s' % topic)
+            return False
+
+        node = self.nodes.get(location.pop())
+        attribute = node.find_attribute(location) if node else None
+        if attribute is None:
+            self.log.error('Attribute for topic \'%s\' not found!' % topic)
+            return False
+
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+            if attribute.get_timestamp() is not None and attribute.get_timestamp() >= timestamp:
+                timestamp = attribute.get_timestamp() + 1
+        # Returns False if the value was rejected, None otherwise
+        return attribute.set_value_from_cloud(value, timestamp) is not False
+
+    def _record(self, topic, value, start):
+        if self._publish_latency:
+            self._sleep(self._publish_latency)
+        now = self._clock()
+
+        with self._lock:
+            self._published.append(PublishRecord(topic, value, now, now - start))
+            self._publish_count += 1
+
+    ######################################################################
+    # Interface implementations
+    #
+    def get_uuid(self):
+        return TopicUuid(self)
+
+    def get_name(self):
+        return self.uuid
+
+    def set_name(self, name):
+        raise CloudioModificationException('CloudioEndpoint name can not be changed!')
+
+    def is_online(self):
+        return True
+
+    def is_node_registered_within_endpoint(self):
+        # Keeps the structure of the nodes modifiable
+        return False
+
+    def attribute_has_changed_by_endpoint(self, attribute):
+        start = self._clock()
+        self._record('@update/' + attribute.get_uuid().to_string(), attribute.get_value(), start)
+
+    def attribute_has_changed_by_cloud(self, attribute):
+        pass
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Offline load generator for Model2CloudConnector.
+
+Creates synthetic models connected to an `InMemoryCloudioEndpoint` and drives them at
+a given update rate (model -> cloud) and cloud write rate (cloud -> model).
+Reports throughput, latencies, CPU time and memory. No network is needed.
+
+Example:
+    python -m cloudio.glue.load_generator --connectors 200 --attributes 20 --update-rate 5000 \\
+                                          --write-rate 100 --duration 10 --publish-latency 0.0002
+"""
+
+import argparse
+import collections
+import logging
+import random
+import sys
+import time
+import tracemalloc
+
+from .cloud_write_dispatcher import CloudWriteDispatcher
+from .in_memory_endpoint import InMemoryCloudioEndpoint
+from .metrics import percentile
+from .model_to_cloud_connector import Model2CloudConnector
+
+try:
+    import resource
+except ImportError:     # Not available on Windows
+    resource = None
+
+LoadReport = collections.namedtuple('LoadReport', ['connectors', 'attributes', 'duration',
+                                                   'updates', 'writes', 'publishes',
+                                                   'update_latency_p50', 'update_latency_p99',
+                                                   'write_latency_p50', 'write_latency_p99',
+                                                   'cpu_time', 'memory_peak', 'max_rss'])
+
+
+class SyntheticModel(Model2CloudConnector):
+    """Model with `attribute_count` float attributes ('value_0', 'value_1', ...) readable and writable from the cloud.
+    """
+
+    def __init__(self, attribute_count, clock=time.perf_counter):
+        super(SyntheticModel, self).__init__()
+        self._clock = clock
+        self.pending_writes = {}        # Model attribute name -> time the write was sent
+        self.write_latencies = []
+
+        attribute_mapping = {}
+        for index in range(attribute_count):
+            model_attribute_name = 'value_%d' % index
+            setattr(self, model_attribute_name, 0.0)
+            attribute_mapping[model_attribute_name] = {'topic': 'values.' + model_attribute_name,
+                                                       'attributeType': float,
+                                                       'constraints': ('read', 'write')}
+        self.set_attribute_mapping(attribute_mapping)
+
+    def on_attribute_set_from_cloud(self, attribute_name, cloudio_attr):
+        setattr(self, attribute_name, cloudio_attr.get_value())
+
+        sent = self.pending_writes.pop(attribute_name, None)
+        if sent is not None:
+            self.write_latencies.append(self._clock() - sent)
+
+
+def run_load(connectors=10, attributes=10, update_rate=1000.0, write_rate=10.0, duration=5.0,
+             publish_latency=0.0, dispatcher_workers=0, trace_memory=False, seed=0):
+    """Runs the load and returns the measured figures.
+
+    :param connectors: Number of synthetic models
+    :param attributes: Number of mapped attributes per model
+    :param update_rate: Model attribute changes per second sent to the cloud (0 = none)
+    :param write_rate: Writes per second coming from the cloud (0 = none)
+    :param duration: Duration of the run in seconds
+    :param publish_latency: Latency in seconds simulated for each publish
+    :param dispatcher_workers: If not 0, cloud writes are applied by a `CloudWriteDispatcher` with that many workers
+    :param trace_memory: Measures the peak of allocated memory using tracemalloc (slows the run down)
+    :param seed: Seed of the random attribute selection
+    :rtype: LoadReport
+    """
+    if trace_memory:
+        tracemalloc.start()
+
+    endpoint = InMemoryCloudioEndpoint(publish_latency=publish_latency, max_records=1)
+    dispatcher = CloudWriteDispatcher(max_workers=dispatcher_workers) if dispatcher_workers else None
+    models = []
+    for index in range(connectors):
+        model = SyntheticModel(attributes)
+        node = model.create_cloud_io_node(_NamingEndpoint(endpoint, 'model-%d' % index))
+        model.set_cloud_write_dispatcher(dispatcher)
+        models.append((model, node.get_uuid().to_string()))
+    endpoint.clear()
+
+    rand = random.Random(seed)
+    update_interval = 1.0 / update_rate if update_rate else None
+    write_interval = 1.0 / write_rate if write_rate else None
+    update_latencies = []
+    updates = writes = 0
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    end = start + duration
+    next_update = start if update_interval else float('inf')
+    next_write = start if write_interval else float('inf')
+
+    while True:
+        next_event = min(next_update, next_write)
+        if next_event >= end:
+            break
+        now = time.perf_counter()
+        if next_event > now:
+            time.sleep(next_event - now)
+
+        model, node_topic = models[rand.randrange(connectors)]
+        model_attribute_name = 'value_%d' % rand.randrange(attributes)
+
+        if next_update <= next_write:
+            value = rand.random()
+            setattr(model, model_attribute_name, value)
+            sent = time.perf_counter()
+            model._update_cloudio_attribute(model_attribute_name, value)
+            update_latencies.append(time.perf_counter() - sent)
+            updates += 1
+            next_update += update_interval
+        else:
+            model.pending_writes[model_attribute_name] = time.perf_counter()
+            endpoint.set_attribute_from_cloud('%s/objects/values/attributes/%s' % (node_topic, model_attribute_name),
+                                              rand.random())
+            writes += 1
+            next_write += write_interval
+
+    if dispatcher:
+        dispatcher.wait_idle()
+        dispatcher.shutdown()
+    elapsed = time.perf_counter() - start
+    cpu_time = time.process_time() - cpu_start
+
+    memory_peak = None
+    if trace_memory:
+        memory_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    max_rss = None
+    if resource is not None:
+        # Kilobytes on Linux
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    write_latencies = [latency for model, _ in models for latency in model.write_latencies]
+    return LoadReport(connectors=connectors, attributes=attributes, duration=elapsed,
+                      updates=updates, writes=writes, publishes=endpoint.publish_count,
+                      update_latency_p50=percentile(update_latencies, 50),
+                      update_latency_p99=percentile(update_latencies, 99),
+                      write_latency_p50=percentile(write_latencies, 50),
+                      write_latency_p99=percentile(write_latencies, 99),
+                      cpu_time=cpu_time, memory_peak=memory_peak, max_rss=max_rss)
+
+
+class _NamingEndpoint(object):
+    """Adds the node under the given name instead of the class name of the model.
+    """
+
+    def __init__(self, endpoint, node_name):
+        self._endpoint = endpoint
+        self._node_name = node_name
+
+    def add_node(self, node_name, node):
+        self._endpoint.add_node(self._node_name, node)
+
+
+def format_report(report):
+    """Returns the report as human readable text.
+    """
+    def ms(seconds):
+        return '-' if seconds is None else '%.3f ms' % (seconds * 1000)
+
+    def mib(size):
+        return '-' if size is None else '%.1f MiB' % (size / 1024.0 / 1024.0)
+
+    duration = report.duration or float('nan')
+    lines = ['Connectors:        %d x %d attributes' % (report.connectors, report.attributes),
+             'Duration:          %.2f s' % report.duration,
+             'Updates:           %d (%.1f/s)' % (report.updates, report.updates / duration),
+             'Publishes:         %d (%.1f/s)' % (report.publishes, report.publishes / duration),
+             'Cloud writes:      %d (%.1f/s)' % (report.writes, report.writes / duration),
+             'Update latency:    p50 %s, p99 %s' % (ms(report.update_latency_p50), ms(report.update_latency_p99)),
+             'Write latency:     p50 %s, p99 %s' % (ms(report.write_latency_p50), ms(report.write_latency_p99)),
+             'CPU time:          %.2f s (%.0f %%)' % (report.cpu_time, 100.0 * report.cpu_time / duration),
+             'Memory peak:       %s' % mib(report.memory_peak),
+             'Max RSS:           %s' % mib(report.max_rss)]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline load generator for cloud.iO glue connectors.')
+    parser.add_argument('-n', '--connectors', type=int, default=10, help='number of synthetic models')
+    parser.add_argument('-m', '--attributes', type=int, default=10, help='mapped attributes per model')
+    parser.add_argument('-u', '--update-rate', type=float, default=1000.0,
+                        help='model changes per second sent to the cloud')
+    parser.add_argument('-w', '--write-rate', type=float, default=10.0, help='writes per second from the cloud')
+    parser.add_argument('-d', '--duration', type=float, default=5.0, help='duration of the run in seconds')
+    parser.add_argument('--publish-latency', type=float, default=0.0, help='simulated publish latency in seconds')
+    parser.add_argument('--dispatcher-workers', type=int, default=0,
+                        help='apply cloud writes using a CloudWriteDispatcher with that many workers')
+    parser.add_argument('--trace-memory', action='store_true', help='measure allocated memory using tracemalloc')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.connectors < 1 or args.attributes < 1:
+        parser.error('At least one connector with one attribute is needed!')
+
+    report = run_load(connectors=args.connectors, attributes=args.attributes, update_rate=args.update_rate,
+                      write_rate=args.write_rate, duration=args.duration, publish_latency=args.publish_latency,
+                      dispatcher_workers=args.dispatcher_workers, trace_memory=args.trace_memory, seed=args.seed)
+    print(format_report(report))
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
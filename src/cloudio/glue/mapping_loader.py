@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+
+from .aggregation import AGGREGATE_FUNCTIONS
+from .change_detection import CHANGE_DETECTIONS, CHANGE_DETECTION_EQUALITY
+from .priority import PRIORITIES, PRIORITY_NORMAL
+
+log = logging.getLogger(__name__)
+
+# Increment whenever the layout of the compiled mapping changes. Invalidates all cached files.
+COMPILED_MAPPING_FORMAT = 2
+
+# Constraints known by the Model2CloudConnector class
+CONSTRAINTS = ('read', 'write', 'static')
+
+# Attribute type names accepted in mapping files
+ATTRIBUTE_TYPES = {'bool': bool, 'boolean': bool,
+                   'int': int, 'integer': int,
+                   'float': float, 'number': float,
+                   'str': str, 'string': str, }
+
+
+class AttributeMappingError(ValueError):
+    """Raised if an attribute mapping is not valid.
+
+    The `errors` attribute contains the list of all problems found.
+    """
+
+    def __init__(self, errors, source=None):
+        self.errors = list(errors)
+        self.source = source
+        message = 'Invalid attribute mapping%s:\n  ' % (' in \'%s\'' % source if source else '')
+        super(AttributeMappingError, self).__init__(message + '\n  '.join(self.errors))
+
+
+def validate_attribute_mapping(attribute_mapping, source=None):
+    """Checks the complete attribute mapping and reports all problems at once.
+
+    :param attribute_mapping: The attribute mapping to check
+    :type attribute_mapping: dict
+    :param source: Where the mapping comes from (used in the error message)
+    :raise AttributeMappingError: If at least one problem was found
+    """
+    errors = []
+
+    if not isinstance(attribute_mapping, dict):
+        raise AttributeMappingError(['Attribute mapping must be a dictionary!'], source)
+
+    for model_attribute_name, cloudio_attribute_mapping in attribute_mapping.items():
+        if not isinstance(cloudio_attribute_mapping, dict):
+            errors.append('\'%s\': Mapping entry must be a dictionary!' % model_attribute_name)
+            continue
+
+        for error in _validate_mapping_entry(cloudio_attribute_mapping):
+            errors.append('\'%s\': %s' % (model_attribute_name, error))
+
+    if errors:
+        raise AttributeMappingError(errors, source)
+
+
+def _validate_mapping_entry(cloudio_attribute_mapping):
+    """Returns the list of problems found in one attribute mapping entry.
+    """
+    errors = []
+
+    if 'topic' in cloudio_attribute_mapping:
+        topic = cloudio_attribute_mapping['topic']
+        if not isinstance(topic, str) or not topic or '' in topic.split('.'):
+            errors.append('Invalid topic \'%s\'!' % (topic,))
+    elif 'objectName' not in cloudio_attribute_mapping or 'attributeName' not in cloudio_attribute_mapping:
+        errors.append('Either \'topic\' or \'objectName\' and \'attributeName\' must be given!')
+
+    attribute_type = cloudio_attribute_mapping.get('attributeType')
+    if attribute_type is None:
+        errors.append('Entry \'attributeType\' missing!')
+    elif attribute_type in (bytes, 'bytes'):
+        # The endpoint only publishes bool, int, float and str values
+        errors.append('Attribute type \'bytes\' cannot be published! Use \'str\' and a \'toCloudioValueConverter\'.')
+    elif not isinstance(attribute_type, (str, type)) or \
+            (attribute_type not in ATTRIBUTE_TYPES.values() and attribute_type not in ATTRIBUTE_TYPES):
+        errors.append('Unsupported attribute type \'%s\'!' % (attribute_type,))
+
+    constraints = cloudio_attribute_mapping.get('constraints')
+    if not constraints or isinstance(constraints, str) or not isinstance(constraints, (tuple, list)):
+        errors.append('Entry \'constraints\' must be a non-empty list!')
+    else:
+        for constraint in constraints:
+            if constraint not in CONSTRAINTS:
+                errors.append('Unknown constraint \'%s\'!' % (constraint,))
+
+    if cloudio_attribute_mapping.get('priority', PRIORITY_NORMAL) not in PRIORITIES:
+        errors.append('Unknown priority \'%s\'!' % (cloudio_attribute_mapping['priority'],))
+
+    if cloudio_attribute_mapping.get('changeDetection', CHANGE_DETECTION_EQUALITY) not in CHANGE_DETECTIONS:
+        errors.append('Unknown change detection \'%s\'!' % (cloudio_attribute_mapping['changeDetection'],))
+
+    converter = cloudio_attribute_mapping.get('toCloudioValueConverter')
+    if converter is not None and not (callable(converter) or isinstance(converter, str)):
+        errors.append('Entry \'toCloudioValueConverter\' must be callable or a method name!')
+
+    if 'aggregate' in cloudio_attribute_mapping:
+        errors += _validate_aggregation(cloudio_attribute_mapping)
+
+    if 'samplePeriod' in cloudio_attribute_mapping:
+        sample_period = cloudio_attribute_mapping['samplePeriod']
+        if isinstance(sample_period, bool) or not isinstance(sample_period, (int, float)) or sample_period <= 0:
+            errors.append('Entry \'samplePeriod\' must be a positive number!')
+        if 'read' not in (cloudio_attribute_mapping.get('constraints') or ()):
+            errors.append('Sampled attributes must have the \'read\' constraint!')
+
+    return errors
+
+
+def _validate_aggregation(cloudio_attribute_mapping):
+    errors = []
+
+    functions = cloudio_attribute_mapping['aggregate']
+    if not functions or isinstance(functions, str) or not isinstance(functions, (tuple, list)):
+        errors.append('Entry \'aggregate\' must be a non-empty list!')
+    else:
+        for function in functions:
+            if function not in AGGREGATE_FUNCTIONS:
+                errors.append('Unknown aggregate function \'%s\'!' % (function,))
+
+    if cloudio_attribute_mapping.get('attributeType') not in (int, float, 'int', 'float'):
+        errors.append('Aggregated attributes must be of type \'int\' or \'float\'!')
+    if 'write' in (cloudio_attribute_mapping.get('constraints') or ()):
+        errors.append('Aggregated attributes cannot have the \'write\' constraint!')
+
+    interval = cloudio_attribute_mapping.get('aggregationInterval', 1)
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+        errors.append('Entry \'aggregationInterval\' must be a positive number!')
+
+    window_size = cloudio_attribute_mapping.get('windowSize', 1)
+    if isinstance(window_size, bool) or not isinstance(window_size, int) or window_size <= 0:
+        errors.append('Entry \'windowSize\' must be a positive integer!')
+
+    return errors
+
+
+def compile_attribute_mapping(attribute_mapping, source=None):
+    """Validates the attribute mapping and brings it into the form used by the Model2CloudConnector.
+
+    Attribute type names are replaced by the corresponding python types and
+    constraints are converted to tuples.
+
+    :return The compiled attribute mapping
+    :rtype dict
+    """
+    validate_attribute_mapping(attribute_mapping, source)
+
+    compiled_mapping = {}
+    for model_attribute_name, cloudio_attribute_mapping in attribute_mapping.items():
+        entry = dict(cloudio_attribute_mapping)
+        entry['attributeType'] = ATTRIBUTE_TYPES.get(entry['attributeType'], entry['attributeType'])
+        entry['constraints'] = tuple(entry['constraints'])
+        if 'aggregate' in entry:
+            entry['aggregate'] = tuple(entry['aggregate'])
+        compiled_mapping[model_attribute_name] = entry
+    return compiled_mapping
+
+
+def load_attribute_mapping(path, cache_directory=None, use_cache=True):
+    """Loads an attribute mapping from a JSON or YAML file.
+
+    The compiled mapping is cached in a JSON file keyed by the hash of the mapping
+    file. As long as the mapping file does not change, later calls skip parsing and
+    validation. The cache only holds data: a tampered cache file cannot run code, at
+    worst it is ignored.
+
+    :param path: Path to the mapping file (.json, .yaml or .yml)
+    :param cache_directory: Where to store the compiled mapping. Defaults to the
+                            '__pycache__' folder next to the mapping file
+    :param use_cache: Set to false to neither read nor write the cache
+    :return The compiled attribute mapping
+    :rtype dict
+    :raise AttributeMappingError: If the mapping is not valid
+    """
+    with open(path, 'rb') as mapping_file:
+        content = mapping_file.read()
+
+    cache_path = None
+    if use_cache:
+        cache_path = _cache_path(path, content, cache_directory)
+        compiled_mapping = _read_cache(cache_path)
+        if compiled_mapping is not None:
+            return compiled_mapping
+
+    compiled_mapping = compile_attribute_mapping(_parse_mapping_file(path, content), source=path)
+
+    if cache_path:
+        _write_cache(cache_path, compiled_mapping)
+    return compiled_mapping
+
+
+def _parse_mapping_file(path, content):
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('Package \'PyYAML\' is needed to load mapping file \'%s\'!' % path)
+        return yaml.safe_load(content)
+    return json.loads(content.decode('utf-8'))
+
+
+def _cache_path(path, content, cache_directory):
+    digest = hashlib.sha256(content)
+    digest.update(str(COMPILED_MAPPING_FORMAT).encode())
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(os.path.abspath(path)), '__pycache__')
+    return os.path.join(cache_directory, '%s.%s.mapping' % (os.path.basename(path), digest.hexdigest()[:32]))
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cached_mapping = json.loads(cache_file.read().decode('utf-8'))
+
+        # Bring the JSON data back into the compiled form
+        compiled_mapping = {}
+        for model_attribute_name, entry in cached_mapping.items():
+            entry['attributeType'] = ATTRIBUTE_TYPES[entry['attributeType']]
+            entry['constraints'] = tuple(entry['constraints'])
+            if 'aggregate' in entry:
+                entry['aggregate'] = tuple(entry['aggregate'])
+            compiled_mapping[model_attribute_name] = entry
+        return compiled_mapping
+    except FileNotFoundError:
+        pass
+    except Exception as exception:
+        log.warning('Ignoring unreadable mapping cache \'%s\': %s' % (cache_path, exception))
+    return None
+
+
+def _write_cache(cache_path, compiled_mapping):
+    cache_directory, cache_name = os.path.split(cache_path)
+    try:
+        # Attribute types are stored by name
+        content = json.dumps({model_attribute_name: dict(entry, attributeType=entry['attributeType'].__name__)
+                              for model_attribute_name, entry in compiled_mapping.items()}).encode('utf-8')
+    except (TypeError, ValueError) as exception:
+        # Ex. YAML values without JSON counterpart
+        log.warning('Mapping cannot be cached in \'%s\': %s' % (cache_path, exception))
+        return
+
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+
+        # Remove caches of previous versions of the mapping file
+        prefix = cache_name.rsplit('.', 2)[0] + '.'
+        for name in os.listdir(cache_directory):
+            if name.startswith(prefix) and name.endswith('.mapping') and name != cache_name and \
+                    '.' not in name[len(prefix):-len('.mapping')]:
+                os.remove(os.path.join(cache_directory, name))
+
+        # Write to a temporary file first. Concurrent readers never see a partial cache.
+        temporary_path = '%s.%d.tmp' % (cache_path, os.getpid())
+        with open(temporary_path, 'wb') as cache_file:
+            cache_file.write(content)
+        os.replace(temporary_path, cache_path)
+    except OSError as exception:
+        log.warning('Could not write mapping cache \'%s\': %s' % (cache_path, exception))
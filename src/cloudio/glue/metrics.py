@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+
+def percentile(values, percent):
+    """Returns the percentile (nearest rank) of the given values or None if there are no values.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(0, min(len(values), rank) - 1)]
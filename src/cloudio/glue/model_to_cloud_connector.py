@@ -1,11 +1,46 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import inspect
 import logging
+import threading
+import time
+import weakref
 
+import cloudio.common.utils.timestamp_helpers as TimeStampProvider
 from cloudio.common.utils import attribute_helpers
+from cloudio.endpoint.exception.cloudio_modification_exception import CloudioModificationException
 from cloudio.endpoint.interface import CloudioAttributeListener
 
+from .aggregation import DEFAULT_AGGREGATION_INTERVAL, DEFAULT_WINDOW_SIZE, SampleWindow
+from .change_detection import CHANGE_DETECTION_EQUALITY, CHANGE_DETECTION_IDENTITY, fingerprint, \
+    get_change_detection
+from .change_stream import DEFAULT_MAX_QUEUE_SIZE, ChangeEvent, ChangeSubscription
+from .mapping_loader import load_attribute_mapping
+from .node_template import NodeTemplate, assign_value
+from .priority import get_priority, priority_rank
+from .rate_limited_log import RateLimitedLog
+from .snapshot import Snapshot, SnapshotValue, encode_snapshot_json
+
+# Placeholder for 'nothing published yet' (None is a valid value)
+_NOTHING = object()
+
+# Cloud writes being applied by the current thread. List of (connector, model attribute name)
+_cloud_write_origin = threading.local()
+
+# Protects the (copy on write) change subscriptions of all connectors
+_change_subscriptions_lock = threading.Lock()
+
+# Structure of a connector tree (see Model2CloudConnector._node_template_key()) -> NodeTemplate, or None if
+# the structure was seen once only. Least recently used first
+_node_templates = collections.OrderedDict()
+_node_templates_lock = threading.Lock()
+# Number of structures remembered. Structures created per instance must not keep their templates forever
+_MAX_NODE_TEMPLATES = 64
+# Methods defining the structure of the node. Connectors overriding one of them do not use templates
+_NODE_STRUCTURE_METHODS = ('_create_cloudio_attributes', '_create_cloudio_attribute', 'create_cloudio_object',
+                           '_location_stack_of', '_location_stack_from_topic')
+
 
 class Model2CloudConnector(CloudioAttributeListener):
     """Connects a class to cloud.iO and provides helper methods to update attributes in the cloud.
@@ -16,33 +51,508 @@ class Model2CloudConnector(CloudioAttributeListener):
     """
 
     log = logging.getLogger(__name__)
+    # Used for messages which may occur on every attribute update
+    rate_limited_log = RateLimitedLog(log)
 
     def __init__(self, **kwargs):
         super(Model2CloudConnector, self).__init__(**kwargs)
 
         self._attribute_mapping = None
         self._cloudio_node = None
+        self._cloudio_endpoint = None
+        self._attribute_listener = _WeakAttributeListener(self)
+        self._location_stacks = {}              # Model attribute name -> location stack
+        self._location_stacks_node_name = None  # Node name the location stacks were computed for
+        self._cloudio_attributes = {}           # Model attribute name -> cloud.iO attribute
+        self._model_attribute_names = {}        # Listened cloud.iO attribute ('write') -> model attribute name
+        self._published_change_keys = {}        # Model attribute name -> value/fingerprint published last time
+        # Listened cloud.iO attribute -> (value, time) published by the model last time. Kept when re-binding
+        self._published_write_values = {}
+        self._read_attribute_names = ()         # 'read' attributes synced periodically (most important first)
+        self._read_attribute_name_set = frozenset()     # Same as set, for lookups
+        self._static_attribute_names = ()       # 'static' attributes sent once per node (most important first)
+        self._sent_static_attributes = set()
+        self._parent_connector = None
+        self._topic_prefix = None
+        self._child_connectors = []
+        self._sync_pacer = None
+        self._sync_progress_callback = None
+        self._dirty_tracking = False
+        self._dirty_attributes = set()
+        self._dirty_attributes_lock = threading.Lock()
+        self._cloud_write_dispatcher = None
+        self._publish_scheduler = None
+        self._snapshot_transport = None
+        self._snapshot_encoder = encode_snapshot_json
+        self._snapshot_values = None            # Values collected while taking a snapshot
+        self._sample_windows = {}               # Model attribute name -> SampleWindow ('aggregate' entries)
+        self._aggregation_clock = time.monotonic
+        self._mirrors = []                      # Further nodes receiving the published values (see add_mirror_endpoint())
+        self._cloud_write_acknowledgement = None
+        self._change_subscriptions = ()         # See subscribe_changes()
+        self._update_recorder = None
 
     def set_attribute_mapping(self, attribute_mapping):
-        self._attribute_mapping = attribute_mapping
+        """Sets the mapping of the model attributes to the cloud.iO attributes.
+
+        If the model is connected to a node created by `create_cloud_io_node()`, the new mapping
+        is applied incrementally: only the entries added, changed or removed are processed. The
+        cloud.iO attributes of the node are created or removed as needed and the state of
+        untouched entries is kept. Nodes given by `set_cloudio_buddy()` are not modified.
+        Passing the current mapping again (ex. after changing it in place) re-creates the node.
+
+        :raise CloudioModificationException: If the structure of a node registered within its endpoint
+                                             must change and the node cannot be re-created
+        """
+        if self._cloudio_node is not None and self._attribute_mapping is not None and \
+                self._root_connector()._cloudio_endpoint is not None:
+            self._reload_attribute_mapping(attribute_mapping)
+            return
+
+        self._reset_attribute_mapping(attribute_mapping)
         if self._cloudio_node:
             self._setup_attribute_mapping()
 
+    def _reset_attribute_mapping(self, attribute_mapping):
+        self._attribute_mapping = attribute_mapping
+        self._location_stacks = {}
+        self._cloudio_attributes = {}
+        self._published_change_keys = {}
+        self._published_write_values = {}
+        self._sample_windows = self._create_sample_windows()
+        self._create_sync_plan()
+        self._sent_static_attributes = set()
+        self.mark_dirty()
+
+    def _reload_attribute_mapping(self, attribute_mapping):
+        """Applies a new mapping to a connector having a node. Only the entries that changed are processed.
+        """
+        old_mapping = self._attribute_mapping
+        if attribute_mapping is old_mapping:
+            # Changed in place: the previous entries are lost
+            self._reset_attribute_mapping(attribute_mapping)
+            self._recreate_cloudio_nodes()
+            return
+
+        removed = [name for name in old_mapping if name not in attribute_mapping]
+        added = [name for name in attribute_mapping if name not in old_mapping]
+        changed = [name for name, cloudio_attribute_mapping in attribute_mapping.items()
+                   if name in old_mapping and old_mapping[name] is not cloudio_attribute_mapping and
+                   old_mapping[name] != cloudio_attribute_mapping]
+        # Changed entries keep their cloud.iO attribute(s) if location and type stay the same
+        moved = [name for name in changed
+                 if self._structure_of(old_mapping[name]) != self._structure_of(attribute_mapping[name])]
+
+        cloudio_nodes = [self._cloudio_node] + [mirror.cloudio_node for mirror in self._root_connector()._mirrors]
+        if (removed or moved or added) and \
+                not all(_is_structure_modifiable(cloudio_node) for cloudio_node in cloudio_nodes):
+            # Structure of registered nodes cannot be modified
+            self._reset_attribute_mapping(attribute_mapping)
+            self._recreate_cloudio_nodes()
+            return
+
+        mirrors = self._root_connector()._mirrors
+        for model_attribute_name in removed + changed:
+            cloudio_attribute_mapping = old_mapping[model_attribute_name]
+            cloudio_attribute_objects = [self._cloudio_attributes.pop(model_attribute_name, None)]
+            for function in cloudio_attribute_mapping.get('aggregate', ()):
+                cloudio_attribute_objects.append(self._cloudio_attributes.pop((model_attribute_name, function), None))
+
+            for cloudio_attribute_object in cloudio_attribute_objects:
+                if cloudio_attribute_object is None:
+                    continue
+                if self._model_attribute_names.pop(cloudio_attribute_object, None) is not None:
+                    cloudio_attribute_object.remove_listener(self._attribute_listener)
+                self._published_write_values.pop(cloudio_attribute_object, None)
+                for mirror in mirrors:
+                    mirror.cloudio_attributes.pop(cloudio_attribute_object, None)
+
+            if model_attribute_name in removed or model_attribute_name in moved:
+                for cloudio_node in cloudio_nodes:
+                    self._remove_cloudio_attribute(cloudio_node, cloudio_attribute_mapping)
+
+            self._location_stacks.pop(model_attribute_name, None)
+            self._published_change_keys.pop(model_attribute_name, None)
+            self._sample_windows.pop(model_attribute_name, None)
+            self._sent_static_attributes.discard(model_attribute_name)
+            self._dirty_attributes.discard(model_attribute_name)
+
+        self._attribute_mapping = attribute_mapping
+
+        for model_attribute_name in added + moved:
+            for cloudio_node in cloudio_nodes:
+                self._create_cloudio_attribute(cloudio_node, attribute_mapping[model_attribute_name])
+
+        now = self._aggregation_clock()
+        for model_attribute_name in changed + added:
+            cloudio_attribute_mapping = attribute_mapping[model_attribute_name]
+            if 'aggregate' in cloudio_attribute_mapping:
+                self._sample_windows[model_attribute_name] = SampleWindow(
+                    cloudio_attribute_mapping.get('windowSize', DEFAULT_WINDOW_SIZE),
+                    cloudio_attribute_mapping.get('aggregationInterval', DEFAULT_AGGREGATION_INTERVAL), now)
+            if 'write' in cloudio_attribute_mapping['constraints']:
+                self._listen_to_cloudio_attribute(model_attribute_name, cloudio_attribute_mapping)
+            self.mark_dirty(model_attribute_name)
+
+        if removed or changed or added:
+            self._create_sync_plan()
+
+    def _structure_of(self, cloudio_attribute_mapping):
+        """Returns what defines the cloud.iO attribute(s) created for an attribute mapping entry.
+        """
+        return (tuple(self._location_stack_of(cloudio_attribute_mapping)), cloudio_attribute_mapping['attributeType'],
+                tuple(cloudio_attribute_mapping.get('aggregate', ())))
+
+    def _recreate_cloudio_nodes(self):
+        """Re-creates the node of the top connector and the mirror nodes to change their structure.
+        """
+        connector = self._root_connector()
+        cloudio_endpoint = connector._cloudio_endpoint
+        if cloudio_endpoint is None:
+            raise CloudioModificationException('Structure of node \'%s\' cannot be changed!' %
+                                               connector._cloudio_node.get_name())
+
+        connector._remove_node_from_endpoint(cloudio_endpoint, connector._cloudio_node)
+        connector.create_cloud_io_node(cloudio_endpoint)
+
+        mirrors, connector._mirrors = connector._mirrors, []
+        for mirror in mirrors:
+            connector._remove_node_from_endpoint(mirror.cloudio_endpoint, mirror.cloudio_node)
+            connector.add_mirror_endpoint(mirror.cloudio_endpoint, mirror.publish_scheduler)
+
+    def _create_sample_windows(self):
+        now = self._aggregation_clock()
+        return {model_attribute_name: SampleWindow(cloudio_attribute_mapping.get('windowSize', DEFAULT_WINDOW_SIZE),
+                                                   cloudio_attribute_mapping.get('aggregationInterval',
+                                                                                 DEFAULT_AGGREGATION_INTERVAL),
+                                                   now)
+                for model_attribute_name, cloudio_attribute_mapping in (self._attribute_mapping or {}).items()
+                if 'aggregate' in cloudio_attribute_mapping}
+
+    def _create_sync_plan(self):
+        """Splits the mapped attributes by constraint so the syncs do not need to check them again.
+        """
+        read_attribute_names = []
+        static_attribute_names = []
+        for model_attribute_name, cloudio_attribute_mapping in (self._attribute_mapping or {}).items():
+            # Invalid entries are reported when the cloud.iO node is set
+            constraints = cloudio_attribute_mapping.get('constraints', ())
+            if 'static' in constraints:
+                static_attribute_names.append(model_attribute_name)
+            elif 'read' in constraints:
+                read_attribute_names.append(model_attribute_name)
+
+        # Send most important attributes first (sort is stable, mapping order is kept otherwise)
+        def rank(name):
+            return priority_rank(self._attribute_mapping[name])
+        self._read_attribute_names = tuple(sorted(read_attribute_names, key=rank))
+        self._read_attribute_name_set = frozenset(read_attribute_names)
+        self._static_attribute_names = tuple(sorted(static_attribute_names, key=rank))
+
+    def load_attribute_mapping(self, path, cache_directory=None):
+        """Loads the attribute mapping from a JSON or YAML file.
+
+        The mapping is validated completely and its compiled form is cached,
+        see `cloudio.glue.mapping_loader.load_attribute_mapping()`.
+        A 'toCloudioValueConverter' given as string is resolved to the method of
+        the same name.
+
+        :param path: Path to the mapping file
+        :raise AttributeMappingError: If the mapping is not valid
+        """
+        attribute_mapping = load_attribute_mapping(path, cache_directory=cache_directory)
+        self.set_attribute_mapping(self._resolve_value_converters(attribute_mapping))
+
+    def _resolve_value_converters(self, attribute_mapping):
+        """Replaces value converters given by method name with the method of this object.
+
+        :return The attribute mapping. Entries with resolved converters are copies.
+        """
+        resolved_mapping = attribute_mapping
+        for model_attribute_name, cloudio_attribute_mapping in attribute_mapping.items():
+            converter = cloudio_attribute_mapping.get('toCloudioValueConverter')
+            if isinstance(converter, str):
+                if resolved_mapping is attribute_mapping:
+                    resolved_mapping = dict(attribute_mapping)
+                resolved_mapping[model_attribute_name] = dict(cloudio_attribute_mapping,
+                                                              toCloudioValueConverter=getattr(self, converter))
+        return resolved_mapping
+
+    def set_sync_pacer(self, sync_pacer, progress_callback=None):
+        """Sends forced updates of the cloud.iO attributes through the given pacer.
+
+        Attributes are then sent in order of their 'priority' mapping entry ('high' first).
+        The pacer is set on the child connectors too.
+
+        :param sync_pacer: The pacer to use. Typically the one returned by `SyncPacer.for_endpoint()`
+        :type sync_pacer: SyncPacer or None
+        :param progress_callback: Called as `progress_callback(connector, synced, total)` after each
+                                  attribute of a connector. The sync of a connector is complete when
+                                  `synced` equals `total`.
+        """
+        self._sync_pacer = sync_pacer
+        self._sync_progress_callback = progress_callback
+        for child_connector in self._child_connectors:
+            child_connector.set_sync_pacer(sync_pacer, progress_callback)
+
+    def add_child_connector(self, child_connector, topic_prefix):
+        """Attaches a child connector to this connector.
+
+        The attributes of the child are placed below the object given by `topic_prefix`
+        (ex. 'modules.slot-1') in the cloud.iO node of this connector. Child topics are
+        relative to this object. Children can have children themselves.
+
+        Updating the attributes of this connector also updates the attributes of all children.
+        Children without own settings get the sync pacer, cloud write dispatcher, publish scheduler,
+        cloud write acknowledgement and update recorder of this connector.
+
+        Children must be added before the cloud.iO node gets created.
+
+        :param child_connector: The connector to attach
+        :type child_connector: Model2CloudConnector
+        :param topic_prefix: Topic of the object containing the child's attributes
+        :type topic_prefix: str
+        """
+        assert self._cloudio_node is None, 'Child connectors must be added before the cloud.iO node is set!'
+        assert child_connector._parent_connector is None, 'Connector is already attached to a parent!'
+        assert child_connector is not self
+
+        child_connector._parent_connector = self
+        child_connector._topic_prefix = topic_prefix
+        if child_connector._sync_pacer is None:
+            child_connector.set_sync_pacer(self._sync_pacer, self._sync_progress_callback)
+        if child_connector._cloud_write_dispatcher is None:
+            child_connector.set_cloud_write_dispatcher(self._cloud_write_dispatcher)
+        if child_connector._publish_scheduler is None:
+            child_connector.set_publish_scheduler(self._publish_scheduler)
+        if child_connector._cloud_write_acknowledgement is None:
+            child_connector.set_cloud_write_acknowledgement(self._cloud_write_acknowledgement)
+        if child_connector._update_recorder is None:
+            child_connector.set_update_recorder(self._update_recorder)
+        self._child_connectors.append(child_connector)
+
     def set_cloudio_buddy(self, cloudio_node):
         """Sets the counterpart of the Model on the cloud side.
 
+        Child connectors get connected to the same node.
+
+        Can be called again to re-bind the model to a new node (ex. after the endpoint
+        was rebuilt). The mapping and the location stacks computed for it are reused,
+        only the references to the cloud.iO attributes are resolved again.
+        `_on_cloudio_node_created()` is called for the new node too.
+
+        Before `_on_cloudio_node_created()` is called, the values the 'write' attributes of the
+        node already got from the cloud are applied to the model in one batch (see
+        `_hydrate_write_attributes()`).
+
         :param cloudio_node:
         :type cloudio_node: CloudioNode
         """
-        assert self._cloudio_node is None, 'Cloudio buddy can be set only once!'
+        if self._cloudio_node is not None and self._cloudio_node is not cloudio_node:
+            # Re-binding. The old node stays in its endpoint
+            self._remove_attribute_listeners()
+            self._cloudio_endpoint = None
         self._cloudio_node = cloudio_node
+        self._cloudio_attributes = {}
+        self._published_change_keys = {}
+        self._sent_static_attributes = set()
+        for mirror in self._mirrors:
+            # Keys are attributes of the previous node
+            mirror.cloudio_attributes.clear()
 
         if self._attribute_mapping:
             # Map write attributes
             self._setup_attribute_mapping()
+
+        for child_connector in self._child_connectors:
+            child_connector.set_cloudio_buddy(cloudio_node)
+
+        if self._attribute_mapping:
+            # Values already set from the cloud (ex. retained setpoints) before the model sees the node
+            self._hydrate_write_attributes()
             # Now cloud.iO node is ready
             self._on_cloudio_node_created()
 
+    def add_mirror_endpoint(self, cloudio_endpoint, publish_scheduler=None):
+        """Publishes the model to a further endpoint (ex. a local historian) in addition to its cloud.iO node.
+
+        A node with the same structure is added to the endpoint. Values are read, converted and
+        checked for changes once, then published to the node of the model and to all mirrors.
+
+        Each mirror can have its own `PublishScheduler` (queue and throttle). A started scheduler
+        publishes on its own thread, so a slow endpoint does not hold back the others. Without
+        scheduler, the mirror is updated by the thread updating the model.
+
+        Mirrors only publish. Changes from the cloud are accepted from the node of the model only.
+
+        :param cloudio_endpoint: The endpoint to add the mirror node to
+        :param publish_scheduler: Scheduler used to publish to this endpoint
+        :type publish_scheduler: PublishScheduler or None
+        :return The node added to the endpoint
+        :rtype CloudioRuntimeNode
+        """
+        assert self._parent_connector is None, 'Mirrors must be added to the top connector!'
+
+        cloudio_runtime_node = self._create_cloudio_node()
+        cloudio_endpoint.add_node(self.__class__.__name__, cloudio_runtime_node)
+
+        self._mirrors.append(_Mirror(cloudio_runtime_node, cloudio_endpoint, publish_scheduler))
+
+        # Static attributes were only sent to the nodes present so far
+        connectors = [self]
+        while connectors:
+            connector = connectors.pop()
+            connector._sent_static_attributes = set()
+            connectors += connector._child_connectors
+        return cloudio_runtime_node
+
+    def remove_mirror(self, cloudio_node):
+        """Stops publishing to a node added by `add_mirror_endpoint()` and removes it from its endpoint.
+
+        :return True if the node was a mirror of this connector
+        """
+        for mirror in self._mirrors:
+            if mirror.cloudio_node is cloudio_node:
+                self._mirrors.remove(mirror)
+                self._remove_node_from_endpoint(mirror.cloudio_endpoint, cloudio_node)
+                return True
+        return False
+
+    def set_cloud_write_dispatcher(self, cloud_write_dispatcher):
+        """Applies changes coming from the cloud using the given dispatcher.
+
+        By default changes from the cloud are applied to the model by the thread
+        serving the MQTT client connection. The dispatcher is set on the child connectors too.
+
+        :param cloud_write_dispatcher: The dispatcher to use or None to apply changes directly
+        :type cloud_write_dispatcher: CloudWriteDispatcher or None
+        """
+        self._cloud_write_dispatcher = cloud_write_dispatcher
+        for child_connector in self._child_connectors:
+            child_connector.set_cloud_write_dispatcher(cloud_write_dispatcher)
+
+    def set_publish_scheduler(self, publish_scheduler):
+        """Sends the updates of the cloud.iO attributes through the given scheduler.
+
+        The lane is given by the 'priority' entry of the attribute mapping. By default
+        updates are published directly by the thread updating the model. The scheduler is set
+        on the child connectors too.
+
+        :param publish_scheduler: The scheduler to use or None to publish directly
+        :type publish_scheduler: PublishScheduler or None
+        """
+        self._publish_scheduler = publish_scheduler
+        for child_connector in self._child_connectors:
+            child_connector.set_publish_scheduler(publish_scheduler)
+
+    def set_snapshot_transport(self, snapshot_transport, encoder=encode_snapshot_json):
+        """Enables the snapshot mode.
+
+        In snapshot mode, `_update_cloudio_attributes()` gathers the changed values of this
+        connector and of its children into one `Snapshot` instead of publishing each attribute.
+        The encoded snapshot is handed over to the transport, which sends it as one message.
+        The attributes of the node are updated without being published.
+
+        Updates of single attributes (`_update_cloudio_attribute()`) are still published one by one.
+
+        :param snapshot_transport: Called as `snapshot_transport(topic, payload)`. None disables the snapshot mode
+        :param encoder: Converts the `Snapshot` to the payload. Defaults to compact JSON
+        """
+        self._snapshot_transport = snapshot_transport
+        self._snapshot_encoder = encoder
+
+    def set_cloud_write_acknowledgement(self, acknowledgement_transport):
+        """Acknowledges the writes from the cloud instead of publishing them back.
+
+        While a value set from the cloud is applied to the model, updates of the same attribute
+        by the thread applying it are echoes (ex. a `cloudio_attribute` setter). Echoes of the
+        value set from the cloud are never published. If the model changes the value (ex. clamps
+        it), the new value is published as usual.
+
+        With an acknowledgement transport, echoes are acknowledged by a small message instead.
+        The transport is set on the child connectors too.
+
+        :param acknowledgement_transport: Called as `acknowledgement_transport(topic, timestamp)` with
+                                          topic '@ack/<attribute uuid>' and the timestamp of the write
+                                          (milliseconds). None disables the acknowledgements
+        """
+        self._cloud_write_acknowledgement = acknowledgement_transport
+        for child_connector in self._child_connectors:
+            child_connector.set_cloud_write_acknowledgement(acknowledgement_transport)
+
+    def set_update_recorder(self, update_recorder):
+        """Sets the recorder logging the values given to the connector and the values set from the cloud.
+
+        The recorder is set on the child connectors too. Recordings can be fed into connectors
+        later using `UpdateReplayer`. Set None to stop recording.
+
+        :param update_recorder: The recorder or None
+        :type update_recorder: UpdateRecorder or None
+        """
+        self._update_recorder = update_recorder
+        for child_connector in self._child_connectors:
+            child_connector.set_update_recorder(update_recorder)
+
+    def subscribe_changes(self, model_attribute_names=None, topic_prefix=None, max_queue_size=DEFAULT_MAX_QUEUE_SIZE,
+                          callback=None):
+        """Subscribes to the changes of the model attributes sent to the cloud.
+
+        Local consumers (HMI, loggers, rule engines) receive the same values as the cloud, after
+        change detection and conversion, instead of polling the model. Values set from the cloud
+        are received too (`ChangeEvent.from_cloud`). Subscriptions on a connector also receive
+        the changes of its child connectors.
+
+        :param model_attribute_names: Names of the model attributes to receive. None for all
+        :param topic_prefix: Only receive attributes located below this topic relative to the node (ex. 'status')
+        :param max_queue_size: Maximum number of queued events. The oldest events are dropped if the queue is full
+        :param callback: Called with each `ChangeEvent` by the publishing thread instead of queueing it
+        :rtype ChangeSubscription
+        """
+        subscription = ChangeSubscription(model_attribute_names, topic_prefix, max_queue_size, callback)
+        with _change_subscriptions_lock:
+            self._change_subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe_changes(self, subscription):
+        """Removes and closes a subscription returned by `subscribe_changes()`.
+        """
+        subscription.close()
+        with _change_subscriptions_lock:
+            self._change_subscriptions = tuple(other for other in self._change_subscriptions
+                                               if other is not subscription)
+
+    def enable_dirty_tracking(self, enable=True):
+        """Enables or disables tracking of changed model attributes.
+
+        With dirty tracking enabled, a non-forced `_update_cloudio_attributes()` only visits
+        the attributes marked dirty since the previous update. Attributes are marked dirty
+        by the `cloudio_attribute` decorator or by calling `mark_dirty()`.
+
+        After enabling, all mapped attributes are marked dirty.
+        """
+        self._dirty_tracking = enable
+        with self._dirty_attributes_lock:
+            self._dirty_attributes = set(self._attribute_mapping) if enable and self._attribute_mapping else set()
+
+    def mark_dirty(self, *model_attribute_names):
+        """Marks model attributes as changed. Without argument all mapped attributes are marked.
+
+        Has no effect if dirty tracking is not enabled.
+        """
+        if self._dirty_tracking:
+            with self._dirty_attributes_lock:
+                if model_attribute_names:
+                    self._dirty_attributes.update(model_attribute_names)
+                elif self._attribute_mapping:
+                    self._dirty_attributes.update(self._attribute_mapping)
+
+    def _take_dirty_attributes(self):
+        """Returns the attributes marked dirty and clears the dirty set.
+        """
+        with self._dirty_attributes_lock:
+            dirty_attributes, self._dirty_attributes = self._dirty_attributes, set()
+        return dirty_attributes
+
     def _on_cloudio_node_created(self):
         """Called after cloud.iO node is connected to the model.
 
@@ -56,52 +566,222 @@ class Model2CloudConnector(CloudioAttributeListener):
 
         adds it to the cloud.iO endpoint and connects both objects together.
 
+        The attributes of child connectors (see `add_child_connector()`) are
+        added to the same node.
+
+        The structure of the node is built once for all connectors having the same mapping
+        (ex. all instances of a model class). Further nodes are cloned from it.
+
+        If the model is already connected to a node, it gets re-bound to the new node
+        (see `set_cloudio_buddy()`).
+
         :param cloudio_endpoint The endpoint to add the node to
         :type cloudio_endpoint CloudioEndpoint
         """
-        from cloudio.endpoint.runtime import CloudioRuntimeNode
-        from cloudio.endpoint.runtime import CloudioRuntimeObject
-
-        if self._attribute_mapping is not None:
+        if self._attribute_mapping is not None or self._child_connectors:
             # Create the node which will represent this object in the cloud
-            cloudio_runtime_node = CloudioRuntimeNode()
-            cloudio_runtime_node.declare_implemented_interface('NodeInterface')
-
-            # Create cloud.iO attributes and add them to the corresponding cloud.iO object
-            for model_attribute_name, cloudio_attribute_mapping in self._attribute_mapping.items():
-                if 'topic' in cloudio_attribute_mapping:
-                    # Convert from 'human readable topic' to 'location stack' representation
-                    location_stack = self._location_stack_from_topic(cloudio_attribute_mapping['topic'])
-                    # Get the cloudio object needed to add the attribute. Create object branch structure
-                    # if needed
-                    cloudio_runtime_object = self.create_cloudio_object(cloudio_runtime_node, location_stack.copy())
-
-                    # Add attribute to object
-                    cloudio_runtime_object.add_attribute(name=location_stack[0],
-                                                         atype=cloudio_attribute_mapping['attributeType'])
-                else:
-                    cloudio_runtime_object = cloudio_runtime_node.find_object([cloudio_attribute_mapping['objectName'],
-                                                                               'objects'])
-                    if cloudio_runtime_object is None:
-                        # Create object
-                        cloudio_runtime_object = CloudioRuntimeObject()
-                        # Add object to the node
-                        cloudio_runtime_node.add_object(cloudio_attribute_mapping['objectName'], cloudio_runtime_object)
-
-                    # Add attribute to object
-                    cloudio_runtime_object.add_attribute(name=cloudio_attribute_mapping['attributeName'],
-                                                         atype=cloudio_attribute_mapping['attributeType'])
+            cloudio_runtime_node = self._create_cloudio_node()
 
             # Add node to endpoint
             cloudio_endpoint.add_node(self.__class__.__name__, cloudio_runtime_node)
 
             # Connect cloud.iO node to this object
             self.set_cloudio_buddy(cloudio_runtime_node)
+            self._cloudio_endpoint = cloudio_endpoint
             return cloudio_runtime_node
         else:
             self.log.warning('Attribute \'_attribute_mapping\' needs to be initialized to create cloud.iO node!')
         return None
 
+    def detach(self):
+        """Disconnects the model from its cloud.iO node.
+
+        Removes the listeners from the cloud.iO attributes and removes the node from the
+        endpoint it was added to by `create_cloud_io_node()`. Child connectors are detached too.
+        Mirror nodes (see `add_mirror_endpoint()`) are removed from their endpoints.
+
+        Afterwards, updates to the cloud are ignored until the connector gets a new node.
+        Detaching a connector without node has no effect.
+        """
+        for child_connector in self._child_connectors:
+            child_connector.detach()
+
+        self._remove_attribute_listeners()
+
+        if self._cloudio_endpoint is not None and self._cloudio_node is not None:
+            self._remove_node_from_endpoint(self._cloudio_endpoint, self._cloudio_node)
+        for mirror in self._mirrors:
+            self._remove_node_from_endpoint(mirror.cloudio_endpoint, mirror.cloudio_node)
+        self._mirrors = []
+
+        self._cloudio_endpoint = None
+        self._cloudio_node = None
+        self._cloudio_attributes = {}
+        self._sent_static_attributes = set()
+
+    def close(self):
+        """Detaches the connector and drops the references to the sync pacer, the cloud write dispatcher,
+        the publish scheduler, the snapshot transport and the update recorder. Change subscriptions are closed.
+
+        Allows to use the connector with `contextlib.closing()`.
+        """
+        self.detach()
+        self._sync_pacer = None
+        self._sync_progress_callback = None
+        self._cloud_write_dispatcher = None
+        self._publish_scheduler = None
+        self._snapshot_transport = None
+        self._update_recorder = None
+        for subscription in self._change_subscriptions:
+            subscription.close()
+        self._change_subscriptions = ()
+
+    def _remove_node_from_endpoint(self, cloudio_endpoint, cloudio_node):
+        remove_node = getattr(cloudio_endpoint, 'remove_node', None)
+        if remove_node is not None:
+            remove_node(cloudio_node.get_name())
+        elif getattr(cloudio_endpoint, 'nodes', {}).get(cloudio_node.get_name()) is cloudio_node:
+            # Endpoint cannot inform the cloud. At least release the node
+            self.log.debug('Endpoint has no \'remove_node()\'. Node \'%s\' removed locally only',
+                           cloudio_node.get_name())
+            del cloudio_endpoint.nodes[cloudio_node.get_name()]
+
+    def _create_cloudio_node(self):
+        """Creates a node containing the cloud.iO attributes of this connector and of its child connectors.
+
+        The node is cloned from the template of the structure if there is one. Otherwise the node is
+        built from the mapping. It becomes the template if the structure was seen before, so structures
+        used by one connector only do not get a template.
+
+        :rtype CloudioRuntimeNode
+        """
+        from cloudio.endpoint.runtime import CloudioRuntimeNode
+
+        key = self._node_template_key()
+        seen = False
+        with _node_templates_lock:
+            try:
+                seen = key in _node_templates
+            except TypeError:
+                # Mapping contains unhashable entries
+                key = None
+            if seen:
+                _node_templates.move_to_end(key)
+                node_template = _node_templates[key]
+            elif key is not None:
+                _node_templates[key] = None
+                if len(_node_templates) > _MAX_NODE_TEMPLATES:
+                    _node_templates.popitem(last=False)
+        if seen and node_template is not None:
+            return node_template.create_node()
+
+        cloudio_runtime_node = CloudioRuntimeNode()
+        cloudio_runtime_node.declare_implemented_interface('NodeInterface')
+
+        # Create cloud.iO attributes and add them to the corresponding cloud.iO object
+        self._create_cloudio_attributes(cloudio_runtime_node)
+
+        if seen:
+            with _node_templates_lock:
+                if key in _node_templates:
+                    _node_templates[key] = NodeTemplate(cloudio_runtime_node)
+        return cloudio_runtime_node
+
+    def _node_template_key(self):
+        """Returns the key of the node template of this connector and its children or None if no template can be used.
+
+        The key contains the mapping entries defining the structure of the node, not the mapping itself,
+        so instances creating their own mapping share the template.
+        """
+        for method_name in _NODE_STRUCTURE_METHODS:
+            if getattr(type(self), method_name) is not getattr(Model2CloudConnector, method_name):
+                # Structure built differently
+                return None
+
+        child_keys = []
+        for child_connector in self._child_connectors:
+            child_key = child_connector._node_template_key()
+            if child_key is None:
+                return None
+            child_keys.append((child_connector._topic_prefix, child_key))
+
+        # Topics may start with the name of the node the connector is bound to
+        node_name = self._cloudio_node.get_name() if self._cloudio_node and self._parent_connector is None else None
+        return (node_name,
+                tuple((cloudio_attribute_mapping.get('topic'), cloudio_attribute_mapping.get('objectName'),
+                       cloudio_attribute_mapping.get('attributeName'), cloudio_attribute_mapping.get('attributeType'),
+                       tuple(cloudio_attribute_mapping.get('aggregate', ())))
+                      for cloudio_attribute_mapping in (self._attribute_mapping or {}).values()),
+                tuple(child_keys))
+
+    def _create_cloudio_attributes(self, cloudio_runtime_node):
+        """Creates the cloud.iO attributes of this connector and of its child connectors in the given node.
+        """
+        for cloudio_attribute_mapping in (self._attribute_mapping or {}).values():
+            self._create_cloudio_attribute(cloudio_runtime_node, cloudio_attribute_mapping)
+
+        for child_connector in self._child_connectors:
+            child_connector._create_cloudio_attributes(cloudio_runtime_node)
+
+    def _create_cloudio_attribute(self, cloudio_runtime_node, cloudio_attribute_mapping):
+        """Creates the cloud.iO attribute described by an attribute mapping entry in the given node.
+        """
+        # Convert mapping entry to 'location stack' representation
+        location_stack = self._location_stack_of(cloudio_attribute_mapping)
+
+        if 'aggregate' in cloudio_attribute_mapping:
+            # Attribute becomes an object containing one attribute per aggregate function
+            functions = cloudio_attribute_mapping['aggregate']
+            cloudio_runtime_object = self.create_cloudio_object(cloudio_runtime_node,
+                                                                [functions[0], 'attributes',
+                                                                 location_stack[0], 'objects'] +
+                                                                location_stack[2:])
+            for function in functions:
+                cloudio_runtime_object.add_attribute(name=function,
+                                                     atype=_aggregate_type(function, cloudio_attribute_mapping))
+            return
+
+        # Get the cloudio object needed to add the attribute. Create object branch structure
+        # if needed
+        cloudio_runtime_object = self.create_cloudio_object(cloudio_runtime_node, location_stack.copy())
+
+        # Add attribute to object
+        cloudio_runtime_object.add_attribute(name=location_stack[0],
+                                             atype=cloudio_attribute_mapping['attributeType'])
+
+    def _remove_cloudio_attribute(self, cloudio_runtime_node, cloudio_attribute_mapping):
+        """Removes the cloud.iO attribute(s) described by an attribute mapping entry from the given node.
+
+        Objects left empty are removed too.
+        """
+        location_stack = self._location_stack_of(cloudio_attribute_mapping)
+        attribute_names = [location_stack[0]]
+        if 'aggregate' in cloudio_attribute_mapping:
+            attribute_names = list(cloudio_attribute_mapping['aggregate'])
+            location_stack = [attribute_names[0], 'attributes', location_stack[0], 'objects'] + location_stack[2:]
+
+        # Walk down from the node. Object names are at the end of the location stack
+        branch = []
+        objects = cloudio_runtime_node.get_objects()
+        for index in range(len(location_stack) - 2, 1, -2):
+            cloudio_object = objects.get(location_stack[index])
+            if cloudio_object is None:
+                return
+            branch.append((objects, location_stack[index], cloudio_object))
+            objects = cloudio_object._internal.objects
+        if not branch:
+            # Topic without object level: no attribute was created for it
+            return
+
+        attributes = branch[-1][2]._internal.get_attributes()
+        for attribute_name in attribute_names:
+            attributes.pop(attribute_name, None)
+
+        for objects, object_name, cloudio_object in reversed(branch):
+            if cloudio_object._internal.get_attributes() or cloudio_object._internal.objects:
+                break
+            del objects[object_name]
+
     def create_cloudio_object(self, cloudio_runtime_node_or_object, location_stack):
         """Creates and returns the object structure described in location stack.
         
@@ -135,32 +815,119 @@ class Model2CloudConnector(CloudioAttributeListener):
         assert self._attribute_mapping
         assert self._cloudio_node
 
+        # Mapping may have changed. Do not listen twice
+        self._remove_attribute_listeners()
+        self._cloudio_attributes = {}
+
         for model_attribute_name, cloudio_attribute_mapping in self._attribute_mapping.items():
             # Add listener to attributes that can be changed from the cloud (constraint: 'write')
             if 'write' in cloudio_attribute_mapping['constraints']:
-                if 'topic' in cloudio_attribute_mapping:
-                    # take new style
+                self._listen_to_cloudio_attribute(model_attribute_name, cloudio_attribute_mapping)
+
+    def _listen_to_cloudio_attribute(self, model_attribute_name, cloudio_attribute_mapping):
+        if 'topic' not in cloudio_attribute_mapping:
+            self.rate_limited_log.warning('deprecated-mapping-entries',
+                                          'Mapping entries \'objectName\' and \'attributeName\' will be '
+                                          'replaced by \'topic\' in future releases! Consider updating '
+                                          'your code!')
+        cloudio_attribute_object = self._cloudio_attribute_of(model_attribute_name)
+
+        if cloudio_attribute_object:
+            # Listener only keeps a weak reference to this object
+            cloudio_attribute_object.add_listener(self._attribute_listener)
+            self._model_attribute_names[cloudio_attribute_object] = model_attribute_name
+        else:
+            if 'topic' in cloudio_attribute_mapping:
+                self.log.warning(
+                    'Could not map to Cloud.iO attribute. Cloud.iO attribute \'%s\' not found!' %
+                    cloudio_attribute_mapping['topic'])
+            else:
+                self.log.warning(
+                    'Could not map to Cloud.iO attribute. Cloud.iO attribute \'%s/%s\' not found!' %
+                    (cloudio_attribute_mapping['objectName'], cloudio_attribute_mapping['attributeName']))
 
-                    # Convert from 'human readable topic' to 'location stack' representation
-                    location_stack = self._location_stack_from_topic(cloudio_attribute_mapping['topic'])
-                else:
-                    self.log.warning('Mapping entries \'objectName\' and \'attributeName\' will be replaced by '
-                                     '\'topic\' in future releases! Consider updating your code!')
-                    location_stack = [cloudio_attribute_mapping['attributeName'], 'attributes',
-                                      cloudio_attribute_mapping['objectName'], 'objects']
-                cloudio_attribute_object = self._cloudio_node.find_attribute(location_stack)
-
-                if cloudio_attribute_object:
-                    cloudio_attribute_object.add_listener(self)
-                else:
-                    if 'topic' in cloudio_attribute_mapping:
-                        self.log.warning(
-                            'Could not map to Cloud.iO attribute. Cloud.iO attribute \'%s\' not found!' %
-                            cloudio_attribute_mapping['topic'])
-                    else:
-                        self.log.warning(
-                            'Could not map to Cloud.iO attribute. Cloud.iO attribute \'%s/%s\' not found!' %
-                            (cloudio_attribute_mapping['objectName'], cloudio_attribute_mapping['attributeName']))
+    def _remove_attribute_listeners(self):
+        for cloudio_attribute_object in self._model_attribute_names:
+            cloudio_attribute_object.remove_listener(self._attribute_listener)
+        self._model_attribute_names = {}
+
+    def _cloudio_attribute_of(self, model_attribute_name):
+        """Returns the cloud.iO attribute mapped to the model attribute or None if not found.
+
+        Found attributes are cached until the mapping or the node changes.
+        """
+        cloudio_attribute_object = self._cloudio_attributes.get(model_attribute_name)
+        if cloudio_attribute_object is None:
+            # find_attribute() consumes the location stack
+            location_stack = list(self._cached_location_stack_of(model_attribute_name))
+            cloudio_attribute_object = self._cloudio_node.find_attribute(location_stack)
+            if cloudio_attribute_object is not None:
+                self._cloudio_attributes[model_attribute_name] = cloudio_attribute_object
+        return cloudio_attribute_object
+
+    def _cached_location_stack_of(self, model_attribute_name) -> list[str]:
+        """Returns the location stack of the cloud.iO attribute mapped to the model attribute.
+
+        The returned list is shared. Do not modify it.
+        """
+        node_name = self._cloudio_node.get_name() if self._cloudio_node else None
+        if node_name != self._location_stacks_node_name:
+            # Topics may start with the name of the node
+            self._location_stacks = {}
+            self._location_stacks_node_name = node_name
+
+        location_stack = self._location_stacks.get(model_attribute_name)
+        if location_stack is None:
+            location_stack = self._location_stack_of(self._attribute_mapping[model_attribute_name])
+            self._location_stacks[model_attribute_name] = location_stack
+        return location_stack
+
+    def _location_stack_of(self, cloudio_attribute_mapping) -> list[str]:
+        """Returns the location stack of the cloud.iO attribute described by an attribute mapping entry.
+
+        For child connectors the location stack includes the topic prefix given
+        in `add_child_connector()`.
+
+        :return A list containing the location stack
+        :raise KeyError: If the mapping entry neither contains 'topic' nor 'objectName' and 'attributeName'
+        """
+        if cloudio_attribute_mapping.get('topic'):
+            # Convert from 'human readable topic' to 'location stack' representation
+            location_stack = self._location_stack_from_topic(cloudio_attribute_mapping['topic'],
+                                                             take_raw_topic=self._parent_connector is not None)
+        else:
+            location_stack = [cloudio_attribute_mapping['attributeName'], 'attributes',
+                              cloudio_attribute_mapping['objectName'], 'objects']
+
+        if self._parent_connector is not None:
+            location_stack += self._location_prefix()
+        return location_stack
+
+    def _cloudio_aggregate_attribute_of(self, model_attribute_name, function):
+        """Returns the cloud.iO attribute receiving an aggregate of the model attribute or None if not found.
+        """
+        key = (model_attribute_name, function)
+        cloudio_attribute_object = self._cloudio_attributes.get(key)
+        if cloudio_attribute_object is None:
+            location_stack = self._cached_location_stack_of(model_attribute_name)
+            cloudio_attribute_object = self._cloudio_node.find_attribute([function, 'attributes',
+                                                                          location_stack[0], 'objects'] +
+                                                                         location_stack[2:])
+            if cloudio_attribute_object is not None:
+                self._cloudio_attributes[key] = cloudio_attribute_object
+        return cloudio_attribute_object
+
+    def _location_prefix(self) -> list[str]:
+        """Returns the location stack of the object a child connector is attached to.
+        """
+        location_prefix = []
+        connector = self
+        # Walk up to the root connector. Outer objects go to the end of the stack
+        while connector._parent_connector is not None:
+            for object_name in reversed(connector._topic_prefix.split('.')):
+                location_prefix += [object_name, 'objects']
+            connector = connector._parent_connector
+        return location_prefix
 
     def _location_stack_from_topic(self, topic, take_raw_topic=False) -> list[str]:
         """Converts attribute topic from 'human readable topic' to 'location stack' representation.
@@ -195,44 +962,157 @@ class Model2CloudConnector(CloudioAttributeListener):
         """Implementation of CloudioAttributeListener interface
 
         This method is called if an attribute change comes from the cloud.
-        """
-        found_model_attribute = False
-        model_attribute_name = None
-
-        # Get the corresponding mapping
-        for mod_attr_name, cl_att_mapping in self._attribute_mapping.items():
-            if 'topic' in cl_att_mapping:
-                if 'write' in cl_att_mapping['constraints']:
-                    location_stack = self._location_stack_from_topic(cl_att_mapping['topic'])
-
-                    # check attribute name
-                    if cloudio_attr.get_name() == location_stack[0]:
-
-                        # check all parents objects
-                        compare_objects = True
-                        cloudio_obj = cloudio_attr.get_parent()
-                        for i in range(0, int((len(location_stack) - 2) / 2)):
-                            if location_stack[2 + i * 2] != cloudio_obj.get_name():
-                                compare_objects = False
-                                break
-                            cloudio_obj = cloudio_obj.get_parent_object_container()
-
-                        if compare_objects is True:
-                            model_attribute_name = mod_attr_name
-                            # cloudio_attribute_mapping = cl_att_mapping
-                            break
 
-            else:
-                if cl_att_mapping['objectName'] == cloudio_attr.get_parent().get_name() and \
-                        cl_att_mapping['attributeName'] == cloudio_attr.get_name() and \
-                        'write' in cl_att_mapping['constraints']:
-                    model_attribute_name = mod_attr_name
-                    # cloudio_attribute_mapping = cl_att_mapping
-                    break
+        If a cloud write dispatcher is set, the change is handed over to the dispatcher
+        and applied to the model later by one of its worker threads.
+
+        The mirror nodes get the new value right away. The echo of the model is not published
+        back to the node the value came from (see `set_cloud_write_acknowledgement()`).
+        """
+        model_attribute_name = self._find_model_attribute_name(cloudio_attr)
 
         # Leave if nothing found
         if model_attribute_name is None:
-            return found_model_attribute
+            return False
+
+        if self._update_recorder is not None:
+            self._record_update(model_attribute_name, cloudio_attr.get_value(), from_cloud=True)
+
+        mirrors = self._root_connector()._mirrors
+        if mirrors:
+            self._publish_to_mirrors(mirrors, self._attribute_mapping[model_attribute_name], cloudio_attr,
+                                     cloudio_attr.get_value())
+
+        if self._cloud_write_dispatcher is not None:
+            self._cloud_write_dispatcher.dispatch(self, model_attribute_name, cloudio_attr, cloudio_attr.get_value())
+            return True
+
+        return self._apply_cloud_write(model_attribute_name, cloudio_attr, cloudio_attr.get_value())
+
+    def _find_model_attribute_name(self, cloudio_attr):
+        """Returns the name of the model attribute mapped to the given cloud.iO attribute with 'write' constraint.
+
+        :return The model attribute name or None if not found
+        """
+        model_attribute_name = self._model_attribute_names.get(cloudio_attr)
+        if model_attribute_name is not None:
+            return model_attribute_name
+
+        # Not listened yet. Get the corresponding mapping
+        for model_attribute_name, cloudio_attribute_mapping in self._attribute_mapping.items():
+            if 'write' in cloudio_attribute_mapping['constraints']:
+                location_stack = self._location_stack_of(cloudio_attribute_mapping)
+
+                # check attribute name
+                if cloudio_attr.get_name() == location_stack[0]:
+
+                    # check all parents objects
+                    cloudio_obj = cloudio_attr.get_parent()
+                    for i in range(0, int((len(location_stack) - 2) / 2)):
+                        if cloudio_obj is None or location_stack[2 + i * 2] != cloudio_obj.get_name():
+                            break
+                        cloudio_obj = cloudio_obj.get_parent_object_container()
+                    else:
+                        return model_attribute_name
+        return None
+
+    def _apply_cloud_write(self, model_attribute_name, cloudio_attr, value):
+        """Applies a value set from the cloud to the model attribute.
+
+        Updates of the attribute made by the model meanwhile are recognized as echoes
+        (see `set_cloud_write_acknowledgement()`).
+
+        :param model_attribute_name: Name of the model attribute to change
+        :param cloudio_attr: The cloud.iO attribute changed from the cloud
+        :param value: The value to apply
+        :return True if a way to apply the value to the model was found
+        """
+        cloud_writes = _current_cloud_writes()
+        cloud_writes.append((self, model_attribute_name))
+        try:
+            applied = self._apply_value_to_model(model_attribute_name, cloudio_attr, value)
+        finally:
+            cloud_writes.pop()
+
+        if applied:
+            self._notify_change_subscribers(model_attribute_name, cloudio_attr, value, from_cloud=True)
+        return applied
+
+    def _hydrate_write_attributes(self):
+        """Applies the values the listened cloud.iO attributes ('write') already have to the model in one batch.
+
+        Only values set from the cloud are applied: attributes never set (without timestamp),
+        attributes still holding the value published by the model (ex. when re-binding to the
+        previous node) and attributes the model already has the same value for are skipped. If the model implements
+        `on_attributes_set_from_cloud(values)`, it gets all values in one call (dict model
+        attribute name -> value). Otherwise each value is applied like a single @set, without
+        the lookup of the attribute and without the cloud write dispatcher.
+
+        Updates of the attributes made by the model meanwhile are recognized as echoes.
+
+        :return The number of model attributes hydrated
+        """
+        writes = [(model_attribute_name, cloudio_attr) for cloudio_attr, model_attribute_name
+                  in self._model_attribute_names.items() if self._is_set_from_cloud(cloudio_attr) and
+                  getattr(self, model_attribute_name, _NOTHING) != cloudio_attr.get_value()]
+        if not writes:
+            return 0
+
+        cloud_writes = _current_cloud_writes()
+        cloud_writes += [(self, model_attribute_name) for model_attribute_name, _ in writes]
+        try:
+            on_attributes_set_from_cloud = getattr(self, 'on_attributes_set_from_cloud', None)
+            if callable(on_attributes_set_from_cloud):
+                try:
+                    on_attributes_set_from_cloud({model_attribute_name: cloudio_attr.get_value()
+                                                  for model_attribute_name, cloudio_attr in writes})
+                    applied = writes
+                except Exception:
+                    self.log.exception('Could not hydrate model from cloud.iO!')
+                    applied = []
+            else:
+                applied = [(model_attribute_name, cloudio_attr) for model_attribute_name, cloudio_attr in writes
+                           if self._apply_value_to_model(model_attribute_name, cloudio_attr, cloudio_attr.get_value())]
+        finally:
+            del cloud_writes[-len(writes):]
+
+        for model_attribute_name, cloudio_attr in applied:
+            if self._update_recorder is not None:
+                self._record_update(model_attribute_name, cloudio_attr.get_value(), from_cloud=True)
+            self._notify_change_subscribers(model_attribute_name, cloudio_attr, cloudio_attr.get_value(),
+                                            from_cloud=True)
+        return len(applied)
+
+    def _is_set_from_cloud(self, cloudio_attr):
+        """Returns true if the current value of the cloud.iO attribute was set from the cloud.
+
+        `CloudioAttribute.set_value()` stamps the values published by the model too. A value is
+        taken for the model's own if it equals the value published last time and is not older.
+        """
+        timestamp = cloudio_attr.get_timestamp()
+        if timestamp is None:
+            return False
+        published = self._published_write_values.get(cloudio_attr)
+        return published is None or published[0] != cloudio_attr.get_value() or timestamp < published[1]
+
+    def _is_cloud_write_echo(self, model_attribute_name):
+        """Returns true if the current thread is applying a cloud write to the model attribute.
+        """
+        cloud_writes = getattr(_cloud_write_origin, 'writes', None)
+        return bool(cloud_writes) and any(connector is self and name == model_attribute_name
+                                          for connector, name in cloud_writes)
+
+    def _acknowledge_cloud_write(self, cloudio_attribute_object):
+        if self._cloud_write_acknowledgement is None:
+            return
+        try:
+            self._cloud_write_acknowledgement('@ack/' + cloudio_attribute_object.get_uuid().to_string(),
+                                              cloudio_attribute_object.get_timestamp())
+        except Exception:
+            self.log.exception('Could not acknowledge write of \'%s\'!' % cloudio_attribute_object.get_name())
+
+    def _apply_value_to_model(self, model_attribute_name, cloudio_attr, value):
+        found_model_attribute = False
 
         # Strategy:
         # 1. Try to call method 'on_attribute_set_from_cloud(attribute_name, cloudio_attr)'
@@ -260,7 +1140,7 @@ class Model2CloudConnector(CloudioAttributeListener):
                 method = getattr(self, specific_callback_method_name)
                 if inspect.ismethod(method):
                     try:  # Try to call the method. Maybe it fails because of wrong number of parameters
-                        method(cloudio_attr.get_value())
+                        method(value)
                         found_model_attribute = True
                     except TypeError as type_error:
                         self.log.error('Exception : %s' % type_error)
@@ -272,7 +1152,7 @@ class Model2CloudConnector(CloudioAttributeListener):
                 # Try to directly access it
                 if inspect.ismethod(method):
                     try:  # Try to call the method. Maybe it fails because of wrong number of parameters
-                        method(cloudio_attr.get_value())  # Call method and pass value by parameter
+                        method(value)  # Call method and pass value by parameter
                         found_model_attribute = True
                     except Exception as e:
                         self.log.error(f'Exception : {e}')
@@ -287,7 +1167,7 @@ class Model2CloudConnector(CloudioAttributeListener):
                     method = getattr(self, set_method_name)
                     if inspect.ismethod(method):
                         try:
-                            method(cloudio_attr.get_value())  # Call method with an pass value py parameter
+                            method(value)  # Call method with an pass value py parameter
                             found_model_attribute = True
                             break
                         except Exception as e:
@@ -303,15 +1183,16 @@ class Model2CloudConnector(CloudioAttributeListener):
                         attr = getattr(self, attribute_name)
                         # It should not be a method
                         if not inspect.ismethod(attr):
-                            setattr(self, attribute_name, cloudio_attr.get_value())
+                            setattr(self, attribute_name, value)
                             found_model_attribute = True
                             break
 
         if not found_model_attribute:
-            self.log.info('Did not find attribute for \'%s\'!' % cloudio_attr.get_name())
+            self.rate_limited_log.info(('attribute-not-found', model_attribute_name),
+                                       'Did not find attribute for \'%s\'!', cloudio_attr.get_name())
         else:
-            self.log.info('Cloud.iO @set attribute \'' + model_attribute_name + '\' to ' +
-                          str(cloudio_attr.get_value()))
+            self.rate_limited_log.info(('attribute-set', model_attribute_name),
+                                       'Cloud.iO @set attribute \'%s\' to %s', model_attribute_name, value)
 
         return found_model_attribute
 
@@ -323,64 +1204,328 @@ class Model2CloudConnector(CloudioAttributeListener):
 
         It might not be a good idea to call this method using the thread serving the MQTT
         client connection!
+
+        :return True if the value was published
         """
         assert not inspect.ismethod(model_attribute_value), 'Value must be of standard type!'
 
+        if self._update_recorder is not None and self._cloudio_node:
+            self._record_update(model_attribute_name, model_attribute_value)
+
+        sample_window = self._sample_windows.get(model_attribute_name)
+        if sample_window is not None:
+            # High rate path: only keep the sample. Aggregates are published at the end of the window
+            sample_window.add(model_attribute_value)
+            if self._aggregation_clock() >= sample_window.due:
+                return self._publish_aggregates(model_attribute_name)
+            return False
+
         if (self.has_valid_data() or force) and self._cloudio_node:
+            # Attribute gets synchronized now
+            self._dirty_attributes.discard(model_attribute_name)
+
             if model_attribute_name in self._attribute_mapping:
                 # Get cloudio mapping for the model attribute
                 cloudio_attribute_mapping = self._attribute_mapping[model_attribute_name]
 
-                location_stack = []
+                if cloudio_attribute_mapping.get('topic') or 'attributeName' in cloudio_attribute_mapping:
+                    change_detection = get_change_detection(cloudio_attribute_mapping)
+                    change_key = _NOTHING       # None is a valid key ('identity' of a None value)
 
-                if 'topic' in cloudio_attribute_mapping and cloudio_attribute_mapping['topic']:
-                    location_stack = self._location_stack_from_topic(cloudio_attribute_mapping['topic'])
-                else:
-                    if 'attributeName' in cloudio_attribute_mapping:
-                        # Construct the location stack (inverse topic structure)
-                        location_stack = [cloudio_attribute_mapping['attributeName'], 'attributes',
-                                          cloudio_attribute_mapping['objectName'], 'objects']
-
-                if location_stack:
-                    if 'toCloudioValueConverter' in cloudio_attribute_mapping:
-                        model_attribute_value = cloudio_attribute_mapping['toCloudioValueConverter'](
-                            model_attribute_value)
-
-                    cloudio_attribute_object = None
+                    if change_detection == CHANGE_DETECTION_EQUALITY:
+                        if 'toCloudioValueConverter' in cloudio_attribute_mapping:
+                            model_attribute_value = cloudio_attribute_mapping['toCloudioValueConverter'](
+                                model_attribute_value)
+                    else:
+                        # Compare the model value with the one published last time, not with the cloud
+                        change_key = model_attribute_value if change_detection == CHANGE_DETECTION_IDENTITY \
+                            else fingerprint(model_attribute_value)
 
                     # Get cloud.iO attribute
-                    cloudio_attribute_object = self._cloudio_node.find_attribute(location_stack)
+                    cloudio_attribute_object = self._cloudio_attribute_of(model_attribute_name)
 
                     if cloudio_attribute_object:
                         # Update only if force is true or model attribute value is different than that in the cloud
-                        if force is True or model_attribute_value != cloudio_attribute_object.get_value():
-                            if 'read' in cloudio_attribute_mapping['constraints']:
-                                cloudio_attribute_object.set_value(model_attribute_value)  # Set the new value on the cloud
+                        if change_detection == CHANGE_DETECTION_EQUALITY:
+                            changed = model_attribute_value != cloudio_attribute_object.get_value()
+                        elif change_detection == CHANGE_DETECTION_IDENTITY:
+                            changed = self._published_change_keys.get(model_attribute_name, _NOTHING) is not change_key
+                        else:
+                            changed = self._published_change_keys.get(model_attribute_name, _NOTHING) != change_key
+
+                        if force is True or changed:
+                            if 'read' in cloudio_attribute_mapping['constraints'] or \
+                                    'static' in cloudio_attribute_mapping['constraints']:
+                                if change_key is not _NOTHING:
+                                    self._published_change_keys[model_attribute_name] = change_key
+                                if change_detection != CHANGE_DETECTION_EQUALITY and \
+                                        'toCloudioValueConverter' in cloudio_attribute_mapping:
+                                    # Only converted if published
+                                    model_attribute_value = cloudio_attribute_mapping['toCloudioValueConverter'](
+                                        model_attribute_value)
+                                if self._is_cloud_write_echo(model_attribute_name) and \
+                                        model_attribute_value == cloudio_attribute_object.get_value():
+                                    # Value just came from the cloud
+                                    self._acknowledge_cloud_write(cloudio_attribute_object)
+                                else:
+                                    # Set the new value on the cloud
+                                    self._publish_cloudio_value(model_attribute_name, cloudio_attribute_mapping,
+                                                                cloudio_attribute_object, model_attribute_value)
+                                    return True
+                        elif self._is_cloud_write_echo(model_attribute_name):
+                            self._acknowledge_cloud_write(cloudio_attribute_object)
                     else:
-                        self.log.warning('Did not find cloud.iO attribute for \'{}\' model attribute!'.
-                                         format(model_attribute_name))
+                        self.rate_limited_log.warning(('cloudio-attribute-not-found', model_attribute_name),
+                                                      'Did not find cloud.iO attribute for \'%s\' model attribute!',
+                                                      model_attribute_name)
             else:
-                self.log.warning('Did not find cloud.iO mapping for model attribute \'{}\'!'.
-                                 format(model_attribute_name))
+                self.rate_limited_log.warning(('mapping-not-found', model_attribute_name),
+                                              'Did not find cloud.iO mapping for model attribute \'%s\'!',
+                                              model_attribute_name)
+        return False
+
+    def _record_update(self, model_attribute_name, value, from_cloud=False):
+        if model_attribute_name in self._attribute_mapping:
+            self._update_recorder.record(self._cloudio_node.get_name(), self._topic_in_node(model_attribute_name),
+                                         value, from_cloud)
+
+    def _topic_in_node(self, model_attribute_name):
+        """Returns the topic of the cloud.iO attribute mapped to the model attribute relative to the node.
+        """
+        return '.'.join(reversed(self._cached_location_stack_of(model_attribute_name)[::2]))
+
+    def _publish_aggregates(self, model_attribute_name):
+        """Publishes the aggregates of the samples received for the model attribute and starts a new window.
+
+        :return True if the aggregates were published
+        """
+        cloudio_attribute_mapping = self._attribute_mapping[model_attribute_name]
+        sample_window = self._sample_windows[model_attribute_name]
+        aggregates = sample_window.aggregate(cloudio_attribute_mapping['aggregate'])
+        sample_window.restart(self._aggregation_clock())
+
+        if aggregates is None or not self._cloudio_node or not self.has_valid_data() or \
+                'read' not in cloudio_attribute_mapping['constraints']:
+            return False
+
+        published = False
+        for function, value in aggregates.items():
+            cloudio_attribute_object = self._cloudio_aggregate_attribute_of(model_attribute_name, function)
+            if cloudio_attribute_object:
+                self._publish_cloudio_value(model_attribute_name, cloudio_attribute_mapping,
+                                            cloudio_attribute_object, value)
+                published = True
+            else:
+                self.rate_limited_log.warning(('cloudio-attribute-not-found', model_attribute_name),
+                                              'Did not find cloud.iO attribute for \'%s\' model attribute!',
+                                              model_attribute_name)
+        return published
+
+    def _publish_cloudio_value(self, model_attribute_name, cloudio_attribute_mapping, cloudio_attribute_object,
+                               value):
+        """Sends the new value of a cloud.iO attribute to the cloud and to the local subscribers.
+        """
+        if cloudio_attribute_object in self._model_attribute_names:
+            # Time taken before publishing: a publish scheduler stamps the value later
+            self._published_write_values[cloudio_attribute_object] = (value,
+                                                                      TimeStampProvider.get_time_in_milliseconds())
+
+        snapshot_values = self._collecting_snapshot_values()
+        if snapshot_values is not None:
+            timestamp = TimeStampProvider.get_time_in_milliseconds()
+            # Published as part of the snapshot
+            assign_value(cloudio_attribute_object, value, timestamp)
+            snapshot_values.append(SnapshotValue(self._path_in_node(cloudio_attribute_object),
+                                                 cloudio_attribute_object.get_value(), timestamp))
+        elif self._publish_scheduler is not None:
+            self._publish_scheduler.submit(cloudio_attribute_object, value, get_priority(cloudio_attribute_mapping))
+        else:
+            cloudio_attribute_object.set_value(value)
+
+        mirrors = self._root_connector()._mirrors
+        if mirrors:
+            self._publish_to_mirrors(mirrors, cloudio_attribute_mapping, cloudio_attribute_object, value)
+
+        self._notify_change_subscribers(model_attribute_name, cloudio_attribute_object, value)
+
+    def _notify_change_subscribers(self, model_attribute_name, cloudio_attribute_object, value, from_cloud=False):
+        """Delivers the change to the subscriptions of the connector and of its parents.
+        """
+        event = None
+        connector = self
+        while connector is not None:
+            for subscription in connector._change_subscriptions:
+                if event is None:
+                    event = ChangeEvent(self, model_attribute_name, self._path_in_node(cloudio_attribute_object),
+                                        value, TimeStampProvider.get_time_in_milliseconds(), from_cloud)
+                if subscription.matches(model_attribute_name, event.topic):
+                    subscription.deliver(event)
+            connector = connector._parent_connector
+
+    def _root_connector(self):
+        connector = self
+        while connector._parent_connector is not None:
+            connector = connector._parent_connector
+        return connector
+
+    def _publish_to_mirrors(self, mirrors, cloudio_attribute_mapping, cloudio_attribute_object, value):
+        """Publishes the value of a cloud.iO attribute of the model's node to the same attribute of the mirror nodes.
+        """
+        for mirror in mirrors:
+            mirror_attribute = mirror.cloudio_attributes.get(cloudio_attribute_object)
+            if mirror_attribute is None:
+                location_stack = self._location_stack_from_topic(self._path_in_node(cloudio_attribute_object),
+                                                                 take_raw_topic=True)
+                mirror_attribute = mirror.cloudio_node.find_attribute(location_stack)
+                if mirror_attribute is None:
+                    self.rate_limited_log.warning(('mirror-attribute-not-found', cloudio_attribute_object),
+                                                  'Did not find attribute \'%s\' in mirror node!',
+                                                  cloudio_attribute_object.get_name())
+                    continue
+                mirror.cloudio_attributes[cloudio_attribute_object] = mirror_attribute
+
+            try:
+                if mirror.publish_scheduler is not None:
+                    mirror.publish_scheduler.submit(mirror_attribute, value, get_priority(cloudio_attribute_mapping))
+                else:
+                    mirror_attribute.set_value(value)
+            except Exception:
+                # A failing mirror must not stop the others
+                self.rate_limited_log.warning(('mirror-publish-failed', mirror_attribute),
+                                              'Could not publish attribute \'%s\' to mirror node!',
+                                              mirror_attribute.get_name())
 
     def _update_cloudio_attributes(self, model=None, force=True):
         """Updates all cloud.iO attributes which where changed in model.
 
         In case the parameter force is set to true, the update to the cloud is forced.
+
+        The attributes of child connectors are updated too.
+
+        In snapshot mode (see `set_snapshot_transport()`) the changed values are sent as one message.
         """
+        if self._snapshot_transport is not None and self._cloudio_node and self._collecting_snapshot_values() is None:
+            self._snapshot_values = []
+            try:
+                self._update_cloudio_attributes(model=model, force=force)
+            finally:
+                snapshot_values, self._snapshot_values = self._snapshot_values, None
+            self._send_snapshot(snapshot_values)
+            return
+
         if self.has_valid_data() and self._cloudio_node and self._attribute_mapping:
             model = model if model is not None else self
 
-            for modelAttributeName, cloudioAttributeMapping in self._attribute_mapping.items():
-                # Only update attributes with 'read' or 'static' constraints
-                if 'read' in cloudioAttributeMapping['constraints'] or 'static' in \
-                        cloudioAttributeMapping['constraints']:
-                    try:
-                        attribute_value = getattr(model, modelAttributeName)
-                        # Update attribute in the cloud
-                        self._update_cloudio_attribute(modelAttributeName, attribute_value, force)
-                    except Exception:
-                        self.log.warning('Attribute \'%s\' in model not found!' % modelAttributeName)
+            if force and self._sync_pacer is not None and self._collecting_snapshot_values() is None:
+                self._paced_update_cloudio_attributes(model)
+            elif not force and self._dirty_tracking:
+                self._sync_static_cloudio_attributes(model)
+                # Visit only the attributes changed since the last update
+                for model_attribute_name in self._take_dirty_attributes():
+                    if model_attribute_name in self._read_attribute_name_set:
+                        self._sync_cloudio_attribute(model, model_attribute_name, force)
+            else:
+                self._sync_static_cloudio_attributes(model)
+                for model_attribute_name in self._read_attribute_names:
+                    self._sync_cloudio_attribute(model, model_attribute_name, force)
+
+        # Update the whole subtree
+        for child_connector in self._child_connectors:
+            child_connector._update_cloudio_attributes(force=force)
+
+    def _pending_static_attribute_names(self):
+        """Returns the 'static' attributes not yet sent to the current node.
+        """
+        if len(self._sent_static_attributes) == len(self._static_attribute_names):
+            return []
+        return [name for name in self._static_attribute_names if name not in self._sent_static_attributes]
+
+    def _sync_static_cloudio_attributes(self, model):
+        """Sends the 'static' attributes once. They are skipped by later syncs until the model gets a new node.
+
+        Attributes which could not be sent (ex. model attribute not readable) are tried again by the next sync.
+        """
+        for model_attribute_name in self._pending_static_attribute_names():
+            if self._sync_cloudio_attribute(model, model_attribute_name, force=True):
+                self._sent_static_attributes.add(model_attribute_name)
+
+    def _collecting_snapshot_values(self):
+        """Returns the list collecting the values of the snapshot in progress or None if no snapshot is taken.
+        """
+        connector = self
+        # Snapshot may be taken by a parent
+        while connector is not None:
+            if connector._snapshot_values is not None:
+                return connector._snapshot_values
+            connector = connector._parent_connector
+        return None
+
+    def _path_in_node(self, cloudio_attribute_object):
+        """Returns the topic of the cloud.iO attribute relative to the node (ex. 'status.temperature').
+        """
+        path = [cloudio_attribute_object.get_name()]
+        cloudio_object = cloudio_attribute_object.get_parent()
+        while cloudio_object is not None and cloudio_object is not self._cloudio_node:
+            path.append(cloudio_object.get_name())
+            cloudio_object = cloudio_object.get_parent_object_container()
+        return '.'.join(reversed(path))
+
+    def _send_snapshot(self, snapshot_values):
+        if not snapshot_values:
+            return
+
+        node_topic = self._cloudio_node.get_uuid().to_string() or self._cloudio_node.get_name()
+        snapshot = Snapshot(topic='@snapshot/' + node_topic, timestamp=TimeStampProvider.get_time_in_milliseconds(),
+                            values=snapshot_values)
+        if self._sync_pacer is not None:
+            # The whole snapshot is one message
+            self._sync_pacer.acquire()
+        try:
+            self._snapshot_transport(snapshot.topic, self._snapshot_encoder(snapshot))
+        except Exception:
+            self.log.exception('Could not send snapshot \'%s\'!' % snapshot.topic)
+
+    def _paced_update_cloudio_attributes(self, model):
+        """Forces update of all cloud.iO attributes at the rate given by the sync pacer.
+        """
+        static_attribute_names = self._pending_static_attribute_names()
+        model_attribute_names = self._read_attribute_names
+        if static_attribute_names:
+            # Send most important attributes first (sort is stable)
+            model_attribute_names = sorted(static_attribute_names + list(model_attribute_names),
+                                           key=lambda name: priority_rank(self._attribute_mapping[name]))
+
+        total = len(model_attribute_names)
+        for synced, model_attribute_name in enumerate(model_attribute_names, start=1):
+            self._sync_pacer.acquire()
+            if self._sync_cloudio_attribute(model, model_attribute_name, force=True) and \
+                    model_attribute_name in static_attribute_names:
+                self._sent_static_attributes.add(model_attribute_name)
+
+            if self._sync_progress_callback:
+                self._sync_progress_callback(self, synced, total)
+
+    def _sync_cloudio_attribute(self, model, model_attribute_name, force):
+        """Reads the attribute from the model and updates it in the cloud.
+
+        For aggregated attributes, the aggregates are published instead if the window is over or if forced.
+
+        :return True if the value was published
+        """
+        sample_window = self._sample_windows.get(model_attribute_name)
+        if sample_window is not None:
+            if force or self._aggregation_clock() >= sample_window.due:
+                return self._publish_aggregates(model_attribute_name)
+            return False
+
+        try:
+            attribute_value = getattr(model, model_attribute_name)
+            # Update attribute in the cloud
+            return self._update_cloudio_attribute(model_attribute_name, attribute_value, force)
+        except Exception:
+            self.rate_limited_log.warning(('model-attribute-not-found', model_attribute_name),
+                                          'Attribute \'%s\' in model not found!', model_attribute_name)
+            return False
 
     def _force_update_of_cloudio_attributes(self, model=None):
         """Forces updated of cloud.iO attributes.
@@ -398,3 +1543,64 @@ class Model2CloudConnector(CloudioAttributeListener):
         :return Default implementation returns always true.
         """
         return True
+
+
+class _Mirror(object):
+    """Node receiving a copy of the values published by a connector (see `add_mirror_endpoint()`).
+    """
+
+    def __init__(self, cloudio_node, cloudio_endpoint, publish_scheduler):
+        self.cloudio_node = cloudio_node
+        self.cloudio_endpoint = cloudio_endpoint
+        self.publish_scheduler = publish_scheduler
+        self.cloudio_attributes = {}        # Cloud.iO attribute of the model's node -> attribute of the mirror node
+
+
+class _WeakAttributeListener(CloudioAttributeListener):
+    """Forwards changes of cloud.iO attributes to a connector without keeping the connector alive.
+
+    Models dropped without calling `detach()` can therefore be garbage collected.
+    """
+
+    def __init__(self, connector):
+        super(_WeakAttributeListener, self).__init__()
+        self._connector_ref = weakref.ref(connector)
+
+    def attribute_has_changed(self, attribute, from_cloud: bool):
+        connector = self._connector_ref()
+        if connector is None:
+            return False
+        return connector.attribute_has_changed(attribute, from_cloud)
+
+
+def _is_structure_modifiable(cloudio_node):
+    """Returns true if objects and attributes can be added to or removed from the node in place.
+
+    Nodes registered within an endpoint cannot be modified. The `CloudioEndpoint` of
+    cloudio-endpoint-python 1.1.x does not implement `is_node_registered_within_endpoint()`, which
+    `CloudioRuntimeObject.add_attribute()` asks the endpoint through the node: its nodes are re-created.
+    """
+    cloudio_endpoint = cloudio_node.get_parent_node_container()
+    if cloudio_endpoint is None:
+        return True
+    is_node_registered_within_endpoint = getattr(cloudio_endpoint, 'is_node_registered_within_endpoint', None)
+    return is_node_registered_within_endpoint is not None and not is_node_registered_within_endpoint()
+
+
+def _aggregate_type(function, cloudio_attribute_mapping):
+    """Returns the type of the cloud.iO attribute receiving the given aggregate.
+    """
+    if function == 'count':
+        return int
+    if function == 'mean':
+        return float
+    return cloudio_attribute_mapping['attributeType']
+
+
+def _current_cloud_writes():
+    """Returns the list of cloud writes being applied by the current thread.
+    """
+    cloud_writes = getattr(_cloud_write_origin, 'writes', None)
+    if cloud_writes is None:
+        cloud_writes = _cloud_write_origin.writes = []
+    return cloud_writes
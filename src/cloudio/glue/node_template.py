@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from cloudio.endpoint.attribute import CloudioAttribute
+
+
+def assign_value(cloudio_attribute, value, timestamp):
+    """Sets value and timestamp of a cloud.iO attribute without publishing it nor notifying its listeners.
+
+    `CloudioAttribute.set_value()` publishes the value on its own and `set_value_from_cloud()`
+    rejects values not newer than the current one. Relies on the private fields of `CloudioAttribute`
+    of the cloudio-endpoint-python versions allowed by setup.py, like `NodeTemplate`.
+
+    :param cloudio_attribute: The attribute to change
+    :type cloudio_attribute: CloudioAttribute
+    :param value: The new value. Converted to the type of the attribute
+    :param timestamp: Time of the value in milliseconds
+    """
+    cloudio_attribute._timestamp = timestamp
+    cloudio_attribute._set_value_with_type_check(value)
+
+
+class NodeTemplate(object):
+    """Structure of a cloud.iO node, cloned to create further nodes with the same structure.
+
+    Building a node from an attribute mapping parses the topics, searches the objects and
+    adds objects and attributes one at a time. All instances of a model class get the same
+    structure, so the structure is taken from the first node built and copied for the next
+    instances. Cloning only creates the objects and copies the state of fresh attributes.
+
+    Copying the state relies on the private fields of `CloudioAttribute` and `CloudioRuntimeObject`
+    of the cloudio-endpoint-python versions allowed by setup.py.
+    """
+
+    __slots__ = ('_interfaces', '_objects')
+
+    def __init__(self, cloudio_node):
+        """
+        :param cloudio_node: Freshly built node (no listeners, not registered within an endpoint)
+        :type cloudio_node: CloudioRuntimeNode
+        """
+        self._interfaces = tuple(cloudio_node.interfaces)
+        self._objects = self._object_templates(cloudio_node.get_objects())
+
+    def create_node(self):
+        """Returns a new node with the structure of the template.
+
+        :rtype CloudioRuntimeNode
+        """
+        from cloudio.endpoint.runtime import CloudioRuntimeNode
+
+        cloudio_node = CloudioRuntimeNode()
+        cloudio_node.declare_implemented_interfaces(self._interfaces)
+        self._add_objects(cloudio_node, cloudio_node.objects, self._objects)
+        return cloudio_node
+
+    @classmethod
+    def _object_templates(cls, cloudio_objects):
+        """Returns the objects as tuple of (name, attribute templates, child object templates).
+        """
+        object_templates = []
+        for name, cloudio_object in cloudio_objects.items():
+            attribute_templates = []
+            for attribute_name, attribute in cloudio_object._internal.get_attributes().items():
+                assert not attribute._listeners, 'Template attributes must not have listeners!'
+                state = dict(attribute.__dict__)
+                state['_parent'] = None
+                attribute_templates.append((attribute_name, state))
+            object_templates.append((name, tuple(attribute_templates),
+                                     cls._object_templates(cloudio_object._internal.get_objects())))
+        return tuple(object_templates)
+
+    @classmethod
+    def _add_objects(cls, container, objects, object_templates):
+        from cloudio.endpoint.runtime import CloudioRuntimeObject
+
+        for name, attribute_templates, child_templates in object_templates:
+            cloudio_object = CloudioRuntimeObject()
+            internal = cloudio_object._internal
+            internal.set_parent_object_container(container)
+            internal.set_name(name)
+            objects[name] = cloudio_object
+
+            attributes = internal._attributes
+            for attribute_name, state in attribute_templates:
+                # Bypasses CloudioAttribute.__init__() and the checks of add_attribute() done for the template
+                attribute = CloudioAttribute.__new__(CloudioAttribute)
+                attribute.__dict__.update(state)
+                attribute._parent = cloudio_object
+                attributes[attribute_name] = attribute
+
+            cls._add_objects(cloudio_object, internal.objects, child_templates)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from .rate_limited_log import RateLimitedLog
+
+# Fraction of the period between the first samples of two attributes having the same period.
+# Consecutive multiples of the golden ratio spread the phases evenly, whatever the number of attributes
+_PHASE_STEP = 0.6180339887498949
+
+
+class PollingSampler(object):
+    """Reads the mapped attributes of models at their own period and updates them in the cloud.
+
+    For models without `@cloudio_attribute` properties, which would otherwise need a timer calling
+    `_update_cloudio_attributes()` for all attributes at the same rate. The period of an attribute
+    is given by the 'samplePeriod' entry (seconds) of its mapping. Only 'read' attributes are sampled.
+
+    The next samples are kept in a heap ordered by time, so one thread serves any number of models.
+    The first samples of attributes with the same period are spread over the period. Samples go
+    through the change detection of the connector: unchanged values are not published.
+
+    Samples are taken by the sampler's thread (see `start()`) or by calling `sample_due()`.
+    """
+
+    log = logging.getLogger(__name__)
+    # Used for messages which may occur on every sample
+    rate_limited_log = RateLimitedLog(log)
+
+    def __init__(self, default_sample_period=None, clock=time.monotonic):
+        """
+        :param default_sample_period: Period in seconds of the 'read' attributes without 'samplePeriod' entry.
+                                      None to not sample them
+        :type default_sample_period: float or None
+        """
+        assert default_sample_period is None or default_sample_period > 0
+
+        self._default_sample_period = default_sample_period
+        self._clock = clock
+        self._condition = threading.Condition()
+        # Next samples: (due, sequence, connector, model, model attribute name, period, generation)
+        self._heap = []
+        self._sequence = itertools.count()  # Orders samples due at the same time. Also numbers the generations
+        self._generations = {}              # id(connector) -> generation of its entries in the heap
+        self._phases = {}                   # Period -> number of attributes scheduled with it
+        self._sampled_count = 0
+        self._thread = None
+        self._running = False
+
+    @property
+    def sampled_count(self):
+        """Number of samples taken.
+        """
+        return self._sampled_count
+
+    def add(self, connector, model=None):
+        """Starts sampling the attributes of a connector and of its child connectors.
+
+        Adding a connector again (ex. after its attribute mapping changed) reschedules its attributes.
+
+        :param connector: The connector to sample
+        :type connector: Model2CloudConnector
+        :param model: The object to read the attributes from. Defaults to the connector
+        :return The number of attributes scheduled
+        """
+        model = model if model is not None else connector
+        now = self._clock()
+        count = 0
+
+        with self._condition:
+            generation = next(self._sequence)
+            self._generations[id(connector)] = generation
+
+            for model_attribute_name in connector._read_attribute_names:
+                period = connector._attribute_mapping[model_attribute_name].get('samplePeriod',
+                                                                               self._default_sample_period)
+                if period is None:
+                    continue
+                phase = self._phases.get(period, 0)
+                self._phases[period] = phase + 1
+                due = now + (phase * _PHASE_STEP % 1.0) * period
+                heapq.heappush(self._heap, (due, next(self._sequence), connector, model, model_attribute_name,
+                                            period, generation))
+                count += 1
+            self._condition.notify()
+
+        for child_connector in connector._child_connectors:
+            count += self.add(child_connector)
+        return count
+
+    def remove(self, connector):
+        """Stops sampling the attributes of a connector and of its child connectors.
+        """
+        with self._condition:
+            # Entries are dropped from the heap when they are due
+            self._generations.pop(id(connector), None)
+
+        for child_connector in connector._child_connectors:
+            self.remove(child_connector)
+
+    def next_due(self):
+        """Returns the time the next sample is due or None if nothing is sampled.
+        """
+        with self._condition:
+            return self._heap[0][0] if self._heap else None
+
+    def sample_due(self, now=None):
+        """Takes the samples due. Does not wait.
+
+        :param now: Current time. Defaults to the sampler's clock
+        :return The number of samples taken
+        """
+        now = now if now is not None else self._clock()
+        count = 0
+        while True:
+            with self._condition:
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, _, connector, model, model_attribute_name, period, generation = heapq.heappop(self._heap)
+                if self._generations.get(id(connector)) != generation:
+                    # Connector removed or added again
+                    continue
+
+                next_due = due + period
+                if next_due <= now:
+                    # Sampling fell behind. Skip the missed samples, keep the phase
+                    next_due += ((now - next_due) // period + 1) * period
+                heapq.heappush(self._heap, (next_due, next(self._sequence), connector, model, model_attribute_name,
+                                            period, generation))
+
+            self._sample(connector, model, model_attribute_name)
+            count += 1
+        with self._condition:
+            self._sampled_count += count
+        return count
+
+    def start(self):
+        """Starts the thread taking the samples.
+        """
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='cloudio-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the sampling thread.
+        """
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._running = False
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    timeout = self._heap[0][0] - self._clock() if self._heap else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+
+            self.sample_due()
+
+    def _sample(self, connector, model, model_attribute_name):
+        try:
+            value = getattr(model, model_attribute_name)
+        except Exception:
+            self.rate_limited_log.warning(('model-attribute-not-found', model_attribute_name),
+                                          'Attribute \'%s\' in model not found!', model_attribute_name)
+            return
+
+        try:
+            connector._update_cloudio_attribute(model_attribute_name, value, force=False)
+        except Exception:
+            self.rate_limited_log.warning(('sample-failed', model_attribute_name),
+                                          'Could not update attribute \'%s\'!', model_attribute_name, exc_info=True)
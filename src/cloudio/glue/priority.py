@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+# Values accepted by the 'priority' entry of an attribute mapping
+PRIORITY_HIGH = 'high'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_LOW = 'low'
+
+# Priorities ordered from most to least important
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+
+def get_priority(cloudio_attribute_mapping):
+    """Returns the priority of an attribute mapping entry.
+
+    Entries without 'priority' key get the 'normal' priority.
+    """
+    priority = cloudio_attribute_mapping.get('priority', PRIORITY_NORMAL)
+    if priority not in PRIORITIES:
+        raise ValueError('Unknown priority \'%s\'! Expected one of %s' % (priority, PRIORITIES))
+    return priority
+
+
+def priority_rank(cloudio_attribute_mapping):
+    """Returns the rank of an attribute mapping entry. Lower rank means more important.
+    """
+    return PRIORITIES.index(get_priority(cloudio_attribute_mapping))
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import threading
+import time
+
+from .metrics import percentile
+from .priority import PRIORITIES, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from .token_bucket import TokenBucket
+
+LaneMetrics = collections.namedtuple('LaneMetrics', ['published', 'coalesced', 'pending',
+                                                     'latency_p50', 'latency_p99', 'latency_max'])
+
+
+class PublishScheduler(object):
+    """Publishes updates of cloud.iO attributes through one lane per priority.
+
+    - 'high' updates (alarms, acknowledgements) are published immediately by the calling
+      thread. They are never coalesced nor throttled.
+    - 'normal' and 'low' updates are queued. A queued update of an attribute is replaced
+      by a newer value of the same attribute (coalescing). Queued updates are published at
+      `messages_per_second` by the scheduler's thread (see `start()`) or by calling
+      `publish_pending()`. The 'low' lane only gets the budget not used by the 'normal' lane.
+
+    The latency of an update is the time between its submission and its publication.
+    For coalesced updates, the time of the oldest waiting value is used.
+
+    One scheduler can be shared by many `Model2CloudConnector` objects.
+    """
+
+    log = logging.getLogger(__name__)
+
+    # Lanes sharing the budget of the token bucket, most important first
+    QUEUED_LANES = (PRIORITY_NORMAL, PRIORITY_LOW)
+
+    def __init__(self, messages_per_second, burst=None, latency_samples=1000, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        :param messages_per_second: Maximum average number of queued updates published per second
+        :type messages_per_second: float
+        :param burst: Number of queued updates that may be published at once. Defaults to `messages_per_second`
+        :type burst: int or None
+        :param latency_samples: Number of latencies kept per lane to compute the metrics
+        :type latency_samples: int
+        """
+        self._token_bucket = TokenBucket(messages_per_second, capacity=burst, clock=clock, sleep=sleep)
+        self._clock = clock
+        self._condition = threading.Condition()
+        # Cloud.iO attribute -> [value, time of submission]
+        self._queues = {lane: collections.OrderedDict() for lane in self.QUEUED_LANES}
+        self._published = dict.fromkeys(PRIORITIES, 0)
+        self._coalesced = dict.fromkeys(PRIORITIES, 0)
+        self._latencies = {lane: collections.deque(maxlen=latency_samples) for lane in PRIORITIES}
+        self._thread = None
+        self._running = False
+
+    def submit(self, cloudio_attribute, value, priority=PRIORITY_NORMAL):
+        """Publishes or queues the new value of a cloud.iO attribute.
+
+        :param cloudio_attribute: The attribute to update
+        :type cloudio_attribute: CloudioAttribute
+        :param value: The new value
+        :param priority: Lane to use ('high', 'normal' or 'low')
+        """
+        submitted = self._clock()
+
+        if priority == PRIORITY_HIGH:
+            self._publish(PRIORITY_HIGH, cloudio_attribute, value, submitted)
+            return
+
+        with self._condition:
+            queue = self._queues[priority]
+            entry = queue.get(cloudio_attribute)
+            if entry is not None:
+                # Keep position and time of submission of the waiting update
+                entry[0] = value
+                self._coalesced[priority] += 1
+            else:
+                queue[cloudio_attribute] = [value, submitted]
+                self._condition.notify()
+
+    def publish_pending(self, max_count=None):
+        """Publishes queued updates as long as the budget allows it. Does not wait.
+
+        :param max_count: Maximum number of updates to publish. None for no limit
+        :return The number of updates published
+        """
+        count = 0
+        while max_count is None or count < max_count:
+            with self._condition:
+                if not self._has_pending() or not self._token_bucket.try_acquire():
+                    break
+                lane, cloudio_attribute, (value, submitted) = self._take_next()
+            self._publish(lane, cloudio_attribute, value, submitted)
+            count += 1
+        return count
+
+    def start(self):
+        """Starts the thread publishing the queued updates.
+        """
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='cloudio-publish', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the publishing thread. Updates still queued can be published using `publish_pending()`.
+        """
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._running = False
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join()
+
+    def pending_count(self, priority=None):
+        """Returns the number of queued updates of the given lane or of all lanes.
+        """
+        with self._condition:
+            if priority is not None:
+                return len(self._queues.get(priority, ()))
+            return sum(len(queue) for queue in self._queues.values())
+
+    def lane_metrics(self, priority):
+        """Returns the metrics of a lane.
+
+        :rtype LaneMetrics
+        """
+        with self._condition:
+            latencies = list(self._latencies[priority])
+            return LaneMetrics(published=self._published[priority],
+                               coalesced=self._coalesced[priority],
+                               pending=len(self._queues.get(priority, ())),
+                               latency_p50=percentile(latencies, 50),
+                               latency_p99=percentile(latencies, 99),
+                               latency_max=max(latencies) if latencies else None)
+
+    def metrics(self):
+        """Returns the metrics of all lanes.
+
+        :return A dict mapping the priority to its `LaneMetrics`
+        """
+        return {priority: self.lane_metrics(priority) for priority in PRIORITIES}
+
+    def _has_pending(self):
+        return any(self._queues.values())
+
+    def _take_next(self):
+        for lane in self.QUEUED_LANES:
+            queue = self._queues[lane]
+            if queue:
+                cloudio_attribute, entry = queue.popitem(last=False)
+                return lane, cloudio_attribute, entry
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._running or self._has_pending())
+                if not self._running:
+                    return
+
+            # Wait for the budget outside the lock. The most important update is taken afterwards
+            self._token_bucket.acquire()
+
+            with self._condition:
+                next_update = self._take_next()
+            if next_update is not None:
+                lane, cloudio_attribute, (value, submitted) = next_update
+                self._publish(lane, cloudio_attribute, value, submitted)
+
+    def _publish(self, lane, cloudio_attribute, value, submitted):
+        try:
+            cloudio_attribute.set_value(value)
+        except Exception:
+            self.log.exception('Could not publish cloud.iO attribute \'%s\'!' % cloudio_attribute.get_name())
+
+        latency = self._clock() - submitted
+        with self._condition:
+            self._published[lane] += 1
+            self._latencies[lane].append(latency)
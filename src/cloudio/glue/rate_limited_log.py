@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+
+class RateLimitedLog(object):
+    """Limits how often the same message is output to a logger.
+
+    Each message is identified by a key. The first occurrence of a key is logged.
+    Further occurrences during `interval` seconds are only counted. The next message
+    logged for the key after the interval contains the number of suppressed occurrences.
+
+    Keys whose messages stopped get a summary too: at most once per interval, the next
+    message logged (whatever its key) also outputs the summaries of the keys whose interval
+    is over. Keys without suppressed messages are forgotten then.
+
+    Message arguments are only formatted if the message actually gets logged.
+    """
+
+    def __init__(self, logger, interval=60.0, clock=time.monotonic):
+        """
+        :param logger: The logger to output the messages to
+        :type logger: logging.Logger
+        :param interval: Minimum time in seconds between two messages with the same key
+        :type interval: float
+        """
+        self._logger = logger
+        self._interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}      # key -> [time of last output, number of suppressed messages, level, msg, args]
+        self._next_sweep = clock() + interval
+
+    def log(self, level, key, msg, *args, exc_info=False):
+        """Logs the message if no message with the same key was logged during the last interval.
+
+        :param level: Logging level (ex. logging.WARNING)
+        :param key: Key identifying the message. Must be hashable
+        :param msg: Message format string
+        :param args: Arguments merged into msg
+        :return True if the message was logged.
+        """
+        if not self._logger.isEnabledFor(level):
+            return False
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self._interval:
+                entry[1] += 1
+                entry[3:] = [msg, args]
+                logged = False
+            else:
+                suppressed = entry[1] if entry is not None else 0
+                self._entries[key] = [now, 0, level, msg, args]
+                logged = True
+
+        if logged:
+            self._output(level, msg, args, suppressed, exc_info)
+        if now >= self._next_sweep:
+            self._sweep(now)
+        return logged
+
+    def debug(self, key, msg, *args, **kwargs):
+        return self.log(logging.DEBUG, key, msg, *args, **kwargs)
+
+    def info(self, key, msg, *args, **kwargs):
+        return self.log(logging.INFO, key, msg, *args, **kwargs)
+
+    def warning(self, key, msg, *args, **kwargs):
+        return self.log(logging.WARNING, key, msg, *args, **kwargs)
+
+    def error(self, key, msg, *args, **kwargs):
+        return self.log(logging.ERROR, key, msg, *args, **kwargs)
+
+    def flush(self):
+        """Outputs a summary for every key having suppressed messages.
+
+        Call it periodically (or before exiting) to get the counts of messages not repeated since.
+        """
+        now = self._clock()
+        summaries = []
+        with self._lock:
+            for entry in self._entries.values():
+                if entry[1]:
+                    summaries.append((entry[2], entry[3], entry[4], entry[1]))
+                    entry[0:2] = [now, 0]
+
+        for level, msg, args, suppressed in summaries:
+            self._output(level, msg, args, suppressed)
+
+    def _sweep(self, now):
+        """Outputs the summaries of the keys whose interval is over and forgets the keys without.
+        """
+        summaries = []
+        with self._lock:
+            if now < self._next_sweep:
+                # Other thread was faster
+                return
+            self._next_sweep = now + self._interval
+
+            for key, entry in list(self._entries.items()):
+                if now - entry[0] < self._interval:
+                    continue
+                if entry[1]:
+                    summaries.append((entry[2], entry[3], entry[4], entry[1]))
+                    entry[0:2] = [now, 0]
+                else:
+                    del self._entries[key]
+
+        for level, msg, args, suppressed in summaries:
+            self._output(level, msg, args, suppressed)
+
+    def _output(self, level, msg, args, suppressed, exc_info=False):
+        if suppressed:
+            self._logger.log(level, msg + ' (repeated %d times within %g s)', *args, suppressed, self._interval,
+                             exc_info=exc_info)
+        else:
+            self._logger.log(level, msg, *args, exc_info=exc_info)
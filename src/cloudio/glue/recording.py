@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""Recording and replay of attribute update streams.
+
+An `UpdateRecorder` set on a connector (see `Model2CloudConnector.set_update_recorder()`) appends
+the values given to the connector by the model and the values set from the cloud (@set) to a
+compact binary log. An `UpdateReplayer` feeds a log into connectors at the original or at an
+accelerated speed, for example to reproduce production load in benchmarks.
+
+Log format (little endian):
+    Header:   b'CGLR' + version (1 byte)
+    Record:   kind (1 byte), timestamp in ms (int64), topic id (uint32), then
+              - topic definition: node and topic (uint16 length + UTF-8 each)
+              - update and cloud write: value (tag byte + payload)
+              - session start: nothing. Topic ids defined before are forgotten
+"""
+
+import collections
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+import cloudio.common.utils.timestamp_helpers as TimeStampProvider
+
+RecordedUpdate = collections.namedtuple('RecordedUpdate', ['timestamp', 'node', 'topic', 'value', 'from_cloud'])
+RecordedUpdate.__doc__ = """Update read from a recording.
+
+:param timestamp: Time the update was recorded in milliseconds
+:param node: Name of the cloud.iO node
+:param topic: Topic of the attribute relative to the node (ex. 'status.temperature')
+:param value: The value given by the model or set from the cloud
+:param from_cloud: True for values set from the cloud (@set)
+"""
+
+_MAGIC = b'CGLR'
+_VERSION = 1
+
+# Record kinds
+_KIND_TOPIC = 0
+_KIND_UPDATE = 1
+_KIND_CLOUD_WRITE = 2
+_KIND_SESSION = 3
+
+_HEADER = struct.Struct('<4sB')
+_RECORD = struct.Struct('<BqI')
+_LENGTH = struct.Struct('<H')
+_STRING_LENGTH = struct.Struct('<I')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+
+class UpdateRecorder(object):
+    """Appends attribute updates to a binary log.
+
+    Topics are written once per recording session, updates only refer to them by id. Values
+    of type bool, int, float, str, bytes and None are stored as is, other values as JSON.
+    Writes are buffered: call `flush()` or `close()` to make sure the updates are on disk.
+    An incomplete record at the end of an existing log is removed before appending.
+
+    One recorder can be shared by many connectors and threads.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, target, buffer_size=64 * 1024):
+        """
+        :param target: Path of the log file (appended if it exists) or a binary file object
+        :param buffer_size: Size of the write buffer in bytes
+        :raise ValueError: If the existing log is not a recording
+        """
+        if isinstance(target, (str, bytes, os.PathLike)):
+            self._file = open(target, 'a+b', buffering=buffer_size)
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = False
+        self._lock = threading.Lock()
+        self._topic_ids = {}        # (node, topic) -> id
+        self._record_count = 0
+
+        with self._lock:
+            if self._file.tell() > 0 and self._file.readable() and self._file.seekable():
+                self._truncate_incomplete_record()
+            if self._file.tell() == 0:
+                self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+            else:
+                self._file.write(_RECORD.pack(_KIND_SESSION, 0, 0))
+
+    def _truncate_incomplete_record(self):
+        """Removes a record truncated at the end of the log (ex. recorder killed while writing).
+
+        Records appended after it would be read as part of it.
+        """
+        end = self._file.tell()
+        try:
+            length = _complete_length(self._file)
+        except ValueError:
+            if self._owns_file:
+                self._file.close()
+            raise
+        if length < end:
+            self.log.warning('Removing %d bytes of an incomplete record at the end of the recording!' % (end - length))
+            self._file.seek(length)
+            self._file.truncate()
+        else:
+            self._file.seek(end)
+
+    @property
+    def record_count(self):
+        """Number of updates recorded.
+        """
+        return self._record_count
+
+    def record(self, node, topic, value, from_cloud=False, timestamp=None):
+        """Appends an update to the log.
+
+        :param node: Name of the cloud.iO node
+        :param topic: Topic of the attribute relative to the node
+        :param value: The value
+        :param from_cloud: True for values set from the cloud
+        :param timestamp: Time of the update in milliseconds. Defaults to now
+        """
+        if timestamp is None:
+            timestamp = TimeStampProvider.get_time_in_milliseconds()
+        encoded_value = _encode_value(value)
+
+        with self._lock:
+            if self._file is None:
+                return
+            topic_id = self._topic_ids.get((node, topic))
+            if topic_id is None:
+                topic_id = self._topic_ids[(node, topic)] = len(self._topic_ids)
+                self._file.write(_RECORD.pack(_KIND_TOPIC, 0, topic_id) + _encode_text(node) + _encode_text(topic))
+            self._file.write(_RECORD.pack(_KIND_CLOUD_WRITE if from_cloud else _KIND_UPDATE, timestamp, topic_id) +
+                             encoded_value)
+            self._record_count += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """Flushes the log. Closes the file if it was opened by the recorder. Further updates are ignored.
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            file, self._file = self._file, None
+            file.flush()
+            if self._owns_file:
+                file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def read_recording(source):
+    """Yields the updates of a log written by `UpdateRecorder`.
+
+    A record truncated at the end of the log (ex. recorder killed while writing) is ignored.
+
+    :param source: Path of the log file or a binary file object
+    :rtype Iterator[RecordedUpdate]
+    :raise ValueError: If the source is not a recording
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield from read_recording(file)
+        return
+
+    if not _read_header(source):
+        raise ValueError('Not a recording of attribute updates!')
+
+    reader = _Reader(source)
+    topics = {}
+    try:
+        while True:
+            data = source.read(_RECORD.size)
+            if len(data) < _RECORD.size:
+                return
+            kind, timestamp, topic_id = _RECORD.unpack(data)
+
+            if kind == _KIND_TOPIC:
+                topics[topic_id] = (reader.text(), reader.text())
+            elif kind == _KIND_SESSION:
+                topics = {}
+            elif kind in (_KIND_UPDATE, _KIND_CLOUD_WRITE):
+                if topic_id not in topics:
+                    raise ValueError('Unknown topic id \'%s\'!' % topic_id)
+                node, topic = topics[topic_id]
+                yield RecordedUpdate(timestamp, node, topic, reader.value(), kind == _KIND_CLOUD_WRITE)
+            else:
+                raise ValueError('Unknown record kind \'%s\'!' % kind)
+    except EOFError:
+        return
+
+
+def _read_header(source):
+    """Reads the header of a log.
+
+    :return False if the header is truncated
+    :raise ValueError: If the source is not a recording
+    """
+    header = source.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        if not _MAGIC.startswith(header[:len(_MAGIC)]):
+            raise ValueError('Not a recording of attribute updates!')
+        return False
+    magic, version = _HEADER.unpack(header)
+    if magic != _MAGIC:
+        raise ValueError('Not a recording of attribute updates!')
+    if version != _VERSION:
+        raise ValueError('Unsupported recording version \'%s\'!' % version)
+    return True
+
+
+def _complete_length(file):
+    """Returns the length of the header and the complete records of a log.
+
+    :raise ValueError: If the file is not a recording
+    """
+    file.seek(0)
+    if not _read_header(file):
+        return 0
+
+    reader = _Reader(file)
+    length = file.tell()
+    try:
+        while True:
+            data = file.read(_RECORD.size)
+            if len(data) < _RECORD.size:
+                return length
+            kind = _RECORD.unpack(data)[0]
+            if kind == _KIND_TOPIC:
+                reader.text()
+                reader.text()
+            elif kind in (_KIND_UPDATE, _KIND_CLOUD_WRITE):
+                reader.value()
+            elif kind != _KIND_SESSION:
+                raise ValueError('Unknown record kind \'%s\'!' % kind)
+            length = file.tell()
+    except EOFError:
+        return length
+
+
+class UpdateReplayer(object):
+    """Feeds recorded updates into connectors.
+
+    Updates given by the model are passed to `_update_cloudio_attribute()` of the connector (or
+    child connector) mapping the topic, so change detection and publishing work as in production.
+    Values set from the cloud are set on the cloud.iO attribute as if they came from the cloud.
+    The connectors are found by the name of their cloud.iO node.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, connectors, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param connectors: The (root) connectors to feed. Their cloud.iO nodes must be created
+        :type connectors: list[Model2CloudConnector]
+        """
+        self._clock = clock
+        self._sleep = sleep
+        self._targets = {}          # (node, topic) -> (connector, model attribute name)
+        self.skipped_count = 0      # Updates of unknown nodes or topics
+
+        for connector in connectors:
+            node_name = connector._cloudio_node.get_name()
+            pending = [connector]
+            while pending:
+                connector = pending.pop()
+                pending += connector._child_connectors
+                for model_attribute_name in connector._attribute_mapping or ():
+                    self._targets[(node_name, connector._topic_in_node(model_attribute_name))] = (connector,
+                                                                                               model_attribute_name)
+
+    def replay(self, source, speed=1.0):
+        """Feeds the updates of a recording into the connectors.
+
+        :param source: Path of the log file, a binary file object or an iterable of `RecordedUpdate`
+        :param speed: Speed factor (ex. 10.0 for ten times faster). None to replay as fast as possible
+        :return The number of updates replayed
+        """
+        updates = read_recording(source) if isinstance(source, (str, bytes, os.PathLike)) or \
+            hasattr(source, 'read') else source
+        count = 0
+        first_timestamp = started = None
+
+        for update in updates:
+            target = self._targets.get((update.node, update.topic))
+            if target is None:
+                self.skipped_count += 1
+                continue
+
+            if speed:
+                if first_timestamp is None:
+                    first_timestamp, started = update.timestamp, self._clock()
+                delay = (update.timestamp - first_timestamp) / 1000.0 / speed - (self._clock() - started)
+                if delay > 0:
+                    self._sleep(delay)
+
+            connector, model_attribute_name = target
+            try:
+                if update.from_cloud:
+                    cloudio_attribute_object = connector._cloudio_attribute_of(model_attribute_name)
+                    cloudio_attribute_object.set_value_from_cloud(update.value,
+                                                                  TimeStampProvider.get_time_in_milliseconds())
+                else:
+                    connector._update_cloudio_attribute(model_attribute_name, update.value)
+            except Exception:
+                self.log.exception('Could not replay update of \'%s\'!' % update.topic)
+            count += 1
+        return count
+
+
+class _Reader(object):
+    """Reads the variable length parts of records. Raises EOFError if the data is truncated.
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+    def read(self, size):
+        data = self._file.read(size)
+        if len(data) < size:
+            raise EOFError()
+        return data
+
+    def text(self):
+        return self.read(_LENGTH.unpack(self.read(_LENGTH.size))[0]).decode('utf-8')
+
+    def value(self):
+        tag = self.read(1)
+        if tag == b'N':
+            return None
+        if tag == b'T':
+            return True
+        if tag == b'F':
+            return False
+        if tag == b'i':
+            return _INT.unpack(self.read(_INT.size))[0]
+        if tag == b'd':
+            return _FLOAT.unpack(self.read(_FLOAT.size))[0]
+
+        data = self.read(_STRING_LENGTH.unpack(self.read(_STRING_LENGTH.size))[0])
+        if tag == b's':
+            return data.decode('utf-8')
+        if tag == b'b':
+            return data
+        if tag == b'j':
+            return json.loads(data.decode('utf-8'))
+        raise ValueError('Unknown value tag \'%s\'!' % tag)
+
+
+def _encode_text(text):
+    data = (text or '').encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+
+def _encode_value(value):
+    if value is None:
+        return b'N'
+    if value is True:
+        return b'T'
+    if value is False:
+        return b'F'
+    if type(value) is int and _INT_MIN <= value <= _INT_MAX:
+        return b'i' + _INT.pack(value)
+    if type(value) is float:
+        return b'd' + _FLOAT.pack(value)
+
+    if isinstance(value, str):
+        tag, data = b's', value.encode('utf-8')
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        tag, data = b'b', bytes(value)
+    else:
+        tag, data = b'j', json.dumps(value, separators=(',', ':'), default=repr).encode('utf-8')
+    return tag + _STRING_LENGTH.pack(len(data)) + data
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""Runs models in worker processes behind the endpoint of another process.
+
+Workers connect their models to a `ShardEndpoint`. It forwards the structure of the nodes and
+the attribute updates through a `multiprocessing` connection (ex. `multiprocessing.Pipe()`) to the
+`ShardHost` of the process owning the `CloudioEndpoint`. The host adds a copy of each node to its
+endpoint and publishes the updates. Changes coming from the cloud (@set) are routed back to the
+worker owning the node.
+
+Only the host keeps a broker connection. The getters and converters of the models run in the workers.
+"""
+
+import logging
+import multiprocessing.connection
+import threading
+
+from cloudio.endpoint.exception.cloudio_modification_exception import CloudioModificationException
+from cloudio.endpoint.interface.attribute_listener import CloudioAttributeListener
+from cloudio.endpoint.interface.node_container import CloudioNodeContainer
+from cloudio.endpoint.topicuuid import TopicUuid
+
+from .node_template import assign_value
+
+# Messages worker -> host
+MESSAGE_NODE_ADDED = 'nodeAdded'        # (MESSAGE_NODE_ADDED, node name, node structure)
+MESSAGE_NODE_REMOVED = 'nodeRemoved'    # (MESSAGE_NODE_REMOVED, node name)
+MESSAGE_UPDATES = 'updates'             # (MESSAGE_UPDATES, [(node name, path, value, timestamp), ...])
+# Messages host -> worker
+MESSAGE_SET = 'set'                     # (MESSAGE_SET, node name, path, value, timestamp)
+
+# Attribute types as given by CloudioAttribute.get_type_as_string()
+_ATTRIBUTE_TYPES = {'Boolean': bool, 'Integer': int, 'Number': float, 'String': str}
+
+
+class ShardEndpoint(CloudioNodeContainer):
+    """Endpoint used by the models of a worker process.
+
+    Nodes are added like to a real endpoint. Their structure and all attribute updates are
+    sent to the `ShardHost` through the connection. @set messages received from the host are
+    applied to the attributes of the nodes, which notifies the connectors as usual.
+
+    Updates are sent in batches of `batch_size`. With a batch size greater than one, call
+    `flush()` after updating the models or use `start()`, which also flushes periodically.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, connection, uuid='shard', batch_size=1, flush_interval=0.05):
+        """
+        :param connection: The worker's end of the connection to the host
+        :type connection: multiprocessing.connection.Connection
+        :param uuid: Name of the endpoint (not visible in the cloud)
+        :param batch_size: Number of updates sent together
+        :type batch_size: int
+        :param flush_interval: Time in seconds after which the thread started by `start()` sends pending updates
+        :type flush_interval: float
+        """
+        super(ShardEndpoint, self).__init__()
+        self.uuid = uuid
+        self.nodes = {}
+        self._connection = connection
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending_updates = []
+        self._locations = {}                # Cloud.iO attribute -> (node name, path)
+        self._thread = None
+        self._running = False
+
+    def add_node(self, node_name, cls_or_object):
+        from cloudio.endpoint.node import CloudioNode
+
+        if not isinstance(cls_or_object, CloudioNode):
+            raise RuntimeError('Wrong cloud.iO object type')
+        assert node_name not in self.nodes, 'Node with given name already present!'
+
+        cls_or_object.set_name(node_name)
+        cls_or_object.set_parent_node_container(self)
+        self.nodes[node_name] = cls_or_object
+        # Updates made before must reach the host first
+        self.flush()
+        self._send((MESSAGE_NODE_ADDED, node_name, node_structure(cls_or_object)))
+
+    def remove_node(self, node_name):
+        """Removes the node with the given name here and at the host.
+
+        :return The removed node or None if not found
+        """
+        node = self.nodes.pop(node_name, None)
+        if node is not None:
+            self.flush()
+            with self._lock:
+                self._locations = {attribute: location for attribute, location in self._locations.items()
+                                   if location[0] != node_name}
+            self._send((MESSAGE_NODE_REMOVED, node_name))
+        return node
+
+    def get_node(self, node_name):
+        return self.nodes.get(node_name, None)
+
+    def flush(self):
+        """Sends the pending updates to the host.
+        """
+        with self._lock:
+            updates, self._pending_updates = self._pending_updates, []
+            if updates:
+                self._connection.send((MESSAGE_UPDATES, updates))
+
+    def process_messages(self, timeout=0.0):
+        """Applies the @set messages received from the host.
+
+        :param timeout: Time in seconds to wait for the first message
+        :return The number of messages processed
+        """
+        count = 0
+        while self._connection.poll(timeout):
+            try:
+                message = self._connection.recv()
+            except EOFError:
+                self.log.warning('Connection to shard host closed!')
+                self._running = False
+                break
+            try:
+                self._handle_message(message)
+            except Exception:
+                # A bad message must not stop the worker
+                self.log.exception('Could not process message from shard host!')
+            count += 1
+            timeout = 0.0
+        return count
+
+    def start(self):
+        """Starts a thread applying the @set messages and sending pending updates periodically.
+        """
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='cloudio-shard-endpoint', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the thread started by `start()` and sends the pending updates.
+        """
+        thread, self._thread = self._thread, None
+        self._running = False
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _run(self):
+        while self._running:
+            self.process_messages(timeout=self._flush_interval)
+            self.flush()
+
+    def _handle_message(self, message):
+        if message[0] != MESSAGE_SET:
+            self.log.error('Unexpected message \'%s\' from shard host!' % (message[0],))
+            return
+
+        _, node_name, path, value, timestamp = message
+        node = self.nodes.get(node_name)
+        attribute = node.find_attribute(location_stack_of_path(path)) if node else None
+        if attribute is None:
+            self.log.error('Attribute \'%s\' of node \'%s\' not found!' % ('.'.join(path), node_name))
+            return
+        attribute.set_value_from_cloud(value, timestamp)
+
+    def _send(self, message):
+        with self._lock:
+            self._connection.send(message)
+
+    def _location_of(self, attribute):
+        location = self._locations.get(attribute)
+        if location is None:
+            path = [attribute.get_name()]
+            container = attribute.get_parent()
+            while container.get_parent_object_container() is not None:
+                path.append(container.get_name())
+                container = container.get_parent_object_container()
+            # Container is now the node
+            location = (container.get_name(), tuple(reversed(path)))
+            self._locations[attribute] = location
+        return location
+
+    ######################################################################
+    # Interface implementations
+    #
+    def get_uuid(self):
+        return TopicUuid(self)
+
+    def get_name(self):
+        return self.uuid
+
+    def set_name(self, name):
+        raise CloudioModificationException('CloudioEndpoint name can not be changed!')
+
+    def is_online(self):
+        return True
+
+    def is_node_registered_within_endpoint(self):
+        # Keeps the structure of the nodes modifiable
+        return False
+
+    def attribute_has_changed_by_endpoint(self, attribute):
+        with self._lock:
+            node_name, path = self._location_of(attribute)
+            self._pending_updates.append((node_name, path, attribute.get_value(), attribute.get_timestamp()))
+            if len(self._pending_updates) < self._batch_size:
+                return
+            updates, self._pending_updates = self._pending_updates, []
+            self._connection.send((MESSAGE_UPDATES, updates))
+
+    def attribute_has_changed_by_cloud(self, attribute):
+        pass
+
+
+class ShardHost(object):
+    """Publishes the nodes of worker processes through the endpoint of this process.
+
+    Each worker is given by its end of a connection (see `add_worker()`). Messages are processed
+    by the thread started with `start()` or by calling `process_messages()`. The nodes of a worker
+    are removed from the endpoint when its connection closes (ex. the worker process ended).
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, cloudio_endpoint):
+        """
+        :param cloudio_endpoint: The endpoint to add the nodes of the workers to
+        :type cloudio_endpoint: CloudioEndpoint
+        """
+        self._cloudio_endpoint = cloudio_endpoint
+        self._connections = []
+        self._send_lock = threading.Lock()
+        self._attributes = {}           # (node name, path) -> cloud.iO attribute
+        self._node_owners = {}          # Node name -> connection
+        self._thread = None
+        self._running = False
+
+    def add_worker(self, connection):
+        """Accepts the nodes of the worker at the other end of the connection.
+
+        :type connection: multiprocessing.connection.Connection
+        """
+        self._connections.append(connection)
+
+    def process_messages(self, timeout=0.0):
+        """Processes the messages received from the workers.
+
+        :param timeout: Time in seconds to wait for messages
+        :return The number of messages processed
+        """
+        count = 0
+        for connection in multiprocessing.connection.wait(list(self._connections), timeout):
+            try:
+                while connection.poll():
+                    message = connection.recv()
+                    try:
+                        self._handle_message(connection, message)
+                    except Exception:
+                        # A bad message (ex. duplicate node name) must not stop serving the other workers
+                        self.log.exception('Could not process message from shard worker!')
+                    count += 1
+            except (EOFError, OSError):
+                self.log.warning('Connection to shard worker closed!')
+                self._remove_worker(connection)
+        return count
+
+    def start(self):
+        """Starts the thread processing the messages of the workers.
+        """
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='cloudio-shard-host', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        self._running = False
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while self._running and self._connections:
+            self.process_messages(timeout=0.1)
+
+    def _handle_message(self, connection, message):
+        if message[0] == MESSAGE_UPDATES:
+            for node_name, path, value, timestamp in message[1]:
+                attribute = self._attributes.get((node_name, path))
+                if attribute is None:
+                    self.log.error('Attribute \'%s\' of node \'%s\' not found!' % ('.'.join(path), node_name))
+                    continue
+                attribute.set_value(value, timestamp)
+        elif message[0] == MESSAGE_NODE_ADDED:
+            self._add_node(connection, message[1], message[2])
+        elif message[0] == MESSAGE_NODE_REMOVED:
+            self._remove_node(message[1])
+        else:
+            self.log.error('Unexpected message \'%s\' from shard worker!' % (message[0],))
+
+    def _add_node(self, connection, node_name, structure):
+        if node_name in self._node_owners:
+            raise ValueError('Node \'%s\' already added by a shard worker!' % node_name)
+
+        node = create_node(structure)
+        attributes = {}
+        for path, _, _, _ in structure:
+            attribute = node.find_attribute(location_stack_of_path(path))
+            # Route changes from the cloud to the worker owning the node
+            attribute.add_listener(_CloudWriteRouter(self, connection, node_name, path))
+            attributes[(node_name, path)] = attribute
+        self._cloudio_endpoint.add_node(node_name, node)
+
+        # Only route to nodes the endpoint accepted
+        self._attributes.update(attributes)
+        self._node_owners[node_name] = connection
+
+    def _remove_worker(self, connection):
+        """Forgets a worker whose connection closed and removes its nodes from the endpoint.
+        """
+        self._connections.remove(connection)
+        for node_name in [node_name for node_name, owner in self._node_owners.items() if owner is connection]:
+            self._remove_node(node_name)
+        connection.close()
+
+    def _remove_node(self, node_name):
+        self._node_owners.pop(node_name, None)
+        self._attributes = {key: attribute for key, attribute in self._attributes.items() if key[0] != node_name}
+
+        remove_node = getattr(self._cloudio_endpoint, 'remove_node', None)
+        if remove_node is not None:
+            remove_node(node_name)
+        else:
+            self.log.debug('Endpoint has no \'remove_node()\'. Node \'%s\' removed locally only', node_name)
+            getattr(self._cloudio_endpoint, 'nodes', {}).pop(node_name, None)
+
+    def _send_to_worker(self, connection, message):
+        try:
+            with self._send_lock:
+                connection.send(message)
+        except (OSError, EOFError):
+            self.log.exception('Could not send message to shard worker!')
+
+
+class _CloudWriteRouter(CloudioAttributeListener):
+    """Forwards the changes of an attribute coming from the cloud to the worker owning it.
+    """
+
+    def __init__(self, shard_host, connection, node_name, path):
+        super(_CloudWriteRouter, self).__init__()
+        self._shard_host = shard_host
+        self._connection = connection
+        self._node_name = node_name
+        self._path = path
+
+    def attribute_has_changed(self, attribute, from_cloud=True):
+        if from_cloud:
+            self._shard_host._send_to_worker(self._connection, (MESSAGE_SET, self._node_name, self._path,
+                                                                attribute.get_value(), attribute.get_timestamp()))
+
+
+def node_structure(cloudio_node):
+    """Returns the attributes of the node as a list of (path, type, value, timestamp) tuples.
+
+    The path is a tuple of the names of the objects and of the attribute (ex. ('state', 'temperature')).
+    """
+    structure = []
+    objects = [((name,), cloudio_object) for name, cloudio_object in cloudio_node.get_objects().items()]
+    while objects:
+        path, cloudio_object = objects.pop(0)
+        for name, attribute in cloudio_object._internal.get_attributes().items():
+            structure.append((path + (name,), _ATTRIBUTE_TYPES.get(attribute.get_type_as_string()),
+                              attribute.get_value(), attribute.get_timestamp()))
+        objects += [(path + (name,), child) for name, child in cloudio_object._internal.get_objects().items()]
+    return structure
+
+
+def create_node(structure):
+    """Creates a node with the structure returned by `node_structure()`.
+
+    :rtype CloudioRuntimeNode
+    """
+    from cloudio.endpoint.runtime import CloudioRuntimeNode, CloudioRuntimeObject
+
+    node = CloudioRuntimeNode()
+    node.declare_implemented_interface('NodeInterface')
+    for path, attribute_type, value, timestamp in structure:
+        container = node
+        for object_name in path[:-1]:
+            objects = container.get_objects() if container is node else container._internal.get_objects()
+            if object_name not in objects:
+                container.add_object(object_name, CloudioRuntimeObject())
+            container = objects[object_name]
+        attribute = container.add_attribute(name=path[-1], atype=attribute_type)
+        if value is not None:
+            # Initial value is sent together with the node
+            assign_value(attribute, value, timestamp)
+    return node
+
+
+def location_stack_of_path(path):
+    """Converts a path (ex. ('state', 'temperature')) to the location stack used by `find_attribute()`.
+    """
+    location_stack = [path[-1], 'attributes']
+    for object_name in reversed(path[:-1]):
+        location_stack += [object_name, 'objects']
+    return location_stack
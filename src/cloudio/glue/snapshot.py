@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import json
+
+SnapshotValue = collections.namedtuple('SnapshotValue', ['path', 'value', 'timestamp'])
+SnapshotValue.__doc__ = """Value of one cloud.iO attribute in a snapshot.
+
+:param path: Topic of the attribute relative to the node (ex. 'status.temperature')
+:param value: Value of the attribute
+:param timestamp: Timestamp of the value in milliseconds
+"""
+
+Snapshot = collections.namedtuple('Snapshot', ['topic', 'timestamp', 'values'])
+Snapshot.__doc__ = """Changed attribute values of a node, sent as one message.
+
+:param topic: Topic of the snapshot ('@snapshot/<endpoint>/nodes/<node>')
+:param timestamp: Time the snapshot was taken in milliseconds
+:param values: List of `SnapshotValue`
+"""
+
+
+def encode_snapshot_json(snapshot):
+    """Encodes a snapshot to compact JSON.
+
+    Example:
+        {"timestamp":1690000000123,"attributes":{"status.temperature":[21.5,1690000000120]}}
+
+    :type snapshot: Snapshot
+    :rtype bytes
+    """
+    return json.dumps({'timestamp': snapshot.timestamp,
+                       'attributes': {value.path: [value.value, value.timestamp] for value in snapshot.values}},
+                      separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import weakref
+
+from .token_bucket import TokenBucket
+
+
+class SyncPacer(object):
+    """Limits the rate at which forced synchronisations send attribute updates to cloud.iO.
+
+    When many `Model2CloudConnector` objects are synchronised at startup, all attributes
+    would be published at once. Sharing one pacer between all connectors of an endpoint
+    spreads these messages over time and keeps the broker responsive for live traffic.
+    """
+
+    # One pacer per endpoint. Entries disappear together with the endpoint.
+    _endpoint_pacers = weakref.WeakKeyDictionary()
+    _endpoint_pacers_lock = threading.Lock()
+
+    def __init__(self, messages_per_second, burst=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param messages_per_second: Maximum average number of updates sent per second
+        :type messages_per_second: float
+        :param burst: Number of updates that may be sent at once. Defaults to `messages_per_second`
+        :type burst: int or None
+        """
+        self._token_bucket = TokenBucket(messages_per_second, capacity=burst, clock=clock, sleep=sleep)
+
+    @classmethod
+    def for_endpoint(cls, cloudio_endpoint, messages_per_second, burst=None):
+        """Returns the pacer shared by all connectors of the given endpoint.
+
+        The pacer is created on first call. Later calls return the same pacer and
+        ignore the rate parameters.
+
+        :param cloudio_endpoint: The endpoint the pacer belongs to
+        :type cloudio_endpoint: CloudioEndpoint
+        """
+        with cls._endpoint_pacers_lock:
+            pacer = cls._endpoint_pacers.get(cloudio_endpoint)
+            if pacer is None:
+                pacer = cls(messages_per_second, burst=burst)
+                cls._endpoint_pacers[cloudio_endpoint] = pacer
+            return pacer
+
+    @property
+    def messages_per_second(self):
+        return self._token_bucket.rate
+
+    def acquire(self):
+        """Waits until the next update may be sent.
+
+        :return The time in seconds spent waiting.
+        """
+        return self._token_bucket.acquire()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+# Tolerance absorbing floating point rounding errors of the refill computation
+_EPSILON = 1e-9
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket limiting the rate of an operation.
+
+    Tokens are refilled continuously at `rate` tokens per second. At most `capacity`
+    tokens can be accumulated, which defines the maximum burst size.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: Number of tokens added per second
+        :type rate: float
+        :param capacity: Maximum number of tokens in the bucket. Defaults to one second worth of tokens
+        :type capacity: float or None
+        :param clock: Monotonic clock returning seconds
+        :param sleep: Function used to wait for tokens
+        """
+        assert rate > 0, 'Rate must be greater than zero!'
+
+        self._rate = float(rate)
+        self._capacity = float(capacity) if capacity else max(1.0, self._rate)
+        self._tokens = self._capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._timestamp = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._timestamp
+        if elapsed > 0:
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+        self._timestamp = now
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens from the bucket without waiting.
+
+        :return True if the tokens were available, false otherwise.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens + _EPSILON >= tokens:
+                self._tokens = max(0.0, self._tokens - tokens)
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Takes tokens from the bucket. Waits until enough tokens are available.
+
+        :return The time in seconds spent waiting.
+        """
+        assert tokens <= self._capacity, 'Cannot acquire more tokens than the bucket can hold!'
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens + _EPSILON >= tokens:
+                    self._tokens = max(0.0, self._tokens - tokens)
+                    return waited
+                delay = (tokens - self._tokens) / self._rate
+            self._sleep(delay)
+            waited += delay
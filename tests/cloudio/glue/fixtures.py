@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Models and endpoints shared by the tests.
+"""
+
+from tests.cloudio.glue import paths  # noqa: F401 Makes the sources importable
+
+from cloudio.glue import InMemoryCloudioEndpoint, Model2CloudConnector
+
+HEATER_MAPPING = {'temperature': {'topic': 'status.temperature', 'attributeType': float, 'constraints': ('read',)},
+                  'setpoint': {'topic': 'config.setpoint', 'attributeType': float, 'constraints': ('read', 'write')}}
+
+
+class MappedModel(Model2CloudConnector):
+    """Model holding plain attributes. Its node is named after the class.
+    """
+
+    def __init__(self, attribute_mapping, **values):
+        """
+        :param attribute_mapping: The attribute mapping
+        :param values: Initial values of the model attributes
+        """
+        super(MappedModel, self).__init__()
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.set_attribute_mapping(attribute_mapping)
+
+
+class HeaterModel(MappedModel):
+    """Heater with a measured temperature ('read') and a setpoint changeable from the cloud ('read', 'write').
+    """
+
+    def __init__(self, attribute_mapping=HEATER_MAPPING, temperature=20.0, setpoint=21.0, **values):
+        super(HeaterModel, self).__init__(attribute_mapping, temperature=temperature, setpoint=setpoint, **values)
+
+
+def connect_model(model, endpoint='gateway'):
+    """Creates the node of the model in an endpoint and clears the messages published so far.
+
+    :param model: The model to connect
+    :type model: Model2CloudConnector
+    :param endpoint: The endpoint or the name of the `InMemoryCloudioEndpoint` to create
+    :return The model and the endpoint
+    """
+    if isinstance(endpoint, str):
+        endpoint = InMemoryCloudioEndpoint(endpoint)
+    model.create_cloud_io_node(endpoint)
+    endpoint.clear()
+    return model, endpoint
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import tracemalloc
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestSampleWindow(unittest.TestCase):
+    """Tests the SampleWindow ring buffer.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def test_aggregate(self):
+        from cloudio.glue.aggregation import SampleWindow
+
+        window = SampleWindow(size=3, interval=2.0, now=10.0)
+        self.assertEqual(window.due, 12.0)
+        self.assertIsNone(window.aggregate())
+
+        for value in (4, 8, 1, 3):
+            window.add(value)
+        self.assertEqual(window.received, 4)
+        self.assertEqual(window.aggregate(), {'min': 1.0, 'max': 8.0, 'mean': 4.0, 'last': 3.0, 'count': 4})
+        self.assertEqual(window.aggregate(('last',)), {'last': 3.0})
+
+        window.restart(now=12.5)
+        self.assertEqual(window.due, 14.5)
+        self.assertIsNone(window.aggregate())
+
+    def test_add_does_not_allocate(self):
+        from cloudio.glue.aggregation import SampleWindow
+
+        window = SampleWindow(size=64, interval=1.0, now=0.0)
+        values = [float(index) for index in range(10000)]
+
+        tracemalloc.start()
+        try:
+            for value in values:
+                window.add(value)
+            allocated = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(allocated, 1024)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestChangeSubscription(unittest.TestCase):
+    """Tests the ChangeSubscription queue.
+    """
+
+    log = logging.getLogger(__name__)
+
+    @staticmethod
+    def _event(model_attribute_name='temperature', topic='status.temperature', value=1.0):
+        from cloudio.glue import ChangeEvent
+
+        return ChangeEvent(None, model_attribute_name, topic, value, 0, False)
+
+    def test_matches(self):
+        from cloudio.glue import ChangeSubscription
+
+        self.assertTrue(ChangeSubscription().matches('temperature', 'status.temperature'))
+        by_name = ChangeSubscription(model_attribute_names=['temperature'])
+        self.assertTrue(by_name.matches('temperature', 'status.temperature'))
+        self.assertFalse(by_name.matches('pressure', 'status.pressure'))
+        by_topic = ChangeSubscription(topic_prefix='status.')
+        self.assertTrue(by_topic.matches('temperature', 'status.temperature'))
+        self.assertTrue(by_topic.matches('status', 'status'))
+        self.assertFalse(by_topic.matches('value', 'status_flags.value'))
+
+    def test_drop_oldest(self):
+        from cloudio.glue import ChangeSubscription
+
+        subscription = ChangeSubscription(max_queue_size=3)
+        for value in range(10):
+            subscription.deliver(self._event(value=value))
+
+        self.assertEqual(len(subscription), 3)
+        self.assertEqual(subscription.dropped, 7)
+        self.assertEqual([event.value for event in subscription.drain()], [7, 8, 9])
+
+    def test_get_waits(self):
+        from cloudio.glue import ChangeSubscription
+
+        subscription = ChangeSubscription()
+        self.assertIsNone(subscription.get(timeout=0.01))
+
+        timer = threading.Timer(0.05, subscription.deliver, args=(self._event(value=42),))
+        timer.start()
+        self.assertEqual(subscription.get(timeout=5.0).value, 42)
+        timer.join()
+
+    def test_iterate_until_closed(self):
+        from cloudio.glue import ChangeSubscription
+
+        subscription = ChangeSubscription()
+        received = []
+        consumer = threading.Thread(target=lambda: received.extend(event.value for event in subscription))
+        consumer.start()
+
+        for value in range(3):
+            subscription.deliver(self._event(value=value))
+        subscription.close()
+        subscription.deliver(self._event(value=99))    # Ignored
+        consumer.join(timeout=5.0)
+
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(received, [0, 1, 2])
+
+    def test_failing_callback(self):
+        from cloudio.glue import ChangeSubscription
+
+        def callback(event):
+            raise RuntimeError('Subscriber failed')
+
+        subscription = ChangeSubscription(callback=callback)
+        with self.assertLogs('cloudio.glue.change_stream', level='ERROR'):
+            subscription.deliver(self._event())
+        self.assertEqual(len(subscription), 0)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import threading
+import unittest
+
+from tests.cloudio.glue.fixtures import MappedModel, connect_model
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestCloudWriteDispatcher(unittest.TestCase):
+    """Tests CloudWriteDispatcher class.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_heater(self):
+        class HeaterModel(MappedModel):
+            def __init__(self):
+                super(HeaterModel, self).__init__({'power': {'topic': 'property.power', 'attributeType': int,
+                                                             'constraints': ('write',)},
+                                                   'mode': {'topic': 'property.mode', 'attributeType': int,
+                                                            'constraints': ('write',)}},
+                                                  release=threading.Event(), started=threading.Event(), applied=[])
+
+            def on_power_set_from_cloud(self, value):
+                self.started.set()
+                self.release.wait(5)
+                self.applied.append(('power', value))
+
+            def on_mode_set_from_cloud(self, value):
+                self.applied.append(('mode', value))
+
+        heater, _ = connect_model(HeaterModel())
+        return heater, heater._cloudio_node
+
+    def test_writes_are_coalesced(self):
+        from cloudio.glue import CloudWriteDispatcher
+
+        heater, node = self._create_heater()
+        dispatcher = CloudWriteDispatcher(max_workers=2)
+        self.addCleanup(dispatcher.shutdown)
+        heater.set_cloud_write_dispatcher(dispatcher)
+        events = []
+        heater.subscribe_changes(['power'], callback=events.append)
+
+        power = node.find_attribute(['power', 'attributes', 'property', 'objects'])
+        mode = node.find_attribute(['mode', 'attributes', 'property', 'objects'])
+
+        power.set_value(1)
+        self.assertTrue(heater.attribute_has_changed(power, from_cloud=True))
+        self.assertTrue(heater.started.wait(5))     # Worker is now blocked in the setter
+
+        # Burst of values while the first one is still being applied
+        for value in (2, 3, 4):
+            power.set_value(value)
+            heater.attribute_has_changed(power, from_cloud=True)
+
+        # Other attributes are not held back by the slow setter
+        mode.set_value(7)
+        heater.attribute_has_changed(mode, from_cloud=True)
+
+        heater.release.set()
+        self.assertTrue(dispatcher.wait_idle(timeout=5))
+
+        self.assertEqual([write for write in heater.applied if write[0] == 'power'], [('power', 1), ('power', 4)])
+        self.assertIn(('mode', 7), heater.applied)
+        self.assertEqual(dispatcher.coalesced_count, 2)
+        # Subscribers get the values applied, not the value the cloud.iO attribute has meanwhile
+        self.assertEqual([(event.value, event.from_cloud) for event in events], [(1, True), (4, True)])
+
+    def test_dispatch_after_shutdown(self):
+        from cloudio.glue import CloudWriteDispatcher
+
+        heater, node = self._create_heater()
+        dispatcher = CloudWriteDispatcher()
+        heater.set_cloud_write_dispatcher(dispatcher)
+        dispatcher.shutdown()
+
+        mode = node.find_attribute(['mode', 'attributes', 'property', 'objects'])
+        with self.assertRaises(RuntimeError):
+            dispatcher.dispatch(heater, 'mode', mode, 7)
+
+        # Rejected write is not waited for
+        self.assertTrue(dispatcher.wait_idle(timeout=1))
+        self.assertEqual(heater.applied, [])
+
+    def test_without_dispatcher(self):
+        heater, node = self._create_heater()
+        heater.release.set()
+
+        power = node.find_attribute(['power', 'attributes', 'property', 'objects'])
+        power.set_value(3)
+        self.assertTrue(heater.attribute_has_changed(power, from_cloud=True))
+        self.assertEqual(heater.applied, [('power', 3)])
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
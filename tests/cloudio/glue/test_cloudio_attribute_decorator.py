@@ -168,6 +168,35 @@ class TestCloudioAttributeDecorator(unittest.TestCase):
         self.assertEqual(ep.model_attribute_name, 'star')
         self.assertEqual(ep.model_attribute_value, 'sun')
 
+    def test_cloudio_attribute_setter_with_failing_update(self):
+        from cloudio.glue import cloudio_attribute
+
+        class Endpoint(object):
+
+            def __init__(self):
+                super(Endpoint, self).__init__()
+                self._level = 0
+
+            def _update_cloudio_attribute(self, model_attribute_name, model_attribute_value):
+                # Like a converter not accepting the value
+                raise TypeError('Cannot convert level')
+
+            @cloudio_attribute
+            def level(self):
+                return self._level
+
+            @level.setter
+            def level(self, value):
+                self._level = value
+
+        ep = Endpoint()
+        with self.assertLogs(level='WARNING') as log:
+            ep.level = 3
+        self.assertEqual(ep.level, 3)
+        self.assertEqual(len(log.records), 1)
+        self.assertIn('Could not update attribute \'level\'', log.output[0])
+        self.assertIn('TypeError: Cannot convert level', log.output[0])
+
     def test_cloudio_attribute_explicit_setter(self):
         from cloudio.glue import cloudio_attribute
 
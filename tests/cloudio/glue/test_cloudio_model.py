@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class FakeCloudioEndpoint(object):
+
+    def add_node(self, node, object):
+        pass
+
+
+class TestCloudioModelDecorator(unittest.TestCase):
+    """Tests @cloudio_model class decorator.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_mouse_class(self):
+        from cloudio.glue import Model2CloudConnector, cloudio_model
+
+        @cloudio_model
+        class ComputerMouse(Model2CloudConnector):
+            ATTRIBUTE_MAPPING = {'x': {'topic': 'position.x', 'attributeType': float, 'constraints': ('read',)},
+                                 'y': {'topic': 'position.y', 'attributeType': float, 'constraints': ('read',),
+                                       'initialValue': 1.5},
+                                 'name': {'topic': 'info.name', 'attributeType': str, 'constraints': ('read',)},
+                                 }
+
+            def __init__(self):
+                super().__init__()
+                self.updates = []
+
+            def _update_cloudio_attribute(self, model_attribute_name, model_attribute_value, force=False):
+                self.updates.append((model_attribute_name, model_attribute_value))
+                super(ComputerMouse, self)._update_cloudio_attribute(model_attribute_name, model_attribute_value,
+                                                                     force)
+
+            @property
+            def name(self):
+                return 'mouse'
+
+        return ComputerMouse
+
+    def test_generated_properties(self):
+        ComputerMouse = self._create_mouse_class()
+
+        self.assertEqual(ComputerMouse.__slots__, ('_x', '_y'))
+
+        mouse = ComputerMouse()
+        self.assertEqual(mouse.x, 0.0)
+        self.assertEqual(mouse.y, 1.5)
+        self.assertEqual(mouse.name, 'mouse')                    # Not replaced
+        self.assertIs(mouse._attribute_mapping, ComputerMouse.ATTRIBUTE_MAPPING)
+
+        mouse.x = 3.0
+        mouse.x = 3.0                                            # Same value, no update
+        mouse.y = 2.0
+        self.assertEqual(mouse.updates, [('x', 3.0), ('y', 2.0)])
+        self.assertEqual(mouse.x, 3.0)
+
+    def test_generated_properties_update_cloud(self):
+        ComputerMouse = self._create_mouse_class()
+
+        mouse = ComputerMouse()
+        node = mouse.create_cloud_io_node(FakeCloudioEndpoint())
+        mouse.enable_dirty_tracking()
+        mouse._take_dirty_attributes()
+
+        mouse.x = 12.0
+        self.assertEqual(node.find_attribute(['x', 'attributes', 'position', 'objects']).get_value(), 12.0)
+        self.assertEqual(mouse._dirty_attributes, set())
+
+    def test_mapping_given_as_parameter(self):
+        from cloudio.glue import Model2CloudConnector, cloudio_model
+
+        @cloudio_model(attribute_mapping={'power': {'topic': 'state.power', 'attributeType': 'bool',
+                                                    'constraints': ['read', 'write']}})
+        class Heater(Model2CloudConnector):
+            pass
+
+        heater = Heater()
+        self.assertIs(heater.power, False)
+        self.assertEqual(heater._attribute_mapping['power']['constraints'], ('read', 'write'))
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
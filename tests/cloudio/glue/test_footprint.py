@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+
+from tests.cloudio.glue.fixtures import MappedModel, connect_model
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+PUMP_MAPPING = {'speed': {'topic': 'state.speed', 'attributeType': float, 'constraints': ('read',)},
+                'enabled': {'topic': 'config.enabled', 'attributeType': bool, 'constraints': ('read', 'write')},
+                'serial': {'topic': 'info.serial', 'attributeType': str, 'constraints': ('static',)}}
+
+
+class TestFootprint(unittest.TestCase):
+    """Tests the memory footprint report.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_station(self, pump_count):
+        class PumpModel(MappedModel):
+            def __init__(self):
+                super(PumpModel, self).__init__(PUMP_MAPPING, speed=0.0, enabled=False, serial='P-1')
+
+        class StationModel(MappedModel):
+            pass
+
+        station = StationModel({'pressure': {'topic': 'state.pressure', 'attributeType': float,
+                                             'constraints': ('read',)}}, pressure=1.0)
+        for index in range(pump_count):
+            station.add_child_connector(PumpModel(), 'pumps.pump-%d' % index)
+        connect_model(station, 'plant')
+        return station
+
+    def test_connector_footprint(self):
+        from cloudio.glue.footprint import connector_footprint
+
+        station = self._create_station(2)
+
+        footprint = connector_footprint(station)
+        self.assertEqual(footprint.mapped_attributes, 1 + 2 * 3)
+        self.assertEqual(footprint.cloudio_attributes, 7)
+        # state, pumps, pump-0/1 with state, config and info each
+        self.assertEqual(footprint.cloudio_objects, 2 + 2 * 4)
+        self.assertEqual(footprint.listeners, 2)
+        self.assertGreater(footprint.retained_bytes, 0)
+
+        # Nodes belong to the top connector
+        child_footprint = connector_footprint(station._child_connectors[0])
+        self.assertEqual((child_footprint.cloudio_objects, child_footprint.listeners), (0, 1))
+
+        # More pumps retain more memory
+        self.assertGreater(connector_footprint(self._create_station(4)).retained_bytes, footprint.retained_bytes)
+
+    def test_class_footprints(self):
+        from cloudio.glue.footprint import class_footprints, format_class_footprints
+
+        stations = [self._create_station(3), self._create_station(3)]
+
+        footprints = class_footprints(stations)
+        self.assertEqual(set(footprints), {'StationModel', 'PumpModel'})
+        self.assertEqual(footprints['PumpModel'].instances, 6)
+        self.assertEqual(footprints['PumpModel'].mapped_attributes, 18)
+        self.assertEqual(footprints['StationModel'].cloudio_attributes, 2 * 10)
+        self.assertIn('PumpModel', format_class_footprints(footprints))
+
+    def test_allocation_tracker(self):
+        from cloudio.glue.footprint import AllocationTracker
+
+        with AllocationTracker(snapshots=True) as allocations:
+            kept = [bytearray(1024) for _ in range(100)]
+        self.assertGreaterEqual(allocations.allocated, 100 * 1024)
+        self.assertGreaterEqual(allocations.peak, allocations.allocated)
+        self.assertTrue(allocations.top(1))
+        with self.assertRaises(AssertionError):
+            allocations.assert_below(1024)
+        del kept
+
+        with AllocationTracker() as allocations:
+            self._create_station(2)
+        allocations.assert_below(64 * 1024)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import unittest
+
+from tests.cloudio.glue.fixtures import HeaterModel
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestInMemoryCloudioEndpoint(unittest.TestCase):
+    """Tests InMemoryCloudioEndpoint class.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_heater(self, endpoint):
+        heater = HeaterModel()
+        heater.create_cloud_io_node(endpoint)
+        return heater
+
+    def test_publishes_are_recorded(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        now = [10.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        endpoint = InMemoryCloudioEndpoint('gateway', publish_latency=0.5, clock=lambda: now[0], sleep=sleep)
+        heater = self._create_heater(endpoint)
+        self.assertEqual(endpoint.published[0].topic, '@nodeAdded/gateway/nodes/HeaterModel')
+        endpoint.clear()
+
+        heater._update_cloudio_attributes()
+        heater._update_cloudio_attribute('temperature', 22.5)
+
+        published = endpoint.published
+        self.assertEqual([(record.topic, record.value) for record in published],
+                         [('@update/gateway/nodes/HeaterModel/objects/status/attributes/temperature', 20.0),
+                          ('@update/gateway/nodes/HeaterModel/objects/config/attributes/setpoint', 21.0),
+                          ('@update/gateway/nodes/HeaterModel/objects/status/attributes/temperature', 22.5)])
+        self.assertEqual([record.timestamp for record in published], [11.0, 11.5, 12.0])
+        self.assertEqual(published[0].duration, 0.5)
+        self.assertEqual(sleeps, [0.5] * 4)    # Including '@nodeAdded'
+        self.assertEqual(endpoint.publish_count, 3)
+
+    def test_max_records(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        endpoint = InMemoryCloudioEndpoint(max_records=2)
+        heater = self._create_heater(endpoint)
+
+        for value in range(1, 6):
+            heater._update_cloudio_attribute('temperature', float(value))
+
+        self.assertEqual([record.value for record in endpoint.published], [4.0, 5.0])
+        self.assertEqual(endpoint.publish_count, 6)     # Including '@nodeAdded'
+
+    def test_set_attribute_from_cloud(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        endpoint = InMemoryCloudioEndpoint('gateway')
+        heater = self._create_heater(endpoint)
+
+        for value in (23.0, 24.0):      # Same millisecond is no problem
+            self.assertTrue(endpoint.set_attribute_from_cloud(
+                '@set/gateway/nodes/HeaterModel/objects/config/attributes/setpoint', value))
+            self.assertEqual(heater.setpoint, value)
+
+        with self.assertLogs(endpoint.log, level='ERROR'):
+            self.assertFalse(endpoint.set_attribute_from_cloud(
+                'gateway/nodes/HeaterModel/objects/status/attributes/power', 1.0))
+        with self.assertLogs(endpoint.log, level='ERROR'):
+            self.assertFalse(endpoint.set_attribute_from_cloud('other/nodes/HeaterModel', 1.0))
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import contextlib
+import io
+import logging
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestLoadGenerator(unittest.TestCase):
+    """Tests the load generator.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def test_percentile(self):
+        from cloudio.glue.metrics import percentile
+
+        values = list(range(100, 0, -1))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 1), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_run_load(self):
+        from cloudio.glue.load_generator import run_load
+
+        report = run_load(connectors=3, attributes=4, update_rate=400, write_rate=100, duration=0.2,
+                          dispatcher_workers=2, trace_memory=True)
+
+        self.assertGreater(report.updates, 0)
+        self.assertGreater(report.writes, 0)
+        self.assertEqual(report.publishes, report.updates)
+        self.assertLessEqual(report.update_latency_p50, report.update_latency_p99)
+        self.assertLessEqual(report.write_latency_p50, report.write_latency_p99)
+        self.assertGreater(report.memory_peak, 0)
+
+    def test_main(self):
+        from cloudio.glue.load_generator import main
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['-n', '2', '-m', '2', '-u', '100', '-w', '0', '-d', '0.1']), 0)
+
+        self.assertIn('Connectors:        2 x 2 attributes', output.getvalue())
+        self.assertIn('Write latency:     p50 -, p99 -', output.getvalue())
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+MOUSE_MAPPING = {'x': {'topic': 'position.x', 'attributeType': 'float', 'constraints': ['read']},
+                 'y': {'topic': 'position.y', 'attributeType': 'float', 'constraints': ['read'],
+                       'toCloudioValueConverter': 'to_millimeters'},
+                 'enable': {'objectName': 'config', 'attributeName': 'enable', 'attributeType': 'bool',
+                            'constraints': ['read', 'write'], 'priority': 'high'},
+                 }
+
+
+class TestMappingLoader(unittest.TestCase):
+    """Tests loading of attribute mappings from files.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _write(self, file_name, content):
+        path = os.path.join(self.directory.name, file_name)
+        with open(path, 'w') as mapping_file:
+            mapping_file.write(content)
+        return path
+
+    def test_load_json(self):
+        from cloudio.glue.mapping_loader import load_attribute_mapping
+
+        path = self._write('mouse.json', json.dumps(MOUSE_MAPPING))
+        mapping = load_attribute_mapping(path)
+
+        self.assertEqual(set(mapping), {'x', 'y', 'enable'})
+        self.assertIs(mapping['x']['attributeType'], float)
+        self.assertIs(mapping['enable']['attributeType'], bool)
+        self.assertEqual(mapping['enable']['constraints'], ('read', 'write'))
+
+    def test_cache_skips_parsing(self):
+        from cloudio.glue.mapping_loader import load_attribute_mapping
+
+        path = self._write('mouse.json', json.dumps(MOUSE_MAPPING))
+        first = load_attribute_mapping(path)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory.name, '__pycache__'))), 1)
+
+        with mock.patch('cloudio.glue.mapping_loader._parse_mapping_file') as parse, \
+                mock.patch('cloudio.glue.mapping_loader.validate_attribute_mapping') as validate:
+            second = load_attribute_mapping(path)
+            parse.assert_not_called()
+            validate.assert_not_called()
+        self.assertEqual(first, second)
+
+        # Changing the file invalidates the cache and replaces the old cache file
+        mapping = dict(MOUSE_MAPPING)
+        del mapping['x']
+        self._write('mouse.json', json.dumps(mapping))
+        self.assertEqual(set(load_attribute_mapping(path)), {'y', 'enable'})
+        self.assertEqual(len(os.listdir(os.path.join(self.directory.name, '__pycache__'))), 1)
+
+    def test_cache_holds_data_only(self):
+        import pickle
+        from cloudio.glue.mapping_loader import load_attribute_mapping
+
+        path = self._write('mouse.json', json.dumps(MOUSE_MAPPING))
+        first = load_attribute_mapping(path)
+        cache_directory = os.path.join(self.directory.name, '__pycache__')
+        cache_path = os.path.join(cache_directory, os.listdir(cache_directory)[0])
+        with open(cache_path) as cache_file:
+            self.assertEqual(json.load(cache_file)['enable']['attributeType'], 'bool')
+
+        # A pickle planted in the cache is not loaded
+        with open(cache_path, 'wb') as cache_file:
+            pickle.dump({'x': {}}, cache_file)
+        with self.assertLogs('cloudio.glue.mapping_loader', level='WARNING'):
+            self.assertEqual(load_attribute_mapping(path), first)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('yaml'), 'PyYAML not installed')
+    def test_load_yaml(self):
+        from cloudio.glue.mapping_loader import load_attribute_mapping
+
+        path = self._write('mouse.yaml', 'x:\n'
+                                         '  topic: position.x\n'
+                                         '  attributeType: float\n'
+                                         '  constraints: [read]\n')
+        mapping = load_attribute_mapping(path, use_cache=False)
+        self.assertEqual(mapping, {'x': {'topic': 'position.x', 'attributeType': float, 'constraints': ('read',)}})
+
+    def test_all_errors_reported(self):
+        from cloudio.glue import AttributeMappingError
+        from cloudio.glue.mapping_loader import load_attribute_mapping
+
+        path = self._write('bad.json', json.dumps({'a': {'attributeType': 'float', 'constraints': ['read']},
+                                                   'b': {'topic': 'x..y', 'attributeType': 'complex',
+                                                         'constraints': ['read', 'execute']},
+                                                   'c': {'topic': 'x.c', 'attributeType': 'int',
+                                                         'constraints': 'read', 'priority': 'urgent'},
+                                                   'd': {'topic': 'x.d', 'attributeType': 'str',
+                                                         'constraints': ['read'], 'changeDetection': 'hash'},
+                                                   }))
+        with self.assertRaises(AttributeMappingError) as context:
+            load_attribute_mapping(path)
+
+        self.assertEqual(len(context.exception.errors), 7)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, '__pycache__')))
+
+    def test_aggregation_errors(self):
+        from cloudio.glue import AttributeMappingError
+        from cloudio.glue.mapping_loader import compile_attribute_mapping
+
+        mapping = compile_attribute_mapping({'p': {'topic': 'power', 'attributeType': 'float', 'constraints': ['read'],
+                                                   'aggregate': ['min', 'max'], 'aggregationInterval': 0.5}})
+        self.assertEqual(mapping['p']['aggregate'], ('min', 'max'))
+
+        with self.assertRaises(AttributeMappingError) as context:
+            compile_attribute_mapping({'p': {'topic': 'power', 'attributeType': 'str', 'constraints': ['write'],
+                                             'aggregate': ['median'], 'aggregationInterval': 0, 'windowSize': 1.5}})
+        self.assertEqual(len(context.exception.errors), 5)
+
+    def test_sample_period_errors(self):
+        from cloudio.glue import AttributeMappingError
+        from cloudio.glue.mapping_loader import compile_attribute_mapping
+
+        compile_attribute_mapping({'t': {'topic': 'temperature', 'attributeType': 'float', 'constraints': ['read'],
+                                         'samplePeriod': 0.5}})
+
+        with self.assertRaises(AttributeMappingError) as context:
+            compile_attribute_mapping({'t': {'topic': 'temperature', 'attributeType': 'float',
+                                             'constraints': ['write'], 'samplePeriod': -1}})
+        self.assertEqual(len(context.exception.errors), 2)
+
+    def test_unhashable_attribute_type(self):
+        from cloudio.glue import AttributeMappingError
+        from cloudio.glue.mapping_loader import compile_attribute_mapping
+
+        with self.assertRaises(AttributeMappingError) as context:
+            compile_attribute_mapping({'t': {'topic': 'temperature', 'attributeType': ['float'],
+                                             'constraints': ['read']}})
+        self.assertEqual(context.exception.errors, ['\'t\': Unsupported attribute type \'[\'float\']\'!'])
+
+    def test_bytes_attribute_type(self):
+        from cloudio.glue import AttributeMappingError
+        from cloudio.glue.mapping_loader import compile_attribute_mapping
+
+        for attribute_type in ('bytes', bytes):
+            with self.assertRaises(AttributeMappingError) as context:
+                compile_attribute_mapping({'f': {'topic': 'firmware', 'attributeType': attribute_type,
+                                                 'constraints': ['read']}})
+            self.assertIn('Attribute type \'bytes\' cannot be published!', context.exception.errors[0])
+
+    def test_connector_load_attribute_mapping(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class ComputerMouse(Model2CloudConnector):
+            def to_millimeters(self, value):
+                return value * 10
+
+        path = self._write('mouse.json', json.dumps(MOUSE_MAPPING))
+
+        mouse = ComputerMouse()
+        mouse.load_attribute_mapping(path)
+        self.assertEqual(mouse._attribute_mapping['y']['toCloudioValueConverter'](2), 20)
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
@@ -1,7 +1,13 @@
 import unittest
 
+# Fixtures first: they make the sources importable
+from tests.cloudio.glue.fixtures import HEATER_MAPPING, HeaterModel, MappedModel, connect_model
+
 from cloudio.endpoint.runtime import CloudioRuntimeNode
 
+SENSOR_MAPPING = {'temperature': {'topic': 'temperature', 'attributeType': float, 'constraints': ('read',)}}
+POWER_MAPPING = {'power': {'topic': 'state.power', 'attributeType': int, 'constraints': ('read', 'write')}}
+
 
 class FakeCloudioEndpoint(object):
 
@@ -621,5 +627,1268 @@ class TestModel2CloudioConnectorCallbacks(unittest.TestCase):
         self.assertTrue(heater.power)
 
 
+class TestModel2CloudioConnectorDirtyTracking(unittest.TestCase):
+
+    def _create_model(self):
+        from cloudio.glue import Model2CloudConnector, cloudio_attribute
+
+        class CounterModel(Model2CloudConnector):
+            def __init__(self):
+                super(CounterModel, self).__init__()
+                self._count = 0
+                self.plain = 'a'
+                self.getter_calls = []
+
+                self.set_attribute_mapping({'count': {'topic': 'counter.count', 'attributeType': int,
+                                                      'constraints': ('read',)},
+                                            'plain': {'topic': 'counter.plain', 'attributeType': str,
+                                                      'constraints': ('read',)},
+                                            })
+
+            def __getattribute__(self, name):
+                if name in ('count', 'plain'):
+                    object.__getattribute__(self, 'getter_calls').append(name)
+                return object.__getattribute__(self, name)
+
+            @cloudio_attribute
+            def count(self):
+                return self._count
+
+            @count.setter
+            def count(self, value):
+                self._count = value
+
+        model = CounterModel()
+        model.create_cloud_io_node(FakeCloudioEndpoint())
+        return model
+
+    def test_non_forced_update_visits_dirty_attributes_only(self):
+        model = self._create_model()
+        model.enable_dirty_tracking()
+
+        # Initially all attributes are dirty
+        model._update_cloudio_attributes(force=False)
+        self.assertEqual(sorted(model.getter_calls), ['count', 'plain'])
+
+        # Nothing changed
+        model.getter_calls.clear()
+        model._update_cloudio_attributes(force=False)
+        self.assertEqual(model.getter_calls, [])
+
+        # Plain attributes need to be marked explicitly
+        model.plain = 'b'
+        model.mark_dirty('plain')
+        model.getter_calls.clear()
+        model._update_cloudio_attributes(force=False)
+        self.assertEqual(model.getter_calls, ['plain'])
+
+    def test_decorator_marks_dirty_until_synchronized(self):
+        model = self._create_model()
+        model.enable_dirty_tracking()
+        model._update_cloudio_attributes(force=False)
+
+        model.has_valid_data = lambda: False
+        model.count = 5                             # Cannot be sent now
+        self.assertEqual(model._dirty_attributes, {'count'})
+
+        model.has_valid_data = lambda: True
+        model.getter_calls.clear()
+        model._update_cloudio_attributes(force=False)
+        self.assertEqual(model.getter_calls, ['count'])
+        self.assertEqual(model._dirty_attributes, set())
+
+    def test_dirty_tracking_disabled(self):
+        model = self._create_model()
+
+        model.mark_dirty('plain')
+        self.assertEqual(model._dirty_attributes, set())
+        model._update_cloudio_attributes(force=False)
+        self.assertEqual(sorted(model.getter_calls), ['count', 'plain'])
+
+
+class TestModel2CloudioConnectorChildren(unittest.TestCase):
+
+    def _create_rack(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class ChannelModel(Model2CloudConnector):
+            def __init__(self):
+                super(ChannelModel, self).__init__()
+                self.voltage = 0.0
+                self.enable = False
+                self.set_attribute_mapping({'voltage': {'topic': 'measure.voltage', 'attributeType': float,
+                                                        'constraints': ('read',)},
+                                            'enable': {'topic': 'config.enable', 'attributeType': bool,
+                                                       'constraints': ('write',)},
+                                            })
+
+        class ModuleModel(Model2CloudConnector):
+            def __init__(self):
+                super(ModuleModel, self).__init__()
+                self.temperature = 20.0
+                self.set_attribute_mapping({'temperature': {'topic': 'temperature', 'attributeType': float,
+                                                            'constraints': ('read',)}})
+
+        class RackModel(Model2CloudConnector):
+            pass
+
+        rack = RackModel()
+        modules = [ModuleModel(), ModuleModel()]
+        channels = [ChannelModel(), ChannelModel()]
+        for index, module in enumerate(modules):
+            rack.add_child_connector(module, 'modules.slot-%d' % index)
+        for index, channel in enumerate(channels):
+            modules[1].add_child_connector(channel, 'channels.ch-%d' % index)
+        return rack, modules, channels
+
+    def test_children_share_parent_node(self):
+        rack, modules, channels = self._create_rack()
+        node = rack.create_cloud_io_node(FakeCloudioEndpoint())
+
+        self.assertIs(modules[0]._cloudio_node, node)
+        self.assertIs(channels[1]._cloudio_node, node)
+
+        temperature = node.find_attribute(['temperature', 'attributes', 'slot-0', 'objects',
+                                           'modules', 'objects'])
+        voltage = node.find_attribute(['voltage', 'attributes', 'measure', 'objects', 'ch-1', 'objects',
+                                       'channels', 'objects', 'slot-1', 'objects', 'modules', 'objects'])
+        self.assertIsNotNone(temperature)
+        self.assertIsNotNone(voltage)
+
+        # Updating the parent updates the whole tree
+        modules[0].temperature = 35.0
+        channels[1].voltage = 3.3
+        rack._update_cloudio_attributes(force=False)
+        self.assertEqual(temperature.get_value(), 35.0)
+        self.assertEqual(voltage.get_value(), 3.3)
+
+    def test_cloud_write_reaches_child(self):
+        rack, modules, channels = self._create_rack()
+        node = rack.create_cloud_io_node(FakeCloudioEndpoint())
+
+        enable = node.find_attribute(['enable', 'attributes', 'config', 'objects', 'ch-0', 'objects',
+                                      'channels', 'objects', 'slot-1', 'objects', 'modules', 'objects'])
+        enable.set_value(True)
+
+        self.assertIsNone(channels[1]._find_model_attribute_name(enable))
+        self.assertTrue(channels[0].attribute_has_changed(enable, from_cloud=True))
+        self.assertTrue(channels[0].enable)
+        self.assertFalse(channels[1].enable)
+
+    def test_children_added_after_node_creation(self):
+        rack, modules, channels = self._create_rack()
+        rack.create_cloud_io_node(FakeCloudioEndpoint())
+
+        from cloudio.glue import Model2CloudConnector
+        with self.assertRaises(AssertionError):
+            rack.add_child_connector(Model2CloudConnector(), 'late')
+
+    def test_children_share_settings(self):
+        from unittest import mock
+        from cloudio.glue import InMemoryCloudioEndpoint, PublishScheduler
+
+        rack, modules, channels = self._create_rack()
+        sync_pacer, cloud_write_dispatcher, acknowledgement = mock.Mock(), mock.Mock(), mock.Mock()
+        publish_scheduler = PublishScheduler(messages_per_second=1000)     # Not started: holds the updates back
+        rack.set_sync_pacer(sync_pacer)
+        rack.set_cloud_write_dispatcher(cloud_write_dispatcher)
+        rack.set_publish_scheduler(publish_scheduler)
+        rack.set_cloud_write_acknowledgement(acknowledgement)
+        # Child added after the settings
+        sensor = MappedModel(SENSOR_MAPPING, temperature=20.0)
+        rack.add_child_connector(sensor, 'sensor')
+        endpoint = InMemoryCloudioEndpoint('lab')
+        rack.create_cloud_io_node(endpoint)
+        endpoint.clear()
+        sync_pacer.reset_mock()
+
+        for connector in modules + channels + [sensor]:
+            self.assertEqual((connector._sync_pacer, connector._cloud_write_dispatcher, connector._publish_scheduler,
+                              connector._cloud_write_acknowledgement),
+                             (sync_pacer, cloud_write_dispatcher, publish_scheduler, acknowledgement))
+
+        # One token per attribute of the tree: 2 module temperatures, 2 channel voltages and the sensor
+        rack._update_cloudio_attributes(force=True)
+        self.assertEqual(sync_pacer.acquire.call_count, 5)
+        self.assertEqual(endpoint.publish_count, 0)
+        self.assertEqual(publish_scheduler.pending_count(), 5)
+
+        self.assertTrue(endpoint.set_attribute_from_cloud('lab/nodes/RackModel/objects/modules/objects/slot-1/objects/'
+                                                          'channels/objects/ch-0/objects/config/attributes/enable',
+                                                          True))
+        self.assertEqual(cloud_write_dispatcher.dispatch.call_args[0][:2], (channels[0], 'enable'))
+
+
+class TestModel2CloudioConnectorDetach(unittest.TestCase):
+
+    def _create_heater_class(self):
+        class Heater(MappedModel):
+            def __init__(self):
+                super(Heater, self).__init__(POWER_MAPPING, power=0)
+                self.add_child_connector(MappedModel(SENSOR_MAPPING, temperature=20.0), 'sensor')
+
+        return Heater
+
+    def test_detach(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        endpoint = InMemoryCloudioEndpoint('gateway')
+        heater = self._create_heater_class()()
+        node = heater.create_cloud_io_node(endpoint)
+        power = node.find_attribute(['power', 'attributes', 'state', 'objects'])
+
+        self.assertTrue(endpoint.set_attribute_from_cloud('gateway/nodes/Heater/objects/state/attributes/power', 3))
+        self.assertEqual(heater.power, 3)
+
+        heater.detach()
+        self.assertIsNone(endpoint.get_node('Heater'))
+        self.assertEqual(endpoint.published[-1].topic, '@nodeRemoved/gateway/nodes/Heater')
+        self.assertFalse(power._listeners)
+        self.assertIsNone(heater._child_connectors[0]._cloudio_node)
+
+        # Changes are not forwarded anymore
+        power.set_value_from_cloud(5, power.get_timestamp() + 1)
+        self.assertEqual(heater.power, 3)
+        publish_count = endpoint.publish_count
+        heater._update_cloudio_attribute('power', 7)
+        self.assertEqual(endpoint.publish_count, publish_count)
+
+        heater.detach()     # No effect
+        heater.close()
+
+        # Can be connected again
+        heater.create_cloud_io_node(endpoint)
+        self.assertTrue(endpoint.set_attribute_from_cloud('gateway/nodes/Heater/objects/state/attributes/power', 4))
+        self.assertEqual(heater.power, 4)
+
+    def test_detach_from_endpoint_without_remove_node(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        class LegacyEndpoint(InMemoryCloudioEndpoint):
+            remove_node = None
+
+        endpoint = LegacyEndpoint()
+        heater = self._create_heater_class()()
+        heater.create_cloud_io_node(endpoint)
+
+        heater.detach()
+        self.assertEqual(endpoint.nodes, {})
+
+    def test_mapping_change_does_not_add_listeners_twice(self):
+        heater = self._create_heater_class()()
+        heater.create_cloud_io_node(FakeCloudioEndpoint())
+        heater.set_attribute_mapping(heater._attribute_mapping)
+
+        power = heater._cloudio_node.find_attribute(['power', 'attributes', 'state', 'objects'])
+        self.assertEqual(len(power._listeners), 1)
+
+    def test_dropped_model_is_collected(self):
+        import gc
+        import weakref
+
+        heater = self._create_heater_class()()
+        node = heater.create_cloud_io_node(FakeCloudioEndpoint())
+        heater_ref = weakref.ref(heater)
+
+        del heater
+        gc.collect()
+        self.assertIsNone(heater_ref())
+
+        # Node outliving its model ignores changes
+        power = node.find_attribute(['power', 'attributes', 'state', 'objects'])
+        power.set_value_from_cloud(1, 1)
+
+    def test_churn_memory_stays_flat(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+        from cloudio.glue.footprint import AllocationTracker
+
+        Heater = self._create_heater_class()
+        endpoint = InMemoryCloudioEndpoint('gateway', max_records=1)
+
+        def churn(iterations):
+            for value in range(iterations):
+                heater = Heater()
+                heater.create_cloud_io_node(endpoint)
+                heater._update_cloudio_attributes()
+                endpoint.set_attribute_from_cloud('gateway/nodes/Heater/objects/state/attributes/power', value)
+                heater.detach()
+                # Some models are dropped without detaching. Their node stays in another endpoint
+                if value % 2:
+                    Heater().create_cloud_io_node(FakeCloudioEndpoint())
+
+        churn(200)      # Warm up caches
+        with AllocationTracker() as allocations:
+            churn(2000)
+
+        self.assertEqual(endpoint.nodes, {})
+        allocations.assert_below(64 * 1024)
+
+
+class TestModel2CloudioConnectorRebind(unittest.TestCase):
+
+    def _create_heater(self):
+        class Heater(MappedModel):
+            def __init__(self):
+                super(Heater, self).__init__(POWER_MAPPING, power=0, node_created_count=0)
+                self.add_child_connector(MappedModel(SENSOR_MAPPING, temperature=20.0), 'sensor')
+
+            def _on_cloudio_node_created(self):
+                self.node_created_count += 1
+
+        return Heater()
+
+    def test_rebind_to_new_endpoint(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        old_endpoint = InMemoryCloudioEndpoint('old')
+        new_endpoint = InMemoryCloudioEndpoint('new')
+        heater = self._create_heater()
+        sensor = heater._child_connectors[0]
+
+        old_node = heater.create_cloud_io_node(old_endpoint)
+        heater._update_cloudio_attributes()
+        location_stack = heater._cached_location_stack_of('power')
+
+        new_node = heater.create_cloud_io_node(new_endpoint)
+        self.assertIsNot(new_node, old_node)
+        self.assertIs(sensor._cloudio_node, new_node)
+        self.assertIs(heater._cached_location_stack_of('power'), location_stack)     # Reused
+        self.assertEqual(heater.node_created_count, 2)
+
+        old_endpoint.clear()
+        heater._update_cloudio_attribute('power', 5)
+        sensor._update_cloudio_attribute('temperature', 25.0)
+        self.assertEqual(old_endpoint.published, [])
+        self.assertEqual([record.topic for record in new_endpoint.published[-2:]],
+                         ['@update/new/nodes/Heater/objects/state/attributes/power',
+                          '@update/new/nodes/Heater/objects/sensor/attributes/temperature'])
+
+        # Only the new node forwards changes from the cloud
+        self.assertTrue(old_endpoint.set_attribute_from_cloud('old/nodes/Heater/objects/state/attributes/power', 1))
+        self.assertEqual(heater.power, 0)
+        self.assertTrue(new_endpoint.set_attribute_from_cloud('new/nodes/Heater/objects/state/attributes/power', 2))
+        self.assertEqual(heater.power, 2)
+
+        # Detaching now removes the node from the new endpoint only
+        heater.detach()
+        self.assertEqual(new_endpoint.nodes, {})
+        self.assertIs(old_endpoint.get_node('Heater'), old_node)
+
+    def test_set_cloudio_buddy_twice(self):
+        from cloudio.endpoint.runtime import CloudioRuntimeObject
+
+        heater = self._create_heater()
+        heater.create_cloud_io_node(FakeCloudioEndpoint())
+
+        node = CloudioRuntimeNode()
+        node.set_name('Heater')
+        power = node.add_object('state', CloudioRuntimeObject).add_attribute('power', int)
+
+        heater.set_cloudio_buddy(node)
+        self.assertEqual(heater._model_attribute_names, {power: 'power'})
+        self.assertEqual(heater._find_model_attribute_name(power), 'power')
+
+
+class TestModel2CloudioConnectorChangeDetection(unittest.TestCase):
+
+    def _create_model(self):
+        import json
+        from cloudio.glue import Model2CloudConnector
+
+        class RouterModel(Model2CloudConnector):
+            def __init__(self):
+                super(RouterModel, self).__init__()
+                self.routes = {'default': '10.0.0.1'}
+                self.neighbours = ['a']
+                self.hostname = 'edge-1'
+                self.converted = 0
+                self.set_attribute_mapping({'routes': {'topic': 'config.routes', 'attributeType': str,
+                                                       'constraints': ('read',), 'changeDetection': 'fingerprint',
+                                                       'toCloudioValueConverter': self.to_json},
+                                            'neighbours': {'topic': 'config.neighbours', 'attributeType': str,
+                                                           'constraints': ('read',), 'changeDetection': 'identity',
+                                                           'toCloudioValueConverter': self.to_json},
+                                            'hostname': {'topic': 'config.hostname', 'attributeType': str,
+                                                         'constraints': ('read',)},
+                                            })
+
+            def to_json(self, value):
+                self.converted += 1
+                return json.dumps(value, sort_keys=True)
+
+        router, endpoint = connect_model(RouterModel(), 'edge')
+        router._update_cloudio_attributes()
+        endpoint.clear()
+        router.converted = 0
+        return router, endpoint
+
+    def test_fingerprint(self):
+        router, endpoint = self._create_model()
+
+        # Same content, other object or other key order: not published, not converted
+        router.routes = {'default': '10.0.0.1'}
+        router._update_cloudio_attribute('routes', router.routes)
+        self.assertEqual((endpoint.publish_count, router.converted), (0, 0))
+
+        # In-place mutation is detected
+        router.routes['vpn'] = '10.8.0.1'
+        router._update_cloudio_attribute('routes', router.routes)
+        self.assertEqual([record.value for record in endpoint.published],
+                         ['{"default": "10.0.0.1", "vpn": "10.8.0.1"}'])
+
+        router._update_cloudio_attribute('routes', {'vpn': '10.8.0.1', 'default': '10.0.0.1'})
+        self.assertEqual(endpoint.publish_count, 1)
+
+    def test_identity(self):
+        router, endpoint = self._create_model()
+
+        router.neighbours.append('b')      # In-place mutation is not seen
+        router._update_cloudio_attribute('neighbours', router.neighbours)
+        self.assertEqual(endpoint.publish_count, 0)
+
+        router.neighbours = list(router.neighbours)
+        router._update_cloudio_attribute('neighbours', router.neighbours)
+        self.assertEqual([record.value for record in endpoint.published], ['["a", "b"]'])
+
+        # Forced update publishes anyway
+        router._update_cloudio_attribute('neighbours', router.neighbours, force=True)
+        self.assertEqual(endpoint.publish_count, 2)
+
+    def test_identity_of_none(self):
+        router, endpoint = self._create_model()
+
+        router._update_cloudio_attribute('neighbours', None)
+        router._update_cloudio_attribute('neighbours', None)
+        # Converted and published once
+        self.assertEqual([record.value for record in endpoint.published], ['null'])
+        self.assertEqual(router.converted, 1)
+
+    def test_equality_is_default(self):
+        router, endpoint = self._create_model()
+
+        router._update_cloudio_attribute('hostname', ''.join(['edge', '-1']))
+        self.assertEqual(endpoint.publish_count, 0)
+        router._update_cloudio_attribute('hostname', 'edge-2')
+        self.assertEqual(endpoint.publish_count, 1)
+
+    def test_fingerprint_function(self):
+        from cloudio.glue.change_detection import fingerprint
+
+        self.assertEqual(fingerprint({'a': [1, 2], 'b': {3, 4}}), fingerprint({'b': {4, 3}, 'a': [1, 2]}))
+        self.assertNotEqual(fingerprint({'a': [1, 2]}), fingerprint({'a': [2, 1]}))
+        self.assertNotEqual(fingerprint(b'ab'), fingerprint('ab'))
+        self.assertEqual(len(fingerprint({1: 'x', 'y': 2})), 16)    # Keys not sortable
+
+
+class TestModel2CloudioConnectorSnapshot(unittest.TestCase):
+
+    def _create_rack(self):
+        class RackModel(MappedModel):
+            pass
+
+        rack = RackModel({'fan_speed': {'topic': 'status.fan-speed', 'attributeType': int, 'constraints': ('read',)}},
+                         fan_speed=0)
+        modules = [MappedModel(SENSOR_MAPPING, temperature=20.0), MappedModel(SENSOR_MAPPING, temperature=20.0)]
+        for index, module in enumerate(modules):
+            rack.add_child_connector(module, 'modules.slot-%d' % index)
+        rack, endpoint = connect_model(rack, 'dc')
+        return rack, modules, endpoint
+
+    def test_snapshot(self):
+        import json
+
+        rack, modules, endpoint = self._create_rack()
+        messages = []
+        rack.set_snapshot_transport(lambda topic, payload: messages.append((topic, json.loads(payload))))
+
+        rack.fan_speed = 1200
+        rack._update_cloudio_attributes()
+
+        self.assertEqual(endpoint.publish_count, 0)     # Nothing published attribute by attribute
+        self.assertEqual(len(messages), 1)
+        topic, payload = messages[0]
+        self.assertEqual(topic, '@snapshot/dc/nodes/RackModel')
+        self.assertEqual({path: value[0] for path, value in payload['attributes'].items()},
+                         {'status.fan-speed': 1200, 'modules.slot-0.temperature': 20.0,
+                          'modules.slot-1.temperature': 20.0})
+        self.assertTrue(all(value[1] <= payload['timestamp'] for value in payload['attributes'].values()))
+        self.assertEqual(rack._cloudio_attribute_of('fan_speed').get_value(), 1200)
+
+        # Only changed values are sent by non-forced updates
+        rack._update_cloudio_attributes(force=False)
+        self.assertEqual(len(messages), 1)
+        modules[1].temperature = 42.0
+        rack._update_cloudio_attributes(force=False)
+        self.assertEqual(list(messages[1][1]['attributes']), ['modules.slot-1.temperature'])
+        self.assertEqual(messages[1][1]['attributes']['modules.slot-1.temperature'][0], 42.0)
+
+        # Single updates are published as before
+        rack._update_cloudio_attribute('fan_speed', 1300)
+        self.assertEqual(endpoint.publish_count, 1)
+
+    def test_snapshot_of_child(self):
+        from cloudio.glue.snapshot import Snapshot
+
+        rack, modules, endpoint = self._create_rack()
+        snapshots = []
+        modules[0].set_snapshot_transport(lambda topic, payload: snapshots.append(payload), encoder=lambda s: s)
+
+        modules[0].temperature = 30.0
+        rack._update_cloudio_attributes(force=False)
+
+        self.assertEqual(len(snapshots), 1)
+        self.assertIsInstance(snapshots[0], Snapshot)
+        self.assertEqual([(value.path, value.value) for value in snapshots[0].values],
+                         [('modules.slot-0.temperature', 30.0)])
+        # Others publish attribute by attribute
+        self.assertEqual([record.topic for record in endpoint.published],
+                         ['@update/dc/nodes/RackModel/objects/modules/objects/slot-1/attributes/temperature'])
+
+
+class TestModel2CloudioConnectorAggregation(unittest.TestCase):
+
+    def _create_meter(self):
+        class MeterModel(MappedModel):
+            def __init__(self):
+                super(MeterModel, self).__init__({'power': {'topic': 'measures.power', 'attributeType': float,
+                                                            'constraints': ('read',),
+                                                            'aggregate': ('min', 'max', 'mean', 'last', 'count'),
+                                                            'aggregationInterval': 1.0, 'windowSize': 4}},
+                                                 now=0.0, power=0.0, _aggregation_clock=lambda: self.now)
+
+        return connect_model(MeterModel(), 'grid')
+
+    def _published(self, endpoint):
+        return {record.topic.rsplit('/', 1)[-1]: record.value for record in endpoint.published}
+
+    def test_aggregates_published_per_window(self):
+        meter, endpoint = self._create_meter()
+
+        for value in (5.0, 1.0, 3.0):
+            meter._update_cloudio_attribute('power', value)
+        self.assertEqual(endpoint.publish_count, 0)     # Window not over yet
+
+        meter.now = 1.0
+        meter._update_cloudio_attribute('power', 7.0)
+        self.assertEqual(self._published(endpoint), {'min': 1.0, 'max': 7.0, 'mean': 4.0, 'last': 7.0, 'count': 4})
+        self.assertEqual(endpoint.published[0].topic, '@update/grid/nodes/MeterModel/objects/measures/'
+                                                      'objects/power/attributes/min')
+
+        # Only the last 'windowSize' samples are kept, but all are counted
+        endpoint.clear()
+        for value in (100.0, 2.0, 2.0, 2.0, 2.0):
+            meter._update_cloudio_attribute('power', value)
+        meter.now = 2.0
+        meter._update_cloudio_attributes(force=False)
+        self.assertEqual(self._published(endpoint), {'min': 2.0, 'max': 2.0, 'mean': 2.0, 'last': 2.0, 'count': 5})
+
+    def test_sync_does_not_read_model(self):
+        meter, endpoint = self._create_meter()
+
+        meter.power = 10.0
+        meter._update_cloudio_attributes()
+        self.assertEqual(endpoint.publish_count, 0)     # No samples received
+
+        meter._update_cloudio_attribute('power', 2.0)
+        meter._update_cloudio_attributes()              # Forced sync ends the window
+        self.assertEqual(self._published(endpoint)['mean'], 2.0)
+
+
+class TestModel2CloudioConnectorSyncPlan(unittest.TestCase):
+
+    def _create_device(self):
+        device = MappedModel({'serial': {'topic': 'info.serial', 'attributeType': str, 'constraints': ('static',)},
+                              'temperature': {'topic': 'state.temperature', 'attributeType': float,
+                                              'constraints': ('read',)},
+                              'setpoint': {'topic': 'config.setpoint', 'attributeType': float,
+                                           'constraints': ('write',)}},
+                             serial='A-1', temperature=20.0, setpoint=21.0)
+        return connect_model(device, 'site')
+
+    def _published_attributes(self, endpoint):
+        return [record.topic.rsplit('/', 1)[-1] for record in endpoint.published]
+
+    def test_static_attributes_sent_once(self):
+        device, endpoint = self._create_device()
+        self.assertEqual(device._read_attribute_names, ('temperature',))
+        self.assertEqual(device._static_attribute_names, ('serial',))
+
+        device._force_update_of_cloudio_attributes()
+        self.assertEqual(self._published_attributes(endpoint), ['serial', 'temperature'])
+
+        endpoint.clear()
+        device._force_update_of_cloudio_attributes()
+        self.assertEqual(self._published_attributes(endpoint), ['temperature'])
+
+    def test_static_attribute_retried_until_sent(self):
+        device, endpoint = self._create_device()
+        del device.serial       # Model not ready yet
+
+        device._force_update_of_cloudio_attributes()
+        self.assertEqual(self._published_attributes(endpoint), ['temperature'])
+
+        device.serial = 'A-1'
+        device._update_cloudio_attributes(force=False)
+        self.assertEqual(self._published_attributes(endpoint), ['temperature', 'serial'])
+        self.assertEqual(device._sent_static_attributes, {'serial'})
+
+    def test_static_attributes_sent_again_to_new_node(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        device, endpoint = self._create_device()
+        device._force_update_of_cloudio_attributes()
+
+        new_endpoint = InMemoryCloudioEndpoint('site')
+        device.detach()
+        connect_model(device, new_endpoint)
+        device._force_update_of_cloudio_attributes()
+        self.assertEqual(self._published_attributes(new_endpoint), ['serial', 'temperature'])
+
+
+class TestModel2CloudioConnectorMirror(unittest.TestCase):
+
+    def _create_sensor(self):
+        class SensorModel(MappedModel):
+            def __init__(self):
+                super(SensorModel, self).__init__({'temperature': {'topic': 'state.temperature',
+                                                                   'attributeType': float, 'constraints': ('read',),
+                                                                   'toCloudioValueConverter': self._to_celsius}},
+                                                  conversions=0, temperature=20)
+
+            def _to_celsius(self, value):
+                self.conversions += 1
+                return value / 10.0
+
+        return connect_model(SensorModel(), 'cloud')
+
+    def test_publish_to_mirrors(self):
+        from cloudio.glue import InMemoryCloudioEndpoint, PublishScheduler
+
+        sensor, endpoint = self._create_sensor()
+        historian = InMemoryCloudioEndpoint('historian')
+        edge = InMemoryCloudioEndpoint('edge')
+        sensor.add_mirror_endpoint(historian)
+        scheduler = PublishScheduler(messages_per_second=1000)      # Not started: holds the updates back
+        sensor.add_mirror_endpoint(edge, publish_scheduler=scheduler)
+        for target in (endpoint, historian, edge):
+            target.clear()
+
+        sensor._update_cloudio_attribute('temperature', 215)
+        self.assertEqual(sensor.conversions, 1)     # Converted once for all targets
+        self.assertEqual([(record.topic, record.value) for record in endpoint.published],
+                         [('@update/cloud/nodes/SensorModel/objects/state/attributes/temperature', 21.5)])
+        self.assertEqual([(record.topic, record.value) for record in historian.published],
+                         [('@update/historian/nodes/SensorModel/objects/state/attributes/temperature', 21.5)])
+        # A slow target does not hold back the others
+        self.assertEqual(edge.publish_count, 0)
+        self.assertEqual(scheduler.publish_pending(), 1)
+        self.assertEqual(edge.published[0].value, 21.5)
+
+        # Unchanged values are not published to any target
+        sensor._update_cloudio_attribute('temperature', 215)
+        self.assertEqual((endpoint.publish_count, historian.publish_count, scheduler.pending_count()), (1, 1, 0))
+
+    def test_remove_mirror(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        sensor, endpoint = self._create_sensor()
+        historian = InMemoryCloudioEndpoint('historian')
+        mirror_node = sensor.add_mirror_endpoint(historian)
+
+        self.assertTrue(sensor.remove_mirror(mirror_node))
+        self.assertFalse(sensor.remove_mirror(mirror_node))
+        self.assertEqual(historian.nodes, {})
+
+        historian.clear()
+        sensor._update_cloudio_attribute('temperature', 300)
+        self.assertEqual(historian.publish_count, 0)
+        self.assertEqual(endpoint.published[-1].value, 30.0)
+
+        # Detach removes the mirrors too
+        sensor.add_mirror_endpoint(historian)
+        sensor.detach()
+        self.assertEqual(historian.nodes, {})
+
+
+class TestModel2CloudioConnectorEchoSuppression(unittest.TestCase):
+
+    def _create_heater(self):
+        class ClampingHeaterModel(HeaterModel):
+            def on_setpoint_set_from_cloud(self, value):
+                # Like a cloudio_attribute setter: the new value is sent to the cloud
+                self.setpoint = min(value, 25.0)
+                self._update_cloudio_attribute('setpoint', self.setpoint)
+
+        return connect_model(ClampingHeaterModel({'setpoint': {'topic': 'config.setpoint', 'attributeType': float,
+                                                               'constraints': ('read', 'write'),
+                                                               'changeDetection': 'fingerprint'}},
+                                                 setpoint=20.0), 'home')
+
+    def test_echo_not_published(self):
+        heater, endpoint = self._create_heater()
+        topic = 'home/nodes/ClampingHeaterModel/objects/config/attributes/setpoint'
+
+        self.assertTrue(endpoint.set_attribute_from_cloud(topic, 22.0))
+        self.assertEqual(heater.setpoint, 22.0)
+        self.assertEqual(endpoint.publish_count, 0)
+
+        # Value changed by the model is published
+        self.assertTrue(endpoint.set_attribute_from_cloud(topic, 30.0))
+        self.assertEqual([record.value for record in endpoint.published], [25.0])
+
+        # Updates by others are published as usual
+        heater._update_cloudio_attribute('setpoint', 21.0)
+        self.assertEqual(endpoint.publish_count, 2)
+
+    def test_acknowledgement(self):
+        heater, endpoint = self._create_heater()
+        acknowledgements = []
+        heater.set_cloud_write_acknowledgement(lambda topic, timestamp: acknowledgements.append((topic, timestamp)))
+        topic = 'home/nodes/ClampingHeaterModel/objects/config/attributes/setpoint'
+
+        endpoint.set_attribute_from_cloud(topic, 23.0, timestamp=1700000000000)
+        self.assertEqual(acknowledgements, [('@ack/' + topic, 1700000000000)])
+        self.assertEqual(endpoint.publish_count, 0)
+
+    def test_cloud_write_sent_to_mirrors(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        heater, endpoint = self._create_heater()
+        historian = InMemoryCloudioEndpoint('historian')
+        heater.add_mirror_endpoint(historian)
+        historian.clear()
+        topic = 'home/nodes/ClampingHeaterModel/objects/config/attributes/setpoint'
+
+        self.assertTrue(endpoint.set_attribute_from_cloud(topic, 22.0))
+        self.assertEqual(endpoint.publish_count, 0)
+        self.assertEqual([(record.topic, record.value) for record in historian.published],
+                         [('@update/historian/nodes/ClampingHeaterModel/objects/config/attributes/setpoint', 22.0)])
+
+        # Mirrors end with the value the model published
+        self.assertTrue(endpoint.set_attribute_from_cloud(topic, 30.0))
+        self.assertEqual([record.value for record in endpoint.published], [25.0])
+        self.assertEqual([record.value for record in historian.published], [22.0, 30.0, 25.0])
+
+
+class TestModel2CloudioConnectorMappingReload(unittest.TestCase):
+
+    PUMP_MAPPING = {'speed': {'topic': 'state.speed', 'attributeType': float, 'constraints': ('read',)},
+                    'enabled': {'topic': 'config.enabled', 'attributeType': bool, 'constraints': ('read', 'write')},
+                    'hours': {'topic': 'service.counters.hours', 'attributeType': int, 'constraints': ('read',)}}
+
+    def _create_pump(self, endpoint='plant'):
+        class PumpModel(MappedModel):
+            pass
+
+        return connect_model(PumpModel(self.PUMP_MAPPING, speed=0.0, enabled=False, hours=0, pressure=1.0), endpoint)
+
+    def test_incremental_reload(self):
+        pump, endpoint = self._create_pump()
+        speed_attribute = pump._cloudio_attribute_of('speed')
+        enabled_attribute = pump._cloudio_attribute_of('enabled')
+
+        attribute_mapping = dict(self.PUMP_MAPPING)
+        del attribute_mapping['hours']
+        attribute_mapping['enabled'] = dict(attribute_mapping['enabled'], priority='high')
+        attribute_mapping['pressure'] = {'topic': 'state.pressure', 'attributeType': float, 'constraints': ('read',)}
+        pump.set_attribute_mapping(attribute_mapping)
+
+        node = pump._cloudio_node
+        self.assertEqual(sorted(node.get_objects()), ['config', 'state'])      # Empty 'service' object removed
+        self.assertEqual(sorted(node.get_objects()['state']._internal.get_attributes()), ['pressure', 'speed'])
+        # Untouched and unmoved attributes are kept
+        self.assertIs(pump._cloudio_attribute_of('speed'), speed_attribute)
+        self.assertIs(pump._cloudio_attribute_of('enabled'), enabled_attribute)
+        self.assertEqual(len(enabled_attribute._listeners), 1)
+        self.assertEqual(pump._read_attribute_names, ('enabled', 'speed', 'pressure'))
+
+        pump.pressure = 2.5
+        pump._update_cloudio_attributes(force=False)
+        self.assertEqual([(record.topic, record.value) for record in endpoint.published],
+                         [('@update/plant/nodes/PumpModel/objects/state/attributes/pressure', 2.5)])
+        self.assertTrue(endpoint.set_attribute_from_cloud('plant/nodes/PumpModel/objects/config/attributes/enabled',
+                                                          True))
+        self.assertTrue(pump.enabled)
+
+    def test_moved_attribute(self):
+        pump, endpoint = self._create_pump()
+
+        attribute_mapping = dict(self.PUMP_MAPPING, speed={'topic': 'drive.speed', 'attributeType': float,
+                                                           'constraints': ('read',)})
+        pump.set_attribute_mapping(attribute_mapping)
+
+        self.assertEqual(sorted(pump._cloudio_node.get_objects()), ['config', 'drive', 'service'])
+        pump._update_cloudio_attribute('speed', 3.0)
+        self.assertEqual(endpoint.published[-1].topic, '@update/plant/nodes/PumpModel/objects/drive/attributes/speed')
+
+    def test_remove_attribute_without_object(self):
+        pump, _ = self._create_pump()
+        attribute_mapping = dict(self.PUMP_MAPPING, pressure={'topic': 'pressure', 'attributeType': float,
+                                                              'constraints': ('read',)})
+        # Attributes need an object. The entry is in the mapping, but no attribute was created
+        with self.assertRaises(AttributeError):
+            pump.set_attribute_mapping(attribute_mapping)
+
+        pump.set_attribute_mapping(self.PUMP_MAPPING)
+        self.assertEqual(sorted(pump._cloudio_node.get_objects()), ['config', 'service', 'state'])
+
+    def test_reload_time_proportional_to_change(self):
+        from unittest import mock
+
+        pump, _ = self._create_pump()
+        attribute_mapping = {'value_%d' % index: {'topic': 'values.value_%d' % index, 'attributeType': float,
+                                                  'constraints': ('read',)} for index in range(1000)}
+        pump.set_attribute_mapping(attribute_mapping)
+        pump.enable_dirty_tracking()
+        pump._take_dirty_attributes()
+
+        attribute_mapping = dict(attribute_mapping)
+        attribute_mapping['value_7'] = {'topic': 'values.value_7', 'attributeType': int, 'constraints': ('read',)}
+        with mock.patch.object(pump, '_create_cloudio_attribute', wraps=pump._create_cloudio_attribute) as create:
+            pump.set_attribute_mapping(attribute_mapping)
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(pump._dirty_attributes, {'value_7'})
+
+    def test_registered_node_is_recreated(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        class RegisteringEndpoint(InMemoryCloudioEndpoint):
+            def is_node_registered_within_endpoint(self):
+                return True
+
+        pump, endpoint = self._create_pump(RegisteringEndpoint('plant'))
+        old_node = pump._cloudio_node
+
+        pump.set_attribute_mapping(dict(self.PUMP_MAPPING, pressure={'topic': 'state.pressure',
+                                                                     'attributeType': float,
+                                                                     'constraints': ('read',)}))
+
+        self.assertIsNot(pump._cloudio_node, old_node)
+        self.assertIs(endpoint.nodes['PumpModel'], pump._cloudio_node)
+        self.assertEqual([record.topic for record in endpoint.published],
+                         ['@nodeRemoved/plant/nodes/PumpModel', '@nodeAdded/plant/nodes/PumpModel'])
+        self.assertIsNotNone(pump._cloudio_attribute_of('pressure'))
+
+    def test_reload_in_cloudio_endpoint(self):
+        from cloudio.endpoint import CloudioEndpoint
+
+        class OfflineCloudioEndpoint(CloudioEndpoint):
+            def __init__(self, uuid):
+                # CloudioEndpoint.__init__() connects to the broker
+                self.uuid = uuid
+                self.nodes = {}
+
+            def is_online(self):
+                return False
+
+        endpoint = OfflineCloudioEndpoint('plant')
+        pump = MappedModel(self.PUMP_MAPPING, speed=0.0, enabled=False, hours=0, pressure=1.0)
+        pump.create_cloud_io_node(endpoint)
+        old_node = pump._cloudio_node
+
+        attribute_mapping = dict(self.PUMP_MAPPING, pressure={'topic': 'state.pressure', 'attributeType': float,
+                                                              'constraints': ('read',)})
+        del attribute_mapping['hours']
+        pump.set_attribute_mapping(attribute_mapping)
+
+        # The node cannot be modified in place
+        self.assertIsNot(pump._cloudio_node, old_node)
+        self.assertIs(endpoint.nodes['MappedModel'], pump._cloudio_node)
+        self.assertEqual(sorted(pump._cloudio_node.get_objects()), ['config', 'state'])
+        self.assertIsNotNone(pump._cloudio_attribute_of('pressure'))
+
+    def test_mapping_changed_in_place(self):
+        pump, _ = self._create_pump()
+        attribute_mapping = dict(self.PUMP_MAPPING)
+        pump.set_attribute_mapping(attribute_mapping)
+
+        attribute_mapping['pressure'] = {'topic': 'state.pressure', 'attributeType': float, 'constraints': ('read',)}
+        del attribute_mapping['hours']
+        pump.set_attribute_mapping(attribute_mapping)
+
+        self.assertEqual(sorted(pump._cloudio_node.get_objects()), ['config', 'state'])
+        self.assertIsNotNone(pump._cloudio_attribute_of('pressure'))
+        self.assertEqual(pump._read_attribute_names, ('speed', 'enabled', 'pressure'))
+
+
+class TestModel2CloudioConnectorChangeSubscriptions(unittest.TestCase):
+
+    def _create_boiler(self, child_connectors=()):
+        class BoilerModel(HeaterModel):
+            pass
+
+        attribute_mapping = dict(HEATER_MAPPING,
+                                 temperature=dict(HEATER_MAPPING['temperature'],
+                                                  toCloudioValueConverter=lambda value: round(value, 1)),
+                                 pressure={'topic': 'status.pressure', 'attributeType': float,
+                                           'constraints': ('read',)})
+        boiler = BoilerModel(attribute_mapping, setpoint=60.0, pressure=1.0)
+        for child_connector, topic_prefix in child_connectors:
+            boiler.add_child_connector(child_connector, topic_prefix)
+        return connect_model(boiler, 'house')
+
+    def test_changes_after_detection(self):
+        boiler, endpoint = self._create_boiler()
+        subscription = boiler.subscribe_changes()
+
+        boiler._update_cloudio_attribute('temperature', 21.04)
+        boiler._update_cloudio_attribute('temperature', 20.96)     # Same value in the cloud
+        boiler._update_cloudio_attribute('pressure', 1.5)
+
+        events = subscription.drain()
+        self.assertEqual([(event.model_attribute_name, event.topic, event.value, event.from_cloud)
+                          for event in events],
+                         [('temperature', 'status.temperature', 21.0, False),
+                          ('pressure', 'status.pressure', 1.5, False)])
+        self.assertIs(events[0].connector, boiler)
+        self.assertEqual(subscription.drain(), [])
+
+    def test_filters(self):
+        boiler, endpoint = self._create_boiler()
+        by_name = boiler.subscribe_changes(model_attribute_names=('pressure',))
+        by_topic = boiler.subscribe_changes(topic_prefix='config')
+        by_callback = []
+        boiler.subscribe_changes(topic_prefix='status', callback=by_callback.append)
+
+        boiler._update_cloudio_attribute('pressure', 2.0)
+        boiler._update_cloudio_attribute('setpoint', 55.0)
+        boiler._update_cloudio_attribute('temperature', 30.0)
+
+        self.assertEqual([event.model_attribute_name for event in by_name.drain()], ['pressure'])
+        self.assertEqual([event.model_attribute_name for event in by_topic.drain()], ['setpoint'])
+        self.assertEqual([event.model_attribute_name for event in by_callback], ['pressure', 'temperature'])
+
+    def test_cloud_writes(self):
+        boiler, endpoint = self._create_boiler()
+        subscription = boiler.subscribe_changes(topic_prefix='config')
+
+        endpoint.set_attribute_from_cloud('house/nodes/BoilerModel/objects/config/attributes/setpoint', 65.0)
+
+        event = subscription.get(timeout=1.0)
+        self.assertEqual((event.model_attribute_name, event.value, event.from_cloud), ('setpoint', 65.0, True))
+
+    def test_bounded_queue(self):
+        boiler, endpoint = self._create_boiler()
+        subscription = boiler.subscribe_changes(max_queue_size=2)
+
+        for value in range(10, 15):
+            boiler._update_cloudio_attribute('pressure', float(value))
+
+        self.assertEqual(subscription.dropped, 3)
+        self.assertEqual([event.value for event in subscription.drain()], [13.0, 14.0])
+
+    def test_child_connectors(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class BurnerModel(Model2CloudConnector):
+            def __init__(self):
+                super(BurnerModel, self).__init__()
+                self.flame = False
+                self.set_attribute_mapping({'flame': {'topic': 'flame', 'attributeType': bool,
+                                                      'constraints': ('read',)}})
+
+        burner = BurnerModel()
+        boiler, endpoint = self._create_boiler(child_connectors=[(burner, 'burner')])
+        subscription = boiler.subscribe_changes(topic_prefix='burner')
+
+        burner._update_cloudio_attribute('flame', True)
+        boiler._update_cloudio_attribute('pressure', 3.0)
+
+        events = subscription.drain()
+        self.assertEqual([(event.connector, event.topic, event.value) for event in events],
+                         [(burner, 'burner.flame', True)])
+
+    def test_unsubscribe(self):
+        boiler, endpoint = self._create_boiler()
+        subscription = boiler.subscribe_changes()
+
+        boiler.unsubscribe_changes(subscription)
+        boiler._update_cloudio_attribute('pressure', 4.0)
+
+        self.assertTrue(subscription.closed)
+        self.assertIsNone(subscription.get(timeout=0.01))
+        self.assertEqual(boiler._change_subscriptions, ())
+
+
+class TestModel2CloudioConnectorRecording(unittest.TestCase):
+
+    def _create_heater(self):
+        attribute_mapping = dict(HEATER_MAPPING, temperature=dict(HEATER_MAPPING['temperature'],
+                                                                  toCloudioValueConverter=lambda value: value / 10))
+        return connect_model(HeaterModel(attribute_mapping), 'home')
+
+    def test_record_and_replay(self):
+        import io
+        from cloudio.glue import UpdateRecorder, UpdateReplayer
+        from cloudio.glue.recording import read_recording
+
+        heater, endpoint = self._create_heater()
+        log = io.BytesIO()
+        recorder = UpdateRecorder(log)
+        heater.set_update_recorder(recorder)
+
+        for value in (215, 215, 220):
+            heater._update_cloudio_attribute('temperature', value)
+        endpoint.set_attribute_from_cloud('home/nodes/HeaterModel/objects/config/attributes/setpoint', 22.5)
+        heater.set_update_recorder(None)
+        recorder.flush()
+
+        log.seek(0)
+        updates = list(read_recording(log))
+        # Model values are recorded before change detection and conversion
+        self.assertEqual([(update.node, update.topic, update.value, update.from_cloud) for update in updates],
+                         [('HeaterModel', 'status.temperature', 215, False),
+                          ('HeaterModel', 'status.temperature', 215, False),
+                          ('HeaterModel', 'status.temperature', 220, False),
+                          ('HeaterModel', 'config.setpoint', 22.5, True)])
+
+        replayed_heater, replayed_endpoint = self._create_heater()
+        replayer = UpdateReplayer([replayed_heater])
+        self.assertEqual(replayer.replay(updates, speed=None), 4)
+
+        self.assertEqual([(record.topic, record.value) for record in replayed_endpoint.published],
+                         [(record.topic, record.value) for record in endpoint.published])
+        self.assertEqual(replayed_heater.setpoint, 22.5)
+
+    def test_replay_speed(self):
+        from cloudio.glue import UpdateReplayer
+        from cloudio.glue.recording import RecordedUpdate
+
+        heater, endpoint = self._create_heater()
+        now = [0.0]
+        sleeps = []
+
+        def sleep(delay):
+            sleeps.append(round(delay, 3))
+            now[0] += delay
+
+        updates = [RecordedUpdate(1000, 'HeaterModel', 'status.temperature', 200, False),
+                   RecordedUpdate(1500, 'HeaterModel', 'status.temperature', 210, False),
+                   RecordedUpdate(1600, 'OtherModel', 'status.temperature', 210, False),
+                   RecordedUpdate(3000, 'HeaterModel', 'status.temperature', 220, False)]
+
+        replayer = UpdateReplayer([heater], clock=lambda: now[0], sleep=sleep)
+        self.assertEqual(replayer.replay(updates, speed=2.0), 3)
+        self.assertEqual(sleeps, [0.25, 0.75])
+        self.assertEqual(replayer.skipped_count, 1)
+
+
+class TestModel2CloudioConnectorHydration(unittest.TestCase):
+
+    THERMOSTAT_MAPPING = {'setpoint': {'topic': 'config.setpoint', 'attributeType': float,
+                                       'constraints': ('read', 'write')},
+                          'mode': {'topic': 'config.mode', 'attributeType': str, 'constraints': ('write',)},
+                          'boost': {'topic': 'config.boost', 'attributeType': bool, 'constraints': ('write',)},
+                          'temperature': {'topic': 'status.temperature', 'attributeType': float,
+                                          'constraints': ('read',)}}
+
+    def _create_node_with_cloud_values(self):
+        """Returns the node of a previous model instance having received values from the cloud.
+        """
+        class PreviousThermostat(MappedModel):
+            pass
+
+        previous, endpoint = connect_model(PreviousThermostat(self.THERMOSTAT_MAPPING), 'flat')
+        cloudio_node = previous._cloudio_node
+        previous._remove_attribute_listeners()
+        prefix = 'flat/nodes/PreviousThermostat/objects/config/attributes/'
+        endpoint.set_attribute_from_cloud(prefix + 'setpoint', 22.5)
+        endpoint.set_attribute_from_cloud(prefix + 'mode', 'eco')
+        endpoint.clear()
+        return cloudio_node, endpoint
+
+    def test_hydration_before_node_created(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class Thermostat(Model2CloudConnector):
+            def __init__(self, attribute_mapping):
+                super(Thermostat, self).__init__()
+                self.setpoint = 20.0
+                self.mode = 'comfort'
+                self.boost = False
+                self.temperature = 19.0
+                self.seen_on_node_created = None
+                self.set_attribute_mapping(attribute_mapping)
+
+            def _on_cloudio_node_created(self):
+                self.seen_on_node_created = (self.setpoint, self.mode, self.boost)
+
+        cloudio_node, endpoint = self._create_node_with_cloud_values()
+        thermostat = Thermostat(self.THERMOSTAT_MAPPING)
+        subscription = thermostat.subscribe_changes()
+        thermostat.set_cloudio_buddy(cloudio_node)
+
+        self.assertEqual(thermostat.seen_on_node_created, (22.5, 'eco', False))     # 'boost' never set
+        self.assertEqual([(event.model_attribute_name, event.value, event.from_cloud)
+                          for event in subscription.drain()],
+                         [('setpoint', 22.5, True), ('mode', 'eco', True)])
+        self.assertEqual(endpoint.publish_count, 0)
+
+    def test_rebind_keeps_values_of_model(self):
+        import cloudio.common.utils.timestamp_helpers as TimeStampProvider
+
+        heater, _ = connect_model(HeaterModel(self.THERMOSTAT_MAPPING, mode='comfort', boost=False), 'flat')
+        heater._update_cloudio_attribute('setpoint', 21.0)
+        heater.setpoint = 25.0
+        cloudio_node = heater._cloudio_node
+        setpoint_attribute = heater._cloudio_attribute_of('setpoint')
+
+        heater.detach()
+        heater.set_cloudio_buddy(cloudio_node)
+        self.assertEqual(heater.setpoint, 25.0)     # Value published by the model is not taken for a cloud write
+
+        heater.detach()
+        setpoint_attribute.set_value_from_cloud(23.0, TimeStampProvider.get_time_in_milliseconds() + 1000)
+        heater.set_cloudio_buddy(cloudio_node)
+        self.assertEqual(heater.setpoint, 23.0)
+
+    def test_batch_hook(self):
+        from unittest import mock
+        from cloudio.glue import Model2CloudConnector
+
+        class Thermostat(Model2CloudConnector):
+            def __init__(self, attribute_mapping):
+                super(Thermostat, self).__init__()
+                self.setpoint = 22.5        # Already up to date
+                self.mode = 'comfort'
+                self.batches = []
+                self.set_attribute_mapping(attribute_mapping)
+
+            def on_attributes_set_from_cloud(self, values):
+                self.batches.append(values)
+                self.mode = values['mode']
+                # Like a cloudio_attribute setter: the value is sent back to the cloud
+                self._update_cloudio_attribute('mode', self.mode)
+
+        cloudio_node, endpoint = self._create_node_with_cloud_values()
+        thermostat = Thermostat(self.THERMOSTAT_MAPPING)
+        with mock.patch.object(thermostat, '_find_model_attribute_name') as find_model_attribute_name:
+            thermostat.set_cloudio_buddy(cloudio_node)
+
+        self.assertEqual(thermostat.batches, [{'mode': 'eco'}])
+        find_model_attribute_name.assert_not_called()
+        self.assertEqual(endpoint.publish_count, 0)     # Echo suppressed
+
+
+class TestModel2CloudioConnectorNodeTemplates(unittest.TestCase):
+
+    def _create_valve_class(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class ValveModel(Model2CloudConnector):
+            def __init__(self):
+                super(ValveModel, self).__init__()
+                self.position = 0.0
+                self.flow = 0.0
+                self.open = False
+                # Mapping created per instance
+                self.set_attribute_mapping({
+                    'position': {'topic': 'template-test.state.position', 'attributeType': float,
+                                 'constraints': ('read',)},
+                    'flow': {'topic': 'template-test.state.flow', 'attributeType': float, 'constraints': ('read',),
+                             'aggregate': ('min', 'max')},
+                    'open': {'topic': 'template-test.command.open', 'attributeType': bool,
+                             'constraints': ('read', 'write')}})
+
+        return ValveModel
+
+    def test_nodes_cloned_from_template(self):
+        from unittest import mock
+        from cloudio.glue import InMemoryCloudioEndpoint, Model2CloudConnector
+        from cloudio.glue.sharding import node_structure
+
+        valve_class = self._create_valve_class()
+        endpoint = InMemoryCloudioEndpoint('pipeline')
+        valves = []
+        with mock.patch.object(Model2CloudConnector, '_create_cloudio_attributes',
+                               autospec=True, side_effect=Model2CloudConnector._create_cloudio_attributes) as create:
+            for index in range(3):
+                valve = valve_class()
+                endpoint.add_node('valve-%d' % index, valve._create_cloudio_node())
+                valve.set_cloudio_buddy(endpoint.nodes['valve-%d' % index])
+                valves.append(valve)
+        # First two nodes built from the mapping, the second one becomes the template (may exist from a previous test)
+        self.assertLessEqual(create.call_count, 2)
+
+        structures = [node_structure(valve._cloudio_node) for valve in valves]
+        self.assertEqual(structures[1], structures[0])
+        self.assertEqual(structures[2], structures[0])
+
+        # Nodes are independent
+        valves[1]._update_cloudio_attribute('position', 42.0)
+        self.assertEqual(valves[0]._cloudio_attribute_of('position').get_value(), 0.0)
+        self.assertEqual(endpoint.published[-1].topic,
+                         '@update/pipeline/nodes/valve-1/objects/template-test/objects/state/attributes/position')
+
+        self.assertTrue(endpoint.set_attribute_from_cloud(
+            'pipeline/nodes/valve-2/objects/template-test/objects/command/attributes/open', True))
+        self.assertEqual([valve.open for valve in valves], [False, False, True])
+
+    def test_templates_released(self):
+        from cloudio.glue import model_to_cloud_connector
+        from cloudio.glue.node_template import NodeTemplate
+
+        def create_device(index):
+            # Structure created per instance
+            device = MappedModel({'value': {'topic': 'release-test.device-%d.value' % index, 'attributeType': int,
+                                            'constraints': ('read',)}}, value=0)
+            device._create_cloudio_node()
+            return model_to_cloud_connector._node_templates.get(device._node_template_key())
+
+        # Only structures seen more than once get a template
+        self.assertIsNone(create_device(0))
+        template = create_device(0)
+        self.assertIsInstance(template, NodeTemplate)
+
+        for index in range(1, 501):
+            create_device(index)
+
+        self.assertFalse(any(cached is template for cached in model_to_cloud_connector._node_templates.values()))
+        self.assertLessEqual(len(model_to_cloud_connector._node_templates),
+                             model_to_cloud_connector._MAX_NODE_TEMPLATES)
+
+    def test_customized_structure_not_templated(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        valve_class = self._create_valve_class()
+
+        class CustomValveModel(valve_class):
+            def create_cloudio_object(self, cloudio_runtime_node_or_object, location_stack):
+                self.created_objects = getattr(self, 'created_objects', 0) + 1
+                return super(CustomValveModel, self).create_cloudio_object(cloudio_runtime_node_or_object,
+                                                                           location_stack)
+
+        created_objects = []
+        for index in range(2):
+            valve = CustomValveModel()
+            valve.create_cloud_io_node(InMemoryCloudioEndpoint('pipeline-%d' % index))
+            created_objects.append(valve.created_objects)
+            self.assertIsNone(valve._node_template_key())
+        # Second node built the same way, not cloned
+        self.assertGreater(created_objects[0], 0)
+        self.assertEqual(created_objects[1], created_objects[0])
+
+    def test_custom_location_stacks_not_templated(self):
+        from cloudio.glue import InMemoryCloudioEndpoint
+
+        valve_class = self._create_valve_class()
+
+        class SiteValveModel(valve_class):
+            def __init__(self, site):
+                self.site = site
+                super(SiteValveModel, self).__init__()
+
+            def _location_stack_of(self, cloudio_attribute_mapping):
+                # Objects of each instance below its own site object
+                return super(SiteValveModel, self)._location_stack_of(cloudio_attribute_mapping) + [self.site,
+                                                                                                    'objects']
+
+        for site in ('north', 'south'):
+            valve = SiteValveModel(site)
+            valve.create_cloud_io_node(InMemoryCloudioEndpoint('pipeline'))
+            self.assertIsNone(valve._node_template_key())
+            self.assertEqual(list(valve._cloudio_node.get_objects()), [site])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestNodeTemplate(unittest.TestCase):
+    """Tests cloning of nodes using NodeTemplate.
+    """
+
+    log = logging.getLogger(__name__)
+
+    @staticmethod
+    def _build_node():
+        from cloudio.endpoint.runtime import CloudioRuntimeNode, CloudioRuntimeObject
+
+        cloudio_node = CloudioRuntimeNode()
+        cloudio_node.declare_implemented_interface('NodeInterface')
+        status = cloudio_node.add_object('status', CloudioRuntimeObject)
+        status.add_attribute('temperature', float)
+        status.add_attribute('running', bool)
+        status.add_object('counters', CloudioRuntimeObject())
+        status.get_object('counters').add_attribute('starts', int)
+        cloudio_node.add_object('info', CloudioRuntimeObject).add_attribute('serial', str)
+        return cloudio_node
+
+    def test_same_structure(self):
+        from cloudio.glue.node_template import NodeTemplate
+        from cloudio.glue.sharding import node_structure
+
+        template_node = self._build_node()
+        cloned_node = NodeTemplate(template_node).create_node()
+
+        self.assertEqual(node_structure(cloned_node), node_structure(template_node))
+        self.assertEqual(list(cloned_node.interfaces), ['NodeInterface'])
+
+        starts = cloned_node.find_attribute(['starts', 'attributes', 'counters', 'objects', 'status', 'objects'])
+        self.assertEqual(starts.get_type_as_string(), 'Integer')
+        self.assertIs(starts.get_parent(), cloned_node.get_objects()['status'].get_object('counters'))
+        self.assertIs(starts.get_parent().get_parent_object_container(), cloned_node.get_objects()['status'])
+        self.assertIs(cloned_node.get_objects()['status'].get_parent_object_container(), cloned_node)
+
+    def test_clones_match_built_nodes(self):
+        from cloudio.endpoint.attribute import CloudioAttribute
+        from cloudio.glue.node_template import NodeTemplate
+
+        # The template copies the private state of the attributes (see setup.py for the supported versions)
+        built_node = self._build_node()
+        cloned_node = NodeTemplate(self._build_node()).create_node()
+        paths = (['temperature', 'attributes', 'status', 'objects'], ['running', 'attributes', 'status', 'objects'],
+                 ['starts', 'attributes', 'counters', 'objects', 'status', 'objects'],
+                 ['serial', 'attributes', 'info', 'objects'])
+        for path in paths:
+            # find_attribute() consumes the location stack
+            built_attribute, cloned_attribute = built_node.find_attribute(list(path)), cloned_node.find_attribute(path)
+            self.assertEqual(sorted(vars(cloned_attribute)), sorted(vars(CloudioAttribute())))
+            self.assertEqual(self._attribute_state(cloned_attribute), self._attribute_state(built_attribute))
+
+            cloned_attribute.set_value_from_cloud(built_attribute.get_value(), 1000)
+            built_attribute.set_value_from_cloud(built_attribute.get_value(), 1000)
+            self.assertEqual((cloned_attribute.get_value(), cloned_attribute.get_timestamp()),
+                             (built_attribute.get_value(), built_attribute.get_timestamp()))
+
+    def test_assign_value(self):
+        from unittest import mock
+        from cloudio.glue import InMemoryCloudioEndpoint
+        from cloudio.glue.node_template import assign_value
+
+        endpoint = InMemoryCloudioEndpoint('plant')
+        endpoint.add_node('boiler', self._build_node())
+        starts = endpoint.nodes['boiler'].find_attribute(['starts', 'attributes', 'counters', 'objects',
+                                                          'status', 'objects'])
+        listener = mock.Mock()
+        starts.add_listener(listener)
+        endpoint.clear()
+
+        assign_value(starts, 3.0, 2000)
+        assign_value(starts, 2.0, 1000)     # Older values are not rejected
+        self.assertEqual((starts.get_value(), type(starts.get_value()), starts.get_timestamp()), (2, int, 1000))
+        self.assertEqual(endpoint.publish_count, 0)
+        listener.attribute_has_changed.assert_not_called()
+
+    @staticmethod
+    def _attribute_state(attribute):
+        # Type and constraint are objects without comparison
+        return {name: vars(value) if hasattr(value, '__dict__') else value
+                for name, value in vars(attribute).items() if name != '_parent'}
+
+    def test_independent_clones(self):
+        from cloudio.glue.node_template import NodeTemplate
+
+        template = NodeTemplate(self._build_node())
+        first_node, second_node = template.create_node(), template.create_node()
+
+        first_temperature = first_node.find_attribute(['temperature', 'attributes', 'status', 'objects'])
+        second_temperature = second_node.find_attribute(['temperature', 'attributes', 'status', 'objects'])
+        self.assertIsNot(first_temperature, second_temperature)
+
+        first_temperature.set_value_from_cloud(21.5, 1000)
+        first_temperature.add_listener(object())
+        first_node.get_objects()['status'].add_attribute('pressure', float)
+
+        self.assertEqual(second_temperature.get_value(), 0.0)
+        self.assertIsNone(second_temperature.get_timestamp())
+        self.assertFalse(second_temperature._listeners)
+        self.assertNotIn('pressure', second_node.get_objects()['status']._internal.get_attributes())
+        self.assertNotIn('pressure', template.create_node().get_objects()['status']._internal.get_attributes())
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import time
+import unittest
+
+from tests.cloudio.glue.fixtures import connect_model
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestPollingSampler(unittest.TestCase):
+    """Tests PollingSampler class.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_tank(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class Tank(Model2CloudConnector):
+            def __init__(self):
+                super(Tank, self).__init__()
+                self.reads = {'level': 0, 'temperature': 0, 'serial': 0}
+                self._level = 1.0
+                self._temperature = 15.0
+                self.set_attribute_mapping({
+                    'level': {'topic': 'state.level', 'attributeType': float, 'constraints': ('read',),
+                              'samplePeriod': 0.1},
+                    'temperature': {'topic': 'state.temperature', 'attributeType': float,
+                                    'constraints': ('read',), 'samplePeriod': 2.0},
+                    'serial': {'topic': 'info.serial', 'attributeType': str, 'constraints': ('static',)}})
+
+            # Plain getters of a legacy model
+            @property
+            def level(self):
+                self.reads['level'] += 1
+                return self._level
+
+            @property
+            def temperature(self):
+                self.reads['temperature'] += 1
+                return self._temperature
+
+            @property
+            def serial(self):
+                self.reads['serial'] += 1
+                return 'T-1'
+
+        tank, endpoint = connect_model(Tank(), 'site')
+        tank.reads = dict.fromkeys(tank.reads, 0)
+        return tank, endpoint
+
+    def test_sample_periods(self):
+        from cloudio.glue import PollingSampler
+
+        now = [0.0]
+        sampler = PollingSampler(clock=lambda: now[0])
+        tank, endpoint = self._create_tank()
+        self.assertEqual(sampler.add(tank), 2)
+
+        for step in range(0, 41):
+            now[0] = step * 0.1 + 1e-6
+            sampler.sample_due()
+
+        self.assertEqual(tank.reads['level'], 41)
+        self.assertEqual(tank.reads['temperature'], 3)
+        self.assertEqual(tank.reads['serial'], 0)       # Not a 'read' attribute
+        self.assertEqual(sampler.sampled_count, 44)
+
+    def test_change_detection(self):
+        from cloudio.glue import PollingSampler
+
+        now = [0.0]
+        sampler = PollingSampler(clock=lambda: now[0])
+        tank, endpoint = self._create_tank()
+        sampler.add(tank)
+
+        now[0] = 0.05
+        sampler.sample_due()
+        self.assertEqual([record.value for record in endpoint.published], [1.0, 15.0])
+
+        for step in range(1, 5):
+            now[0] = 0.05 + step * 0.1
+            sampler.sample_due()
+        self.assertEqual(tank.reads['level'], 5)
+        self.assertEqual(endpoint.publish_count, 2)     # Unchanged values are not published
+
+        tank._level = 0.5
+        now[0] = 0.55
+        sampler.sample_due()
+        self.assertEqual([record.value for record in endpoint.published], [1.0, 15.0, 0.5])
+
+    def test_phases_spread(self):
+        from cloudio.glue import PollingSampler
+
+        sampler = PollingSampler(clock=lambda: 0.0)
+        for _ in range(20):
+            tank, _ = self._create_tank()
+            sampler.add(tank)
+
+        dues = sorted(entry[0] for entry in sampler._heap if entry[5] == 2.0)
+        gaps = [second - first for first, second in zip(dues, dues[1:])]
+        self.assertEqual(len(dues), 20)
+        self.assertLess(max(gaps), 0.25)        # Evenly spread over the period of 2 seconds
+        self.assertLess(dues[-1], 2.0)
+
+    def test_remove_and_add_again(self):
+        from cloudio.glue import PollingSampler
+
+        now = [0.0]
+        sampler = PollingSampler(clock=lambda: now[0])
+        tank, endpoint = self._create_tank()
+        sampler.add(tank)
+        sampler.remove(tank)
+
+        now[0] = 10.0
+        self.assertEqual(sampler.sample_due(), 0)
+
+        sampler.add(tank)
+        sampler.add(tank)       # Rescheduled, not sampled twice
+        self.assertEqual(sampler.sample_due(now=12.0), 2)
+
+    def test_default_sample_period(self):
+        from cloudio.glue import PollingSampler
+
+        now = [0.0]
+        sampler = PollingSampler(default_sample_period=1.0, clock=lambda: now[0])
+        tank, endpoint = self._create_tank()
+        tank.set_attribute_mapping({'level': {'topic': 'state.level', 'attributeType': float,
+                                              'constraints': ('read',)}})
+        self.assertEqual(sampler.add(tank), 1)
+
+    def test_thread(self):
+        from cloudio.glue import PollingSampler
+
+        now = [0.0]
+        sampler = PollingSampler(clock=lambda: now[0])
+        tank, endpoint = self._create_tank()
+        sampler.add(tank)
+        sampler.start()
+        try:
+            self._wait_for_samples(sampler, 2)
+            now[0] = 0.35
+            # The thread waits at most until the next sample due (0.1s) before reading the clock again
+            self._wait_for_samples(sampler, 3)
+        finally:
+            sampler.stop()
+
+        self.assertEqual(tank.reads['level'], 2)
+        self.assertEqual(tank.reads['temperature'], 1)
+        self.assertEqual(endpoint.publish_count, 2)
+
+    def _wait_for_samples(self, sampler, count):
+        deadline = time.monotonic() + 5.0
+        while sampler.sampled_count < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sampler.sampled_count, count)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
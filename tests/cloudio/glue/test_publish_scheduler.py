@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import time
+import unittest
+
+from tests.cloudio.glue.fixtures import MappedModel, connect_model
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestPublishScheduler(unittest.TestCase):
+    """Tests PublishScheduler class.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_boiler(self, publish_scheduler):
+        attribute_mapping = {'alarm': {'topic': 'status.alarm', 'attributeType': bool,
+                                       'constraints': ('read',), 'priority': 'high'},
+                             'set_point': {'topic': 'status.set-point', 'attributeType': float,
+                                           'constraints': ('read',)}}
+        for index in range(3):
+            attribute_mapping['diagnostic_%d' % index] = {'topic': 'diagnostics.value-%d' % index,
+                                                          'attributeType': int,
+                                                          'constraints': ('read',), 'priority': 'low'}
+
+        boiler, endpoint = connect_model(MappedModel(attribute_mapping, alarm=False, set_point=60.0,
+                                                     diagnostic_0=0, diagnostic_1=0, diagnostic_2=0), 'plant')
+        boiler.set_publish_scheduler(publish_scheduler)
+        return boiler, endpoint
+
+    def test_lanes(self):
+        from cloudio.glue import PublishScheduler
+
+        now = [0.0]
+        scheduler = PublishScheduler(messages_per_second=2, burst=1, clock=lambda: now[0])
+        boiler, endpoint = self._create_boiler(scheduler)
+
+        # Flood of diagnostics
+        for value in range(1, 101):
+            boiler._update_cloudio_attribute('diagnostic_%d' % (value % 3), value)
+        boiler._update_cloudio_attribute('set_point', 65.0)
+        self.assertEqual(endpoint.published, [])
+        self.assertEqual(scheduler.pending_count(), 4)
+
+        # High priority is neither queued nor throttled
+        now[0] = 0.25
+        boiler._update_cloudio_attribute('alarm', True)
+        self.assertEqual([record.value for record in endpoint.published], [True])
+
+        # Normal lane is served first, low lane gets what remains
+        self.assertEqual(scheduler.publish_pending(), 1)
+        self.assertEqual(scheduler.publish_pending(), 0)        # Budget used up
+        for _ in range(3):
+            now[0] += 0.5
+            self.assertEqual(scheduler.publish_pending(), 1)
+
+        self.assertEqual([(record.topic.rsplit('/', 1)[1], record.value) for record in endpoint.published],
+                         [('alarm', True), ('set-point', 65.0),
+                          ('value-1', 100), ('value-2', 98), ('value-0', 99)])     # Newest values
+
+        high = scheduler.lane_metrics('high')
+        self.assertEqual((high.published, high.coalesced, high.latency_max), (1, 0, 0.0))
+        normal = scheduler.lane_metrics('normal')
+        self.assertEqual((normal.published, normal.pending, normal.latency_p50), (1, 0, 0.25))
+        low = scheduler.lane_metrics('low')
+        self.assertEqual((low.published, low.coalesced, low.pending), (3, 97, 0))
+        self.assertEqual((low.latency_p50, low.latency_max), (1.25, 1.75))
+        self.assertEqual(set(scheduler.metrics()), {'high', 'normal', 'low'})
+
+    def test_child_connectors(self):
+        from cloudio.glue import PublishScheduler
+
+        now = [0.0]
+        scheduler = PublishScheduler(messages_per_second=2, burst=1, clock=lambda: now[0])
+        boiler = MappedModel({'set_point': {'topic': 'status.set-point', 'attributeType': float,
+                                            'constraints': ('read',)}}, set_point=60.0)
+        burner = MappedModel({'flame': {'topic': 'status.flame', 'attributeType': bool,
+                                        'constraints': ('read',), 'priority': 'high'},
+                              'runtime': {'topic': 'diagnostics.runtime', 'attributeType': int,
+                                          'constraints': ('read',), 'priority': 'low'}}, flame=False, runtime=0)
+        boiler.add_child_connector(burner, 'burner')
+        boiler, endpoint = connect_model(boiler, 'plant')
+        boiler.set_publish_scheduler(scheduler)
+
+        # Child attributes use the lanes of the parent's scheduler
+        for value in range(1, 11):
+            burner._update_cloudio_attribute('runtime', value)
+        burner._update_cloudio_attribute('flame', True)
+        self.assertEqual([record.value for record in endpoint.published], [True])
+        self.assertEqual(scheduler.pending_count('low'), 1)
+
+        now[0] = 0.5
+        self.assertEqual(scheduler.publish_pending(), 1)
+        self.assertEqual([record.value for record in endpoint.published], [True, 10])
+
+        self.assertEqual(scheduler.lane_metrics('high').published, 1)
+        low = scheduler.lane_metrics('low')
+        self.assertEqual((low.published, low.coalesced, low.latency_max), (1, 9, 0.5))
+
+    def test_publishing_thread(self):
+        from cloudio.glue import PublishScheduler
+
+        scheduler = PublishScheduler(messages_per_second=1000)
+        boiler, endpoint = self._create_boiler(scheduler)
+        scheduler.start()
+        self.addCleanup(scheduler.stop)
+
+        boiler._update_cloudio_attribute('set_point', 70.0)
+        boiler._update_cloudio_attribute('diagnostic_0', 1)
+
+        deadline = time.monotonic() + 5
+        while endpoint.publish_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        self.assertEqual(sorted(record.value for record in endpoint.published), [1, 70.0])
+        scheduler.stop()
+        self.assertEqual(scheduler.pending_count(), 0)
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
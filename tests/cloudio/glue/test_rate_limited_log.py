@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class ExplodingValue(object):
+    """Fails the test if it gets formatted.
+    """
+
+    def __str__(self):
+        raise AssertionError('Value should not be formatted!')
+
+
+class TestRateLimitedLog(unittest.TestCase):
+    """Tests RateLimitedLog class.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def setUp(self):
+        from cloudio.glue.rate_limited_log import RateLimitedLog
+
+        self.now = 0.0
+        self.logger = logging.getLogger('test.rate_limited_log')
+        self.logger.setLevel(logging.INFO)
+        self.rate_limited_log = RateLimitedLog(self.logger, interval=10.0, clock=lambda: self.now)
+
+    def test_duplicates_are_suppressed(self):
+        with self.assertLogs(self.logger) as log:
+            for _ in range(100):
+                self.rate_limited_log.warning('key', 'Attribute \'%s\' not found!', 'power')
+            self.rate_limited_log.warning('other-key', 'Attribute \'%s\' not found!', 'mode')
+
+            self.now = 10.0
+            self.rate_limited_log.warning('key', 'Attribute \'%s\' not found!', 'power')
+
+        self.assertEqual(log.output, ["WARNING:test.rate_limited_log:Attribute 'power' not found!",
+                                      "WARNING:test.rate_limited_log:Attribute 'mode' not found!",
+                                      "WARNING:test.rate_limited_log:Attribute 'power' not found! "
+                                      "(repeated 99 times within 10 s)"])
+
+    def test_flush_outputs_summaries(self):
+        with self.assertLogs(self.logger) as log:
+            self.rate_limited_log.warning('key', 'Lost %d', 1)
+            self.rate_limited_log.warning('key', 'Lost %d', 2)
+            self.rate_limited_log.warning('key', 'Lost %d', 3)
+            self.rate_limited_log.flush()
+            self.rate_limited_log.flush()       # Nothing suppressed since
+
+        self.assertEqual(log.output, ['WARNING:test.rate_limited_log:Lost 1',
+                                      'WARNING:test.rate_limited_log:Lost 3 (repeated 2 times within 10 s)'])
+
+    def test_stopped_burst_is_summarized(self):
+        with self.assertLogs(self.logger) as log:
+            for value in range(5):
+                self.rate_limited_log.warning('burst', 'Lost %d', value)
+
+            # Burst stopped. The next message after the interval outputs its summary
+            self.now = 5.0
+            self.rate_limited_log.warning('other-key', 'Timeout')
+            self.now = 12.0
+            self.rate_limited_log.warning('other-key', 'Timeout')
+
+        self.assertEqual(log.output, ['WARNING:test.rate_limited_log:Lost 0',
+                                      'WARNING:test.rate_limited_log:Timeout',
+                                      'WARNING:test.rate_limited_log:Lost 4 (repeated 4 times within 10 s)'])
+
+        # Keys without suppressed messages are forgotten
+        self.now = 30.0
+        with self.assertLogs(self.logger):
+            self.rate_limited_log.warning('other-key', 'Timeout')
+        self.assertEqual(set(self.rate_limited_log._entries), {'other-key'})
+
+    def test_lazy_formatting(self):
+        self.logger.setLevel(logging.WARNING)
+
+        # Level disabled: never formatted
+        self.assertFalse(self.rate_limited_log.info('key', 'Value %s', ExplodingValue()))
+
+        # Suppressed: never formatted
+        self.rate_limited_log.warning('key', 'Value %s', 1)
+        self.assertFalse(self.rate_limited_log.warning('key', 'Value %s', ExplodingValue()))
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import logging
+import os
+import tempfile
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class TestUpdateRecorder(unittest.TestCase):
+    """Tests the binary log of UpdateRecorder.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def test_values(self):
+        from cloudio.glue import UpdateRecorder
+        from cloudio.glue.recording import read_recording
+
+        values = [None, True, False, 0, -42, 1 << 70, 3.25, '', 'Grüezi', b'\x00\x01', {'a': [1, 2]}]
+        log = io.BytesIO()
+        with UpdateRecorder(log) as recorder:
+            for index, value in enumerate(values):
+                recorder.record('boiler', 'status.value', value, from_cloud=index % 2 == 1, timestamp=1000 + index)
+        self.assertEqual(recorder.record_count, len(values))
+
+        log.seek(0)
+        updates = list(read_recording(log))
+        self.assertEqual([update.value for update in updates], values)
+        self.assertEqual([update.timestamp for update in updates], list(range(1000, 1000 + len(values))))
+        self.assertEqual({(update.node, update.topic) for update in updates}, {('boiler', 'status.value')})
+        self.assertEqual([update.from_cloud for update in updates[:3]], [False, True, False])
+
+    def test_compact(self):
+        from cloudio.glue import UpdateRecorder
+
+        log = io.BytesIO()
+        recorder = UpdateRecorder(log)
+        for value in range(1000):
+            recorder.record('boiler', 'diagnostics.counters.frames-received', value, timestamp=value)
+        recorder.flush()
+
+        # Topic is written once: 13 bytes per record + 9 bytes per integer value
+        self.assertLess(len(log.getvalue()), 1000 * 22 + 100)
+
+    def test_append_sessions(self):
+        from cloudio.glue import UpdateRecorder
+        from cloudio.glue.recording import read_recording
+
+        path = os.path.join(tempfile.mkdtemp(), 'updates.rec')
+        with UpdateRecorder(path) as recorder:
+            recorder.record('boiler', 'status.temperature', 20.5)
+        with UpdateRecorder(path) as recorder:
+            recorder.record('boiler', 'status.pressure', 1.5)
+            recorder.record('boiler', 'status.temperature', 21.0)
+
+        self.assertEqual([(update.topic, update.value) for update in read_recording(path)],
+                         [('status.temperature', 20.5), ('status.pressure', 1.5), ('status.temperature', 21.0)])
+
+    def test_truncated_and_invalid(self):
+        from cloudio.glue import UpdateRecorder
+        from cloudio.glue.recording import read_recording
+
+        log = io.BytesIO()
+        recorder = UpdateRecorder(log)
+        recorder.record('boiler', 'status.state', 'running')
+        recorder.record('boiler', 'status.state', 'stopped')
+        recorder.flush()
+
+        truncated = io.BytesIO(log.getvalue()[:-3])
+        self.assertEqual([update.value for update in read_recording(truncated)], ['running'])
+
+        with self.assertRaises(ValueError):
+            list(read_recording(io.BytesIO(b'not a recording')))
+
+        # Updates referring to a topic not defined in their session
+        header, topic_definition = 5, 13 + (2 + len('boiler')) + (2 + len('status.state'))
+        updates = log.getvalue()[:header] + log.getvalue()[header + topic_definition:]
+        with self.assertRaises(ValueError):
+            list(read_recording(io.BytesIO(updates)))
+
+    def test_append_after_truncated_record(self):
+        from cloudio.glue import UpdateRecorder
+        from cloudio.glue.recording import read_recording
+
+        path = os.path.join(tempfile.mkdtemp(), 'updates.rec')
+        with UpdateRecorder(path) as recorder:
+            recorder.record('boiler', 'status.state', 'running')
+            recorder.record('boiler', 'status.state', 'stopped')
+        with open(path, 'r+b') as file:
+            file.truncate(os.path.getsize(path) - 3)
+
+        with UpdateRecorder(path) as recorder:
+            recorder.record('boiler', 'status.state', 'idle')
+
+        self.assertEqual([update.value for update in read_recording(path)], ['running', 'idle'])
+
+        with open(path, 'wb') as file:
+            file.write(b'not a recording')
+        with self.assertRaises(ValueError):
+            UpdateRecorder(path)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
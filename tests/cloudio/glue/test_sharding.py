@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import multiprocessing
+import time
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+def run_heater_worker(connection):
+    """Worker process: publishes a heater, applies one cloud write, reports it and exits without removing the node.
+    """
+    from cloudio.glue import ShardEndpoint
+    from tests.cloudio.glue.fixtures import HeaterModel
+
+    shard_endpoint = ShardEndpoint(connection)
+    heater = HeaterModel()
+    heater.create_cloud_io_node(shard_endpoint)
+    heater._update_cloudio_attribute('temperature', 22.5)
+
+    shard_endpoint.process_messages(timeout=10.0)
+    heater._update_cloudio_attribute('temperature', heater.setpoint)
+    connection.close()
+
+
+class TestSharding(unittest.TestCase):
+    """Tests ShardEndpoint and ShardHost connected by a pipe.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def _create_thermostat_class(self):
+        from cloudio.glue import Model2CloudConnector
+
+        class ThermostatModel(Model2CloudConnector):
+            def __init__(self):
+                super(ThermostatModel, self).__init__()
+                self.temperature = 20.0
+                self.setpoint = 21.0
+                self.set_attribute_mapping({'temperature': {'topic': 'state.temperature', 'attributeType': float,
+                                                            'constraints': ('read',)},
+                                            'setpoint': {'topic': 'config.heating.setpoint', 'attributeType': float,
+                                                         'constraints': ('read', 'write')}})
+
+            def on_attribute_set_from_cloud(self, attribute_name, cloudio_attr):
+                setattr(self, attribute_name, cloudio_attr.get_value())
+                return True
+
+        return ThermostatModel
+
+    def test_updates_and_cloud_writes(self):
+        from cloudio.glue import InMemoryCloudioEndpoint, ShardEndpoint, ShardHost
+
+        host_connection, worker_connection = multiprocessing.Pipe()
+        endpoint = InMemoryCloudioEndpoint('gateway')
+        shard_host = ShardHost(endpoint)
+        shard_host.add_worker(host_connection)
+        shard_endpoint = ShardEndpoint(worker_connection)
+
+        # Worker side
+        thermostat = self._create_thermostat_class()()
+        thermostat.create_cloud_io_node(shard_endpoint)
+        thermostat._update_cloudio_attribute('temperature', 22.5)
+
+        # Host side
+        self.assertEqual(shard_host.process_messages(timeout=1.0), 2)
+        self.assertIn('ThermostatModel', endpoint.nodes)
+        self.assertEqual([(record.topic, record.value) for record in endpoint.published[1:]],
+                         [('@update/gateway/nodes/ThermostatModel/objects/state/attributes/temperature', 22.5)])
+
+        # Cloud write is routed back to the worker
+        self.assertTrue(endpoint.set_attribute_from_cloud('gateway/nodes/ThermostatModel/objects/config/'
+                                                          'objects/heating/attributes/setpoint', 19.5))
+        self.assertEqual(shard_endpoint.process_messages(timeout=1.0), 1)
+        self.assertEqual(thermostat.setpoint, 19.5)
+
+        thermostat.detach()
+        shard_host.process_messages(timeout=1.0)
+        self.assertEqual(endpoint.nodes, {})
+
+    def test_batched_updates(self):
+        from cloudio.glue import InMemoryCloudioEndpoint, ShardEndpoint, ShardHost
+
+        host_connection, worker_connection = multiprocessing.Pipe()
+        endpoint = InMemoryCloudioEndpoint('gateway')
+        shard_host = ShardHost(endpoint)
+        shard_host.add_worker(host_connection)
+        shard_endpoint = ShardEndpoint(worker_connection, batch_size=10)
+
+        thermostat = self._create_thermostat_class()()
+        thermostat.create_cloud_io_node(shard_endpoint)
+        shard_host.process_messages(timeout=1.0)
+        endpoint.clear()
+
+        for value in range(3):
+            thermostat._update_cloudio_attribute('temperature', float(value + 30))
+        self.assertEqual(shard_host.process_messages(), 0)      # Still pending in the worker
+        shard_endpoint.flush()
+        self.assertEqual(shard_host.process_messages(timeout=1.0), 1)
+        self.assertEqual([record.value for record in endpoint.published], [30.0, 31.0, 32.0])
+
+    def test_bad_messages(self):
+        from cloudio.glue import InMemoryCloudioEndpoint, ShardEndpoint, ShardHost
+        from cloudio.glue.sharding import MESSAGE_NODE_ADDED, MESSAGE_SET
+
+        host_connection, worker_connection = multiprocessing.Pipe()
+        endpoint = InMemoryCloudioEndpoint('gateway')
+        shard_host = ShardHost(endpoint)
+        shard_host.add_worker(host_connection)
+        shard_endpoint = ShardEndpoint(worker_connection)
+        shard_host.start()
+        self.addCleanup(shard_host.stop)
+
+        thermostat = self._create_thermostat_class()()
+        thermostat.create_cloud_io_node(shard_endpoint)
+        with self.assertLogs(shard_host.log, level='ERROR') as log:
+            # Duplicate node name and malformed message
+            worker_connection.send((MESSAGE_NODE_ADDED, 'ThermostatModel', []))
+            worker_connection.send(None)
+            thermostat._update_cloudio_attribute('temperature', 25.0)
+
+            # Host thread keeps serving
+            deadline = time.monotonic() + 5
+            while endpoint.publish_count < 2 and time.monotonic() < deadline:
+                time.sleep(0.001)
+        self.assertEqual(len(log.records), 2)
+        self.assertEqual(endpoint.published[-1].value, 25.0)
+        self.assertIsNotNone(shard_host._attributes.get(('ThermostatModel', ('state', 'temperature'))))
+
+        # Same for the worker
+        host_connection.send((MESSAGE_SET, 'ThermostatModel'))
+        host_connection.send((MESSAGE_SET, 'ThermostatModel', ('config', 'heating', 'setpoint'), 18.0, 1))
+        with self.assertLogs(shard_endpoint.log, level='ERROR'):
+            self.assertEqual(shard_endpoint.process_messages(timeout=1.0), 2)
+        self.assertEqual(thermostat.setpoint, 18.0)
+
+    def test_worker_process(self):
+        from cloudio.glue import InMemoryCloudioEndpoint, ShardHost
+
+        host_connection, worker_connection = multiprocessing.Pipe()
+        endpoint = InMemoryCloudioEndpoint('gateway')
+        shard_host = ShardHost(endpoint)
+        shard_host.add_worker(host_connection)
+
+        worker = multiprocessing.Process(target=run_heater_worker, args=(worker_connection,), daemon=True)
+        worker.start()
+        self.addCleanup(worker.join, 5)
+        worker_connection.close()   # Worker holds the only other end: the host sees the worker exit
+
+        deadline = time.monotonic() + 10
+        while 22.5 not in [record.value for record in endpoint.published] and time.monotonic() < deadline:
+            shard_host.process_messages(timeout=0.1)
+        self.assertIn('HeaterModel', endpoint.nodes)
+
+        self.assertTrue(endpoint.set_attribute_from_cloud('gateway/nodes/HeaterModel/objects/config/attributes/'
+                                                          'setpoint', 19.5))
+        while 'HeaterModel' in endpoint.nodes and time.monotonic() < deadline:
+            shard_host.process_messages(timeout=0.1)
+
+        # Value reported by the worker before it exited, then the node of the closed connection is removed
+        self.assertEqual([(record.topic.split('/')[0], record.value) for record in endpoint.published[-2:]],
+                         [('@update', 19.5), ('@nodeRemoved', None)])
+        self.assertEqual(endpoint.nodes, {})
+        self.assertEqual((shard_host._node_owners, shard_host._attributes, shard_host._connections), ({}, {}, []))
+        worker.join(5)
+        self.assertEqual(worker.exitcode, 0)
+
+    def test_node_structure(self):
+        from cloudio.glue.sharding import create_node, location_stack_of_path, node_structure
+
+        self.assertEqual(location_stack_of_path(('a', 'b', 'c')), ['c', 'attributes', 'b', 'objects', 'a', 'objects'])
+
+        thermostat = self._create_thermostat_class()()
+        from cloudio.endpoint.runtime import CloudioRuntimeNode
+        node = CloudioRuntimeNode()
+        node.set_name('thermostat')
+        thermostat._create_cloudio_attributes(node)
+        thermostat.set_cloudio_buddy(node)
+        thermostat._force_update_of_cloudio_attributes()
+
+        structure = node_structure(node)
+        self.assertEqual(sorted((path, attribute_type, value) for path, attribute_type, value, _ in structure),
+                         [(('config', 'heating', 'setpoint'), float, 21.0), (('state', 'temperature'), float, 20.0)])
+        self.assertEqual(node_structure(create_node(structure)), structure)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', level=logging.DEBUG)
+    unittest.main()
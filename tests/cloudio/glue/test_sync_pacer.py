@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+import unittest
+
+from tests.cloudio.glue.paths import update_working_directory
+
+update_working_directory()  # Needed when: 'pipenv run python -m unittest tests/cloudio/glue/{this_file}.py'
+
+
+class FakeClock(object):
+    """Clock advancing only when sleep() gets called.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeCloudioEndpoint(object):
+
+    def add_node(self, node, object):
+        pass
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests TokenBucket class.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def test_try_acquire(self):
+        from cloudio.glue import TokenBucket
+
+        fake_clock = FakeClock()
+        bucket = TokenBucket(10, capacity=2, clock=fake_clock.clock, sleep=fake_clock.sleep)
+
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        fake_clock.now += 0.1   # One token refilled
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_acquire_waits_for_tokens(self):
+        from cloudio.glue import TokenBucket
+
+        fake_clock = FakeClock()
+        bucket = TokenBucket(5, capacity=1, clock=fake_clock.clock, sleep=fake_clock.sleep)
+
+        self.assertEqual(bucket.acquire(), 0.0)
+        for _ in range(10):
+            bucket.acquire()
+        # 10 messages at 5 messages per second
+        self.assertAlmostEqual(fake_clock.now, 2.0)
+
+
+class TestSyncPacer(unittest.TestCase):
+    """Tests paced synchronisation of Model2CloudConnector objects.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def test_pacer_shared_per_endpoint(self):
+        from cloudio.glue import SyncPacer
+
+        endpoint_a = FakeCloudioEndpoint()
+        endpoint_b = FakeCloudioEndpoint()
+
+        pacer = SyncPacer.for_endpoint(endpoint_a, 100)
+        self.assertIs(SyncPacer.for_endpoint(endpoint_a, 50), pacer)
+        self.assertIsNot(SyncPacer.for_endpoint(endpoint_b, 100), pacer)
+        self.assertEqual(pacer.messages_per_second, 100)
+
+    def test_paced_sync_order_and_progress(self):
+        from cloudio.glue import Model2CloudConnector, SyncPacer
+
+        class DeviceModel(Model2CloudConnector):
+            def __init__(self):
+                super(DeviceModel, self).__init__()
+                self.serial = 'A-1'
+                self.temperature = 20.0
+                self.alarm = False
+                self.updated = []
+
+            def _update_cloudio_attribute(self, model_attribute_name, model_attribute_value, force=False):
+                self.updated.append(model_attribute_name)
+
+        fake_clock = FakeClock()
+        progress = []
+
+        model = DeviceModel()
+        model.set_attribute_mapping({'serial': {'topic': 'info.serial', 'attributeType': str,
+                                                'constraints': ('static',), 'priority': 'low'},
+                                     'temperature': {'topic': 'state.temperature', 'attributeType': float,
+                                                     'constraints': ('read',)},
+                                     'alarm': {'topic': 'state.alarm', 'attributeType': bool,
+                                               'constraints': ('read',), 'priority': 'high'},
+                                     })
+        model.create_cloud_io_node(FakeCloudioEndpoint())
+        model.set_sync_pacer(SyncPacer(2, burst=1, clock=fake_clock.clock, sleep=fake_clock.sleep),
+                             progress_callback=lambda connector, synced, total: progress.append((synced, total)))
+
+        model._force_update_of_cloudio_attributes()
+
+        self.assertEqual(model.updated, ['alarm', 'temperature', 'serial'])
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        self.assertAlmostEqual(fake_clock.now, 1.0)     # Three messages at 2 messages per second
+
+        # Non forced updates are not paced
+        model._update_cloudio_attributes(force=False)
+        self.assertEqual(len(progress), 3)
+        self.assertAlmostEqual(fake_clock.now, 1.0)
+
+    def test_paced_sync_of_child_connectors(self):
+        from cloudio.glue import SyncPacer
+        from tests.cloudio.glue.fixtures import MappedModel, connect_model
+
+        fake_clock = FakeClock()
+        progress = []
+
+        rack = MappedModel({'power': {'topic': 'state.power', 'attributeType': float,
+                                      'constraints': ('read',)}}, power=0.0)
+        for slot in range(2):
+            rack.add_child_connector(MappedModel({'temperature': {'topic': 'temperature', 'attributeType': float,
+                                                                  'constraints': ('read',)},
+                                                  'voltage': {'topic': 'voltage', 'attributeType': float,
+                                                              'constraints': ('read',)}},
+                                                 temperature=20.0, voltage=5.0), 'slot-%d' % slot)
+        rack, endpoint = connect_model(rack, 'lab')
+        rack.set_sync_pacer(SyncPacer(2, burst=1, clock=fake_clock.clock, sleep=fake_clock.sleep),
+                            progress_callback=lambda connector, synced, total: progress.append(connector))
+
+        rack._force_update_of_cloudio_attributes()
+
+        self.assertEqual(endpoint.publish_count, 5)
+        self.assertAlmostEqual(fake_clock.now, 2.0)     # Five messages at 2 messages per second
+        self.assertEqual(len(progress), 5)
+        self.assertEqual(set(progress), {rack} | set(rack._child_connectors))
+
+    def test_invalid_priority(self):
+        from cloudio.glue.priority import priority_rank
+
+        self.assertEqual(priority_rank({}), 1)
+        with self.assertRaises(ValueError):
+            priority_rank({'priority': 'urgent'})
+
+
+if __name__ == '__main__':
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO)
+
+    unittest.main()